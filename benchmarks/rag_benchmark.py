@@ -0,0 +1,73 @@
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "backend"))
+
+from rapidagent.rag import RAG  # noqa: E402
+from rapidagent.store import Store  # noqa: E402
+
+
+def make_vocabulary(size: int, rng: random.Random):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def make_docs(n: int, vocab, rng: random.Random, offset: int = 0):
+    cum_weights = list(itertools.accumulate(1.0 / (i + 1) for i in range(len(vocab))))
+    for i in range(n):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(40, 120))
+        yield {"id": str(offset + i), "text": " ".join(words), "metadata": {"shard": (offset + i) % 16}}
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG ingestion and query throughput benchmark")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--db", default=None, help="database path (defaults to a temporary file)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = make_vocabulary(args.vocab, rng)
+    path = args.db or os.path.join(tempfile.mkdtemp(), "rag_bench.db")
+    rag = RAG(Store(path))
+
+    ingest = 0.0
+    for offset in range(0, args.docs, args.batch):
+        batch = list(make_docs(min(args.batch, args.docs - offset), vocab, rng, offset))
+        start = time.perf_counter()
+        rag.upsert(batch)
+        ingest += time.perf_counter() - start
+    print(f"ingest: {args.docs} docs in {ingest:.2f}s ({args.docs / ingest:,.0f} docs/s)")
+
+    queries = [" ".join(rng.choices(vocab[:5_000], k=rng.randint(1, 4))) for _ in range(args.queries)]
+    for label, filters in (("query", None), ("query+filter", {"shard": 3})):
+        latencies = []
+        start = time.perf_counter()
+        for q in queries:
+            t0 = time.perf_counter()
+            rag.query(q, k=args.k, filters=filters)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        total = time.perf_counter() - start
+        print(
+            f"{label}: {len(queries) / total:,.0f} qps, "
+            f"p50 {statistics.median(latencies):.2f} ms, p99 {percentile(latencies, 0.99):.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "backend"))
+
+from rapidagent.store import Store  # noqa: E402
+from rapidagent.vectors import VectorIndex  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dense vector index append and top-k benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--query-batch", type=int, default=32)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    workdir = tempfile.mkdtemp()
+    store = Store(os.path.join(workdir, "vectors.db"))
+    index = VectorIndex(store, os.path.join(workdir, "vectors.f32"), args.dim)
+
+    elapsed = 0.0
+    for offset in range(0, args.rows, args.batch):
+        n = min(args.batch, args.rows - offset)
+        vectors = rng.standard_normal((n, args.dim), dtype=np.float32)
+        ids = [str(offset + i) for i in range(n)]
+        start = time.perf_counter()
+        index.add(ids, vectors)
+        elapsed += time.perf_counter() - start
+    print(f"append: {args.rows} vectors in {elapsed:.2f}s ({args.rows / elapsed:,.0f} vectors/s)")
+
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    index.search(queries[:1], args.k)
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q, args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"single query top-{args.k}: p50 {statistics.median(latencies):.2f} ms, max {max(latencies):.2f} ms")
+
+    start = time.perf_counter()
+    for i in range(0, args.queries, args.query_batch):
+        index.search(queries[i : i + args.query_batch], args.k)
+    total = time.perf_counter() - start
+    print(f"batched ({args.query_batch}/batch): {args.queries / total:,.0f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
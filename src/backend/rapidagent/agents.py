@@ -1,5 +1,6 @@
 import uuid
-from typing import List, Dict, Any, Generator
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Generator
 from .llms import LLMRegistry
 from .tools import ToolRegistry
 from .store import Store
@@ -18,11 +19,27 @@ class AgentRegistry:
         self.llms = llms
         self.tools = tools
 
-    def create(self, name: str, model: str, tools: List[str], system_prompt: str | None = None) -> str:
+    def create(
+        self,
+        name: str,
+        model: str,
+        tools: List[str],
+        system_prompt: str | None = None,
+        react_mode: str = "json",
+        coalesce: bool = True,
+    ) -> str:
         agent_id = str(uuid.uuid4())
-        self.store.create_agent(agent_id, name, model, tools, system_prompt)
+        self.store.create_agent(agent_id, name, model, tools, system_prompt, react_mode, coalesce)
         return agent_id
 
+    @staticmethod
+    def llm_options(agent: Dict[str, Any], llm_options: Dict[str, Any] | None) -> Dict[str, Any] | None:
+        # Agents whose tools have side effects opt out of sharing LLM turns
+        # and tool calls with identical concurrent requests.
+        if agent.get("coalesce", True):
+            return llm_options
+        return {**(llm_options or {}), "coalesce": False}
+
     def get(self, agent_id: str) -> Dict[str, Any] | None:
         agent = self.store.get_agent(agent_id)
         if not agent:
@@ -34,18 +51,31 @@ class AgentRegistry:
     def list(self) -> List[Dict[str, Any]]:
         return self.store.list_agents()
 
-    def run_react(self, agent_id: str, task: str) -> Dict[str, Any]:
+    def run_react(self, agent_id: str, task: str, llm_options: Dict[str, Any] | None = None) -> Dict[str, Any]:
         agent = self.store.get_agent(agent_id)
         if not agent:
             raise RuntimeError("Agent not found")
         self.store.update_agent_status(agent_id, "running")
         try:
             tools = self.store.get_agent_tools(agent_id)
-            trace = self.llms.run_react("openai", agent["model"], task, tools=tools)
-            for step in trace:
+            trace = []
+            # Each step is stored as soon as it happens so a background job's
+            # progress can be followed through the traces endpoint.
+            for step in self.llms.iter_react(
+                "openai",
+                agent["model"],
+                task,
+                tools=tools,
+                stream=True,
+                mode=agent["react_mode"],
+                llm_options=self.llm_options(agent, llm_options),
+            ):
                 role = step.get("role", "assistant")
+                if role == "token":
+                    continue
                 content = {k: v for k, v in step.items() if k != "role"}
                 self.store.add_trace(agent_id, role, content)
+                trace.append(step)
             final = next((s["content"] for s in reversed(trace) if s.get("role") == "final"), "")
             self.store.update_agent_status(agent_id, "idle")
             return {"result": final, "trace": trace}
@@ -53,7 +83,9 @@ class AgentRegistry:
             self.store.update_agent_status(agent_id, "error")
             raise e
 
-    def run_react_stream(self, agent_id: str, task: str) -> Generator[Dict[str, Any], None, None]:
+    def run_react_stream(
+        self, agent_id: str, task: str, llm_options: Dict[str, Any] | None = None
+    ) -> Generator[Dict[str, Any], None, None]:
         agent = self.store.get_agent(agent_id)
         if not agent:
             yield {"type": "error", "content": "Agent not found"}
@@ -61,19 +93,63 @@ class AgentRegistry:
         self.store.update_agent_status(agent_id, "running")
         try:
             tools = self.store.get_agent_tools(agent_id)
-            for step in self.llms.run_react("openai", agent["model"], task, tools=tools):
-                role = step.get("role")
-                content = {k: v for k, v in step.items() if k != "role"}
-                self.store.add_trace(agent_id, role, content)
-                if role == "thought":
-                    yield {"type": "thought", "content": step.get("content", "")}
-                elif role == "action":
-                    yield {"type": "action", "tool": step.get("tool"), "input": step.get("input")}
-                elif role == "observation":
-                    yield {"type": "observation", "tool": step.get("tool"), "output": step.get("output")}
-                elif role == "final":
-                    yield {"type": "final", "content": step.get("content", "")}
+            for step in self.llms.iter_react(
+                "openai",
+                agent["model"],
+                task,
+                tools=tools,
+                stream=True,
+                mode=agent["react_mode"],
+                llm_options=self.llm_options(agent, llm_options),
+            ):
+                event = self._event(step)
+                if step.get("role") != "token":
+                    content = {k: v for k, v in step.items() if k != "role"}
+                    self.store.add_trace(agent_id, step.get("role"), content)
+                if event:
+                    yield event
             self.store.update_agent_status(agent_id, "idle")
         except Exception as e:
             self.store.update_agent_status(agent_id, "error")
             yield {"type": "error", "content": str(e)}
+
+    async def arun_react_stream(
+        self, agent_id: str, task: str, llm_options: Dict[str, Any] | None = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        agent = await asyncio.to_thread(self.store.get_agent, agent_id)
+        if not agent:
+            yield {"type": "error", "content": "Agent not found"}
+            return
+        await asyncio.to_thread(self.store.update_agent_status, agent_id, "running")
+        try:
+            tools = await asyncio.to_thread(self.store.get_agent_tools, agent_id)
+            async for step in self.llms.aiter_react(
+                "openai",
+                agent["model"],
+                task,
+                tools=tools,
+                stream=True,
+                mode=agent["react_mode"],
+                llm_options=self.llm_options(agent, llm_options),
+            ):
+                event = self._event(step)
+                if step.get("role") != "token":
+                    content = {k: v for k, v in step.items() if k != "role"}
+                    await asyncio.to_thread(self.store.add_trace, agent_id, step.get("role"), content)
+                if event:
+                    yield event
+            await asyncio.to_thread(self.store.update_agent_status, agent_id, "idle")
+        except Exception as e:
+            await asyncio.to_thread(self.store.update_agent_status, agent_id, "error")
+            yield {"type": "error", "content": str(e)}
+
+    @staticmethod
+    def _event(step: Dict[str, Any]) -> Dict[str, Any] | None:
+        role = step.get("role")
+        if role in ("token", "thought", "final"):
+            return {"type": role, "content": step.get("content", "")}
+        if role == "action":
+            return {"type": "action", "tool": step.get("tool"), "input": step.get("input")}
+        if role == "observation":
+            return {"type": "observation", "tool": step.get("tool"), "output": step.get("output")}
+        return None
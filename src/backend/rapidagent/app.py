@@ -1,19 +1,50 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uuid
+import time
+import asyncio
+import tempfile
 import os, json
+from typing import Literal
 
 from .store import Store
-from .tools import ToolRegistry
+from .tools import ToolRegistry, CalculatorTool, SearchTool
 from .llms import LLMRegistry
-
-store = Store("data/rapidagent.db")
-tools = ToolRegistry.from_json_file("data/tools.json", include_defaults=True)
-llms = LLMRegistry(store, tools)
-
-app = FastAPI()
+from .agents import AgentRegistry
+from .jobs import JobQueue
+from .pipelines import PipelineRegistry
+from .batch import BatchProgress, run_batch
+from .cache import CompletionCache
+from . import httpclient, sandbox
+
+store = Store("data/rapidagent.db", write_behind=os.getenv("RAPIDAGENT_WRITE_BEHIND") == "1")
+tools = ToolRegistry([CalculatorTool(), SearchTool()])
+ToolRegistry.import_json(store, "data/tools.json")
+tools.refresh(store)
+llms = LLMRegistry(store, tools, cache=CompletionCache(store) if os.getenv("RAPIDAGENT_LLM_CACHE") == "1" else None)
+agents = AgentRegistry(store, llms, tools)
+jobs = JobQueue(store, agents)
+pipelines = PipelineRegistry(store, tools)
+pipelines.import_json("data/pipelines.json")
+
+TOOLS_REFRESH_INTERVAL = float(os.getenv("RAPIDAGENT_TOOLS_REFRESH_INTERVAL", "1.0"))
+_tools_checked = 0.0
+
+async def refresh_tools():
+    # Tool edits made through this process refresh the registry directly; this
+    # only picks up edits from other workers, so the store is checked at most
+    # once per interval and never on the event loop.
+    global _tools_checked
+    now = time.monotonic()
+    if now - _tools_checked >= TOOLS_REFRESH_INTERVAL:
+        _tools_checked = now
+        await asyncio.to_thread(tools.refresh, store)
+
+
+app = FastAPI(dependencies=[Depends(refresh_tools)])
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,9 +59,18 @@ class CreateAgent(BaseModel):
     model: str
     tools: list[str] = []
     system_prompt: str | None = None
+    react_mode: Literal["json", "functions"] = "json"
+    coalesce: bool = True
 
 class ChatRequest(BaseModel):
     messages: list[dict]
+    use_cache: bool = True
+
+    def llm_options(self) -> dict | None:
+        return None if self.use_cache else {"use_cache": False}
+
+class JobRequest(ChatRequest):
+    priority: int = 0
 
 class ToolDef(BaseModel):
     name: str
@@ -47,19 +87,28 @@ class PipelineDef(BaseModel):
     description: str | None = None
     steps: list[PipelineStep]
 
-PIPELINE_FILE = "data/pipelines.json"
+class PipelineRun(BaseModel):
+    input: dict = {}
+    use_cache: bool = False
+    fresh: list[int] | None = None
 
-def load_pipelines():
-    try:
-        with open(PIPELINE_FILE) as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
 
-def save_pipelines(pipelines):
-    os.makedirs("data", exist_ok=True)
-    with open(PIPELINE_FILE, "w") as f:
-        json.dump(pipelines, f, indent=2)
+@app.on_event("startup")
+def startup():
+    jobs.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    jobs.close()
+    llms.close()
+    await llms.aclose()
+    tools.shutdown()
+    pipelines.shutdown()
+    httpclient.default_pool().close()
+    await httpclient.default_pool().aclose()
+    sandbox.default_pool().close()
+    store.close()
 
 
 @app.get("/models/{provider}")
@@ -67,74 +116,119 @@ def list_models(provider: str):
     return {"models": llms.list_models(provider)}
 
 
+@app.get("/llm/cache")
+def llm_cache_stats():
+    if llms.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llms.cache.stats()}
+
+
+@app.get("/llm/providers")
+def llm_providers():
+    return {"providers": llms.list_providers(), **llms.routing_stats()}
+
+
+@app.get("/llm/limits")
+def llm_limit_stats():
+    return llms.limiter.stats()
+
+
+@app.get("/coalescing")
+def coalescing_stats():
+    return {"llm": llms.flight.stats(), "tools": tools.flight.stats()}
+
+
 @app.get("/tools")
 def list_tools():
     return {"tools": tools.list_tools()}
 
 
+@app.get("/tools/cache")
+def tool_cache_stats():
+    return tools.cache_stats()
+
+
 @app.post("/tools")
 def create_tool(defn: ToolDef):
     try:
-        tool = tools.tool_from_def(defn.dict())
-        tools.register(tool)
-
-        path = "data/tools.json"
-        os.makedirs("data", exist_ok=True)
-        try:
-            with open(path) as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            data = []
-        data = [d for d in data if d.get("name") != defn.name]
-        data.append(defn.dict())
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2)
-
-        return {"status": "ok"}
+        tools.tool_from_def(defn.dict())
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    store.upsert_tool(defn.name, defn.description, defn.type, defn.config)
+    tools.refresh(store)
+    return {"status": "ok"}
 
 
 @app.delete("/tools/{tool_name}")
 def delete_tool(tool_name: str):
-    if tool_name not in tools.tools:
-        raise HTTPException(status_code=404, detail="Tool not found")
-    tools.unregister(tool_name)
-
-    path = "data/tools.json"
-    try:
-        with open(path) as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        data = []
-    data = [d for d in data if d.get("name") != tool_name]
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
-
+    if not store.delete_tool(tool_name):
+        if tool_name not in tools.tools:
+            raise HTTPException(status_code=404, detail="Tool not found")
+        tools.unregister(tool_name)
+    tools.refresh(store)
     return {"status": "deleted"}
 
 
 @app.get("/pipelines")
-def list_pipelines():
-    return {"pipelines": load_pipelines()}
+def list_pipelines(limit: int | None = Query(None, ge=1, le=1000), after_id: str | None = None):
+    return page("pipelines", lambda limit: pipelines.list_pipelines(limit=limit, after_id=after_id), limit, after_id, None, False)
 
 
 @app.post("/pipelines")
 def create_pipeline(defn: PipelineDef):
-    pipelines = load_pipelines()
-    pipeline_id = str(uuid.uuid4())
-    pipeline = {
-        "id": pipeline_id,
-        "name": defn.name,
-        "description": defn.description or "",
-        "steps": [s.dict() for s in defn.steps],
-        "created_at": __import__("datetime").datetime.utcnow().isoformat(),
-    }
-    pipelines.append(pipeline)
-    save_pipelines(pipelines)
+    pipeline_id = pipelines.create_pipeline(defn.name, defn.description or "", [s.dict() for s in defn.steps])
     return {"id": pipeline_id}
 
 
+@app.get("/pipelines/{pipeline_id}")
+def get_pipeline(pipeline_id: str):
+    pipeline = pipelines.get_pipeline(pipeline_id)
+    if not pipeline:
+        raise HTTPException(status_code=404, detail="Pipeline not found")
+    return {"pipeline": pipeline}
+
+
+@app.post("/pipelines/{pipeline_id}/run")
+def run_pipeline(pipeline_id: str, req: PipelineRun):
+    try:
+        return pipelines.run_pipeline(pipeline_id, req.input, use_cache=req.use_cache, fresh=req.fresh)
+    except RuntimeError as e:
+        raise HTTPException(status_code=404 if str(e) == "Pipeline not found" else 400, detail=str(e))
+
+
+@app.post("/pipelines/{pipeline_id}/batch")
+async def batch_pipeline(
+    pipeline_id: str,
+    request: Request,
+    concurrency: int = Query(8, ge=1, le=256),
+    ordered: bool = True,
+    offset: int = Query(0, ge=0),
+    progress_every: int = Query(0, ge=0),
+    use_cache: bool = False,
+):
+    if await asyncio.to_thread(pipelines.get_pipeline, pipeline_id) is None:
+        raise HTTPException(status_code=404, detail="Pipeline not found")
+    # The body is spooled before responding: a streaming response listens for
+    # client disconnects on the same receive channel the body arrives on.
+    rows = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    async for chunk in request.stream():
+        rows.write(chunk)
+    rows.seek(0)
+    progress = BatchProgress(offset)
+
+    def events():
+        try:
+            for result in run_batch(pipelines, pipeline_id, rows, concurrency, ordered, offset, progress, use_cache):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+                if progress_every and progress.completed % progress_every == 0:
+                    yield json.dumps({"progress": progress.to_dict()}) + "\n"
+            yield json.dumps({"progress": progress.to_dict()}) + "\n"
+        finally:
+            rows.close()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.get("/agents")
 def list_agents():
     return {"agents": store.list_agents()}
@@ -143,51 +237,164 @@ def list_agents():
 @app.post("/agents")
 def create_agent(req: CreateAgent):
     agent_id = str(uuid.uuid4())
-    store.create_agent(agent_id, req.name, req.model, req.tools, req.system_prompt)
+    store.create_agent(agent_id, req.name, req.model, req.tools, req.system_prompt, req.react_mode, req.coalesce)
     return {"id": agent_id}
 
 
+def page(key: str, fetch, limit: int | None, after_id: int | None, before_id: int | None, tail: bool):
+    rows = fetch(limit=limit + 1 if limit is not None else None)
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        newest_first = tail or (before_id is not None and after_id is None)
+        rows = rows[1:] if newest_first else rows[:-1]
+    return {
+        key: rows,
+        "has_more": has_more,
+        "first_id": rows[0]["id"] if rows else None,
+        "last_id": rows[-1]["id"] if rows else None,
+    }
+
+
 @app.get("/agents/{agent_id}")
-def get_agent(agent_id: str):
+def get_agent(agent_id: str, messages_limit: int | None = Query(None, ge=1, le=1000)):
     agent = store.get_agent(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     return {
         "agent": agent,
         "tools": store.get_agent_tools(agent_id),
-        "messages": store.get_agent_messages(agent_id),
+        "messages": store.get_agent_messages(agent_id, limit=messages_limit, tail=messages_limit is not None),
     }
 
 
+@app.get("/agents/{agent_id}/messages")
+def get_messages(
+    agent_id: str,
+    limit: int | None = Query(None, ge=1, le=1000),
+    after_id: int | None = None,
+    before_id: int | None = None,
+    role: str | None = None,
+    tail: bool = False,
+):
+    return page(
+        "messages",
+        lambda limit: store.get_agent_messages(agent_id, limit, after_id, before_id, role, tail),
+        limit,
+        after_id,
+        before_id,
+        tail,
+    )
+
+
 @app.get("/agents/{agent_id}/traces")
-def get_traces(agent_id: str):
-    return {"traces": store.list_traces(agent_id)}
+def get_traces(
+    agent_id: str,
+    limit: int | None = Query(None, ge=1, le=1000),
+    after_id: int | None = None,
+    before_id: int | None = None,
+    type: str | None = None,
+    tail: bool = False,
+):
+    return page(
+        "traces",
+        lambda limit: store.list_traces(agent_id, limit, after_id, before_id, type, tail),
+        limit,
+        after_id,
+        before_id,
+        tail,
+    )
 
 
 @app.post("/agents/{agent_id}/chat")
-def chat(agent_id: str, req: ChatRequest):
-    agent = store.get_agent(agent_id)
+async def chat(agent_id: str, req: ChatRequest):
+    agent = await asyncio.to_thread(store.get_agent, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
     if req.messages:
         last = req.messages[-1]
-        store.add_agent_message(agent_id, last["role"], last["content"])
+        await asyncio.to_thread(store.add_agent_message, agent_id, last["role"], last["content"])
 
-    traces = llms.run_react(
+    traces = await llms.arun_react(
         "openai",
         agent["model"],
         req.messages[-1]["content"] if req.messages else "",
-        tools=store.get_agent_tools(agent_id),
+        tools=await asyncio.to_thread(store.get_agent_tools, agent_id),
+        stream=True,
+        mode=agent["react_mode"],
+        llm_options=agents.llm_options(agent, req.llm_options()),
     )
 
     for step in traces:
         if step["role"] == "final":
-            store.add_agent_message(agent_id, "assistant", step["content"])
+            await asyncio.to_thread(store.add_agent_message, agent_id, "assistant", step["content"])
 
     return {"traces": traces}
 
 
+@app.post("/agents/{agent_id}/chat/stream")
+async def chat_stream(agent_id: str, req: ChatRequest):
+    agent = await asyncio.to_thread(store.get_agent, agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    if req.messages:
+        last = req.messages[-1]
+        await asyncio.to_thread(store.add_agent_message, agent_id, last["role"], last["content"])
+    task = req.messages[-1]["content"] if req.messages else ""
+
+    async def events():
+        async for event in agents.arun_react_stream(agent_id, task, req.llm_options()):
+            if event["type"] == "final":
+                await asyncio.to_thread(store.add_agent_message, agent_id, "assistant", event["content"])
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/agents/{agent_id}/jobs")
+def submit_job(agent_id: str, req: JobRequest):
+    if not store.get_agent(agent_id):
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if req.messages:
+        last = req.messages[-1]
+        store.add_agent_message(agent_id, last["role"], last["content"])
+    task = req.messages[-1]["content"] if req.messages else ""
+    job_id = jobs.submit(agent_id, task, req.priority, req.llm_options())
+    return {"id": job_id, "status": "queued"}
+
+
+@app.get("/agents/{agent_id}/jobs")
+def list_agent_jobs(agent_id: str, status: str | None = None, limit: int | None = Query(None, ge=1, le=1000)):
+    return {"jobs": store.list_jobs(agent_id, status, limit)}
+
+
+@app.get("/jobs/stats")
+def job_stats():
+    return jobs.stats()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job": job}
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    if not jobs.cancel(job_id):
+        if not jobs.get(job_id):
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=409, detail="Job is not queued")
+    return {"status": "cancelled"}
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
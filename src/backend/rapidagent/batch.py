@@ -0,0 +1,193 @@
+import sys
+import json
+import time
+import heapq
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .pipelines import PipelineRegistry
+from .store import Store
+from .tools import CalculatorTool, SearchTool, ToolRegistry
+
+Row = Union[str, bytes, Dict[str, Any]]
+
+
+class BatchProgress:
+    """Counters for a batch run. ``watermark`` is the index below which every
+    row has been emitted, i.e. the offset to resume from after a crash."""
+
+    def __init__(self, offset: int = 0):
+        self.offset = offset
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.watermark = offset
+        self.started = time.monotonic()
+        self._done: List[int] = []
+
+    def record(self, result: Dict[str, Any]):
+        self.completed += 1
+        if "error" in result:
+            self.failed += 1
+        heapq.heappush(self._done, result["index"])
+        while self._done and self._done[0] == self.watermark:
+            heapq.heappop(self._done)
+            self.watermark += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        return {
+            "offset": self.offset,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.submitted - self.completed,
+            "watermark": self.watermark,
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_s": round(self.completed / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+def run_batch(
+    registry: PipelineRegistry,
+    pipeline_id: str,
+    rows: Iterable[Row],
+    concurrency: int = 8,
+    ordered: bool = True,
+    offset: int = 0,
+    progress: Optional[BatchProgress] = None,
+    use_cache: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    registry.plan(pipeline_id)
+    progress = progress or BatchProgress(offset)
+    window = _window(concurrency, ordered)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+        pending: Dict[Future, None] = {}
+        for index, row in _numbered(rows, offset):
+            while len(pending) >= window:
+                yield from _drain(pending, ordered, progress)
+            pending[executor.submit(_run_row, registry, pipeline_id, index, row, use_cache)] = None
+            progress.submitted += 1
+        while pending:
+            yield from _drain(pending, ordered, progress)
+
+
+def _window(concurrency: int, ordered: bool) -> int:
+    # Ordered output is emitted head-first, so allow some rows past a slow
+    # head to keep the workers busy while it finishes.
+    return concurrency * 2 if ordered else concurrency
+
+
+def _blank(row: Row) -> bool:
+    return isinstance(row, (str, bytes)) and not row.strip()
+
+
+def _numbered(rows: Iterable[Row], offset: int) -> Iterator[Tuple[int, Row]]:
+    index = -1
+    for row in rows:
+        if _blank(row):
+            continue
+        index += 1
+        if index >= offset:
+            yield index, row
+
+
+def _run_row(
+    registry: PipelineRegistry, pipeline_id: str, index: int, row: Row, use_cache: bool = False
+) -> Dict[str, Any]:
+    try:
+        data = json.loads(row) if isinstance(row, (str, bytes)) else row
+        if not isinstance(data, dict):
+            raise ValueError("row must be a JSON object")
+        return {"index": index, **registry.run_pipeline(pipeline_id, data, use_cache=use_cache)}
+    except Exception as e:
+        return {"index": index, "error": str(e)}
+
+
+def _drain(pending: Dict[Future, None], ordered: bool, progress: BatchProgress) -> Iterator[Dict[str, Any]]:
+    if ordered:
+        done = [next(iter(pending))]
+    else:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        del pending[future]
+        result = future.result()
+        progress.record(result)
+        yield result
+
+
+def _resume_offset(path: str) -> int:
+    # Resume after the last complete record and cut off a line that was only
+    # partly written when the previous run died.
+    offset, good_end, pos = 0, 0, 0
+    try:
+        with open(path, "rb+") as f:
+            for line in f:
+                pos += len(line)
+                if not line.strip():
+                    continue
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    offset = json.loads(line)["index"] + 1
+                except (ValueError, KeyError, TypeError):
+                    break
+                good_end = pos
+            f.truncate(good_end)
+    except FileNotFoundError:
+        pass
+    return offset
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m rapidagent.batch", description="Run a pipeline over JSONL input rows.")
+    parser.add_argument("pipeline_id")
+    parser.add_argument("--input", default="-", help="JSONL input file, or - for stdin")
+    parser.add_argument("--output", default="-", help="NDJSON output file, or - for stdout")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--unordered", action="store_true", help="emit results as they complete")
+    parser.add_argument("--offset", type=int, default=0, help="skip this many input rows")
+    parser.add_argument("--resume", action="store_true", help="continue after the rows already in --output")
+    parser.add_argument("--use-cache", action="store_true", help="reuse cached step outputs")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines on stderr")
+    parser.add_argument("--db", default="data/rapidagent.db")
+    args = parser.parse_args(argv)
+
+    offset = args.offset
+    if args.resume:
+        if args.output == "-" or args.unordered:
+            parser.error("--resume needs an --output file and ordered output; use --offset with the last watermark instead")
+        offset = max(offset, _resume_offset(args.output))
+
+    store = Store(args.db)
+    tools = ToolRegistry([CalculatorTool(), SearchTool()])
+    tools.refresh(store)
+    registry = PipelineRegistry(store, tools)
+    progress = BatchProgress(offset)
+    src = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    dst = sys.stdout if args.output == "-" else open(args.output, "a" if args.resume else "w")
+    last_report = time.monotonic()
+    try:
+        for result in run_batch(
+            registry, args.pipeline_id, src, args.concurrency, not args.unordered, offset, progress, args.use_cache
+        ):
+            dst.write(json.dumps(result, ensure_ascii=False) + "\n")
+            if time.monotonic() - last_report >= args.progress_every:
+                dst.flush()
+                print(json.dumps(progress.to_dict()), file=sys.stderr)
+                last_report = time.monotonic()
+    finally:
+        dst.flush()
+        print(json.dumps(progress.to_dict()), file=sys.stderr)
+        if src is not sys.stdin.buffer:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+        registry.shutdown()
+        store.close()
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .store import Store
+
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Any, default: Any = MISSING) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Any, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Any):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CompletionCache:
+    """Two-tier cache of LLM completions: an in-process LRU in front of the
+    ``llm_cache`` table, both bounded by size and TTL."""
+
+    def __init__(
+        self,
+        store: Store,
+        max_entries: int = 1024,
+        max_rows: int = 100_000,
+        ttl: float = 7 * 24 * 3600,
+        evict_every: int = 256,
+    ):
+        self.store = store
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self.memory = LRUCache(max_entries, ttl)
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(provider: str, model: str, messages: List[Dict[str, Any]], extra: Any = None) -> str:
+        normalized = []
+        for m in messages:
+            entry = dict(m)
+            if isinstance(entry.get("content"), str):
+                # Only the ends: inner whitespace such as code indentation
+                # can change the answer.
+                entry["content"] = entry["content"].strip()
+            normalized.append(entry)
+        payload = json.dumps(
+            {"provider": provider, "model": model, "messages": normalized, "extra": extra},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key, None)
+        if value is not None:
+            self._count(hit=True, memory=True)
+            return value
+        value = self.store.get_llm_cache(key, time.time() - self.ttl)
+        if value is not None:
+            self.memory.set(key, value)
+            self._count(hit=True)
+            return value
+        self._count(hit=False)
+        return None
+
+    def put(self, key: str, value: str):
+        self.memory.set(key, value)
+        self.store.put_llm_cache(key, value)
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % self.evict_every == 0
+        if evict:
+            self.store.evict_llm_cache(self.max_rows, time.time() - self.ttl)
+
+    def clear(self):
+        self.memory.clear()
+        self.store.clear_llm_cache()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+    def _count(self, hit: bool, memory: bool = False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                if memory:
+                    self.memory_hits += 1
+            else:
+                self.misses += 1
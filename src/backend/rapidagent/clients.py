@@ -0,0 +1,118 @@
+import os
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+
+class OpenAIClients:
+    """Long-lived OpenAI clients sharing keep-alive connection pools.
+
+    One sync client is kept per (api key, base url). Async clients are
+    additionally keyed by event loop because an httpx.AsyncClient pool
+    cannot be shared across loops. The SDK's own retries are off by default:
+    the rate limiter retries 429s and transient errors through its queue.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 0,
+        api_key_env: str = "OPENAI_API_KEY",
+    ):
+        self.api_key = api_key
+        self.api_key_env = api_key_env
+        self.base_url = base_url
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._sync: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+        self._async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], AsyncOpenAI]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @classmethod
+    def from_env(cls, prefix: str = "OPENAI") -> "OpenAIClients":
+        def env(name: str, default: Any, cast=str):
+            value = os.getenv(f"{prefix}_{name}")
+            return cast(value) if value else default
+
+        return cls(
+            base_url=env("BASE_URL", None),
+            max_connections=env("MAX_CONNECTIONS", 100, int),
+            max_keepalive_connections=env("MAX_KEEPALIVE_CONNECTIONS", 20, int),
+            keepalive_expiry=env("KEEPALIVE_EXPIRY", 30.0, float),
+            timeout=env("TIMEOUT", 60.0, float),
+            connect_timeout=env("CONNECT_TIMEOUT", 5.0, float),
+            max_retries=env("MAX_RETRIES", 0, int),
+            api_key_env=f"{prefix}_API_KEY",
+        )
+
+    def _key(self) -> Tuple[str, Optional[str]]:
+        api_key = self.api_key or os.getenv(self.api_key_env)
+        if not api_key:
+            raise RuntimeError(f"{self.api_key_env} not set")
+        return api_key, self.base_url
+
+    def get(self) -> OpenAI:
+        key = self._key()
+        client = self._sync.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._sync.get(key)
+            if client is None:
+                client = OpenAI(
+                    api_key=key[0],
+                    base_url=key[1],
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=httpx.Client(limits=self.limits, timeout=self.timeout),
+                )
+                self._sync[key] = client
+            return client
+
+    def get_async(self) -> AsyncOpenAI:
+        key = self._key()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                client = AsyncOpenAI(
+                    api_key=key[0],
+                    base_url=key[1],
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout),
+                )
+                clients[key] = client
+            return client
+
+    def close(self):
+        with self._lock:
+            clients = list(self._sync.values())
+            self._sync.clear()
+        for client in clients:
+            client.close()
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = list(self._async.pop(loop, {}).values())
+        for client in clients:
+            await client.close()
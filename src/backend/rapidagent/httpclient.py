@@ -0,0 +1,240 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Methods that are safe to repeat; others are only retried when the caller
+# says the request is idempotent.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+
+
+class HttpResult:
+    def __init__(self, status_code: int, headers: httpx.Headers, content: bytes, encoding: str, truncated: bool):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.truncated = truncated
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+
+class HttpClientPool:
+    """Shared keep-alive httpx clients with per-host concurrency limits and
+    retries on 429/5xx responses for idempotent requests. ``timeout`` bounds each attempt and
+    ``total_timeout`` the whole request, retries and backoff included."""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        per_host: int = 10,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+    ):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.per_host = per_host
+        self.transport = transport
+        self.async_transport = async_transport
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_env(cls) -> "HttpClientPool":
+        return cls(
+            max_connections=int(os.getenv("RAPIDAGENT_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("RAPIDAGENT_HTTP_MAX_KEEPALIVE", "20")),
+            per_host=int(os.getenv("RAPIDAGENT_HTTP_PER_HOST", "10")),
+        )
+
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        limits=self.limits,
+                        http2=HTTP2 and self.transport is None,
+                        transport=self.transport,
+                        follow_redirects=True,
+                    )
+        return self._client
+
+    def async_client(self) -> httpx.AsyncClient:
+        return self._async_state()["client"]
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        content: Optional[str] = None,
+        json: Any = None,
+        timeout: float = 15.0,
+        max_bytes: int = 65536,
+        retries: int = 2,
+        total_timeout: Optional[float] = None,
+        idempotent: Optional[bool] = None,
+    ) -> HttpResult:
+        host = httpx.URL(url).host
+        deadline = time.monotonic() + total_timeout if total_timeout else None
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if not idempotent:
+            retries = 0
+        attempt = 0
+        while True:
+            with self._host_limit(host):
+                with self.client().stream(
+                    method, url, headers=headers, content=content, json=json, timeout=self._attempt_timeout(timeout, deadline)
+                ) as resp:
+                    delay = self._next_delay(resp, attempt, retries, deadline)
+                    if delay is None:
+                        body = bytearray()
+                        for chunk in resp.iter_bytes():
+                            body += chunk
+                            if len(body) > max_bytes:
+                                break
+                        return self._result(resp, bytes(body), max_bytes)
+            time.sleep(delay)
+            attempt += 1
+
+    async def arequest(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        content: Optional[str] = None,
+        json: Any = None,
+        timeout: float = 15.0,
+        max_bytes: int = 65536,
+        retries: int = 2,
+        total_timeout: Optional[float] = None,
+        idempotent: Optional[bool] = None,
+    ) -> HttpResult:
+        state = self._async_state()
+        host = httpx.URL(url).host
+        limit = state["hosts"].get(host)
+        if limit is None:
+            limit = state["hosts"].setdefault(host, asyncio.Semaphore(self.per_host))
+        deadline = time.monotonic() + total_timeout if total_timeout else None
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if not idempotent:
+            retries = 0
+        attempt = 0
+        while True:
+            async with limit:
+                async with state["client"].stream(
+                    method, url, headers=headers, content=content, json=json, timeout=self._attempt_timeout(timeout, deadline)
+                ) as resp:
+                    delay = self._next_delay(resp, attempt, retries, deadline)
+                    if delay is None:
+                        body = bytearray()
+                        async for chunk in resp.aiter_bytes():
+                            body += chunk
+                            if len(body) > max_bytes:
+                                break
+                        return self._result(resp, bytes(body), max_bytes)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._async.pop(loop, None)
+        if state is not None:
+            await state["client"].aclose()
+
+    def _async_state(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._async.get(loop)
+            if state is None:
+                state = {
+                    "client": httpx.AsyncClient(
+                        limits=self.limits,
+                        http2=HTTP2 and self.async_transport is None,
+                        transport=self.async_transport,
+                        follow_redirects=True,
+                    ),
+                    "hosts": {},
+                }
+                self._async[loop] = state
+            return state
+
+    def _host_limit(self, host: str) -> threading.BoundedSemaphore:
+        limit = self._host_limits.get(host)
+        if limit is None:
+            with self._lock:
+                limit = self._host_limits.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        return limit
+
+    @staticmethod
+    def _attempt_timeout(timeout: float, deadline: Optional[float]) -> float:
+        if deadline is None:
+            return timeout
+        return max(0.001, min(timeout, deadline - time.monotonic()))
+
+    def _next_delay(self, resp: httpx.Response, attempt: int, retries: int, deadline: Optional[float]) -> Optional[float]:
+        # None when the response is final: not retryable, out of retries, or
+        # the backoff would run past total_timeout.
+        if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+            return None
+        delay = self._retry_delay(resp, attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _retry_delay(self, resp: httpx.Response, attempt: int) -> float:
+        retry_after = resp.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return min(self.max_backoff, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+    @staticmethod
+    def _result(resp: httpx.Response, body: bytes, max_bytes: int) -> HttpResult:
+        truncated = len(body) > max_bytes
+        return HttpResult(resp.status_code, resp.headers, body[:max_bytes], resp.encoding or "utf-8", truncated)
+
+
+_default_pool: Optional[HttpClientPool] = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> HttpClientPool:
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = HttpClientPool.from_env()
+    return _default_pool
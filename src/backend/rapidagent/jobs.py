@@ -0,0 +1,182 @@
+import os
+import uuid
+import socket
+import heapq
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .agents import AgentRegistry
+from .store import Store
+
+# (-priority, seq, job_id, agent_id): higher priority first, FIFO within one.
+Entry = Tuple[int, int, str, str]
+
+
+class JobQueue:
+    """Runs agent chats in the background on a bounded pool of worker threads.
+
+    Jobs live in the Store, so queued work survives a restart. A running job
+    is leased to the queue that claimed it and the lease is renewed while it
+    runs; jobs whose lease expired because their process stopped are queued
+    again, by this or any other process sharing the database. No agent runs
+    more than ``per_agent`` jobs at a time; its other jobs wait without
+    holding a worker.
+    """
+
+    def __init__(
+        self,
+        store: Store,
+        agents: AgentRegistry,
+        workers: Optional[int] = None,
+        per_agent: Optional[int] = None,
+        lease: Optional[float] = None,
+    ):
+        self.store = store
+        self.agents = agents
+        self.workers = workers or int(os.getenv("RAPIDAGENT_JOB_WORKERS", "4"))
+        self.per_agent = per_agent or int(os.getenv("RAPIDAGENT_JOB_PER_AGENT", "1"))
+        self.lease = lease or float(os.getenv("RAPIDAGENT_JOB_LEASE", "60"))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._cond = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._heap: List[Entry] = []
+        self._blocked: Dict[str, List[Entry]] = {}
+        self._running: Dict[str, int] = {}
+        self._active: Set[str] = set()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._started = False
+        self._closed = False
+
+    def start(self):
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._closed = False
+            self._stop.clear()
+            self.store.requeue_expired_jobs()
+            self._push(self.store.list_jobs(status="queued"))
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name="job-lease", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            self._started = True
+
+    def submit(self, agent_id: str, task: str, priority: int = 0, llm_options: Optional[Dict[str, Any]] = None) -> str:
+        if not self.store.get_agent(agent_id):
+            raise RuntimeError("Agent not found")
+        self.start()
+        job_id = str(uuid.uuid4())
+        seq = self.store.create_job(job_id, agent_id, task, priority, llm_options)
+        with self._cond:
+            heapq.heappush(self._heap, (-priority, seq, job_id, agent_id))
+            self._cond.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get_job(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        # Only queued jobs can be cancelled; workers skip them when popped.
+        return self.store.cancel_job(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "per_agent": self.per_agent,
+                "queued": len(self._heap) + sum(len(b) for b in self._blocked.values()),
+                "running": sum(self._running.values()),
+            }
+
+    def close(self, timeout: float = 5.0):
+        with self._start_lock:
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+            self._stop.set()
+            for thread in self._threads:
+                thread.join(timeout)
+            with self._cond:
+                self._threads = []
+                self._heap = []
+                self._blocked = {}
+            self._started = False
+
+    def _push(self, jobs: List[Dict[str, Any]]):
+        with self._cond:
+            for job in jobs:
+                heapq.heappush(self._heap, (-job["priority"], job["seq"], job["id"], job["agent_id"]))
+            self._cond.notify_all()
+
+    def _heartbeat(self):
+        # Renews the leases of jobs running here and takes over jobs whose
+        # owner stopped renewing theirs.
+        while not self._stop.wait(self.lease / 3):
+            try:
+                with self._cond:
+                    active = list(self._active)
+                self.store.renew_job_leases(self.owner, active, self.lease)
+                self._push(self.store.requeue_expired_jobs())
+            except Exception:
+                pass
+
+    def _work(self):
+        while True:
+            entry = self._next()
+            if entry is None:
+                return
+            try:
+                self._run(entry[2])
+            finally:
+                self._release(entry[3])
+
+    def _next(self) -> Optional[Entry]:
+        with self._cond:
+            while not self._closed:
+                while self._heap:
+                    entry = heapq.heappop(self._heap)
+                    agent_id = entry[3]
+                    if self._running.get(agent_id, 0) >= self.per_agent:
+                        self._blocked.setdefault(agent_id, []).append(entry)
+                        continue
+                    self._running[agent_id] = self._running.get(agent_id, 0) + 1
+                    return entry
+                self._cond.wait()
+            return None
+
+    def _release(self, agent_id: str):
+        with self._cond:
+            self._running[agent_id] -= 1
+            if not self._running[agent_id]:
+                del self._running[agent_id]
+            blocked = self._blocked.pop(agent_id, [])
+            for entry in blocked:
+                heapq.heappush(self._heap, entry)
+            if blocked:
+                self._cond.notify_all()
+
+    def _run(self, job_id: str):
+        # The claim fails for cancelled jobs and for jobs another process
+        # sharing the database already started.
+        if not self.store.claim_job(job_id, self.owner, self.lease):
+            return
+        with self._cond:
+            self._active.add(job_id)
+        try:
+            job = self.store.get_job(job_id)
+            try:
+                out = self.agents.run_react(job["agent_id"], job["task"], job["llm_options"])
+            except Exception as e:
+                self.store.finish_job(job_id, "failed", error=str(e), owner=self.owner)
+                return
+            if self.store.finish_job(job_id, "succeeded", result=out["result"], owner=self.owner):
+                self.store.add_agent_message(job["agent_id"], "assistant", out["result"])
+        finally:
+            with self._cond:
+                self._active.discard(job_id)
@@ -0,0 +1,215 @@
+import json
+from typing import Any, Dict, List, Optional
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_WHITESPACE = " \t\r\n"
+
+_START = 0
+_KEY_OR_END = 1
+_KEY_START = 2
+_KEY = 3
+_COLON = 4
+_VALUE_START = 5
+_STRING = 6
+_NESTED = 7
+_SCALAR = 8
+_AFTER_VALUE = 9
+
+
+class JSONStreamParser:
+    """Incrementally parses a single top-level JSON object from text chunks.
+
+    Top-level fields become available in ``fields`` as soon as their value is
+    complete, and a top-level string value can be read while it is still
+    streaming through ``string_value``.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self.failed = False
+        self.end = 0
+        self._pos = 0
+        self._state = _START
+        self._key = ""
+        self._raw_key: List[str] = []
+        self._chars: List[str] = []
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._value_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_escape = False
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        if self.done or self.failed:
+            return
+        text = self.text
+        while self._pos < len(text) and not (self.done or self.failed):
+            self._step(text[self._pos])
+            self._pos += 1
+
+    def string_value(self, key: str) -> Optional[str]:
+        if key in self.fields:
+            value = self.fields[key]
+            return value if isinstance(value, str) else None
+        if self._state == _STRING and self._key == key:
+            return "".join(self._chars)
+        return None
+
+    def object_text(self) -> str:
+        return self.text[: self.end] if self.done else self.text
+
+    def _fail(self):
+        self.failed = True
+
+    def _set_field(self, raw: str):
+        try:
+            self.fields[self._key] = json.loads(raw)
+        except ValueError:
+            self._fail()
+            return
+        self._state = _AFTER_VALUE
+
+    def _step(self, c: str):
+        state = self._state
+        if state == _START:
+            if c in _WHITESPACE:
+                return
+            if c == "{":
+                self._state = _KEY_OR_END
+                return
+            self._fail()
+        elif state in (_KEY_OR_END, _KEY_START):
+            if c in _WHITESPACE:
+                return
+            if c == '"':
+                self._raw_key = []
+                self._string_escape = False
+                self._state = _KEY
+                return
+            if c == "}" and state == _KEY_OR_END:
+                self._close()
+                return
+            self._fail()
+        elif state == _KEY:
+            if self._string_escape:
+                self._string_escape = False
+            elif c == "\\":
+                self._string_escape = True
+            elif c == '"':
+                try:
+                    self._key = json.loads('"' + "".join(self._raw_key) + '"')
+                except ValueError:
+                    self._fail()
+                    return
+                self._state = _COLON
+                return
+            self._raw_key.append(c)
+        elif state == _COLON:
+            if c in _WHITESPACE:
+                return
+            if c == ":":
+                self._state = _VALUE_START
+                return
+            self._fail()
+        elif state == _VALUE_START:
+            if c in _WHITESPACE:
+                return
+            self._value_start = self._pos
+            if c == '"':
+                self._chars = []
+                self._escape = None
+                self._high_surrogate = None
+                self._state = _STRING
+            elif c in "{[":
+                self._depth = 1
+                self._in_string = False
+                self._string_escape = False
+                self._state = _NESTED
+            else:
+                self._state = _SCALAR
+        elif state == _STRING:
+            self._string_char(c)
+        elif state == _NESTED:
+            if self._in_string:
+                if self._string_escape:
+                    self._string_escape = False
+                elif c == "\\":
+                    self._string_escape = True
+                elif c == '"':
+                    self._in_string = False
+                return
+            if c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._set_field(self.text[self._value_start : self._pos + 1])
+        elif state == _SCALAR:
+            if c in _WHITESPACE or c in ",}":
+                self._set_field(self.text[self._value_start : self._pos])
+                if not self.failed:
+                    self._step(c)
+        elif state == _AFTER_VALUE:
+            if c in _WHITESPACE:
+                return
+            if c == ",":
+                self._state = _KEY_START
+                return
+            if c == "}":
+                self._close()
+                return
+            self._fail()
+
+    def _string_char(self, c: str):
+        if self._escape is not None:
+            self._escape += c
+            if self._escape == "u" or (self._escape.startswith("u") and len(self._escape) < 5):
+                return
+            if self._escape.startswith("u"):
+                try:
+                    code = int(self._escape[1:], 16)
+                except ValueError:
+                    self._fail()
+                    return
+                self._escape = None
+                if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                    code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+                    self._high_surrogate = None
+                self._flush_surrogate()
+                if 0xD800 <= code < 0xDC00:
+                    self._high_surrogate = code
+                else:
+                    self._chars.append(chr(code))
+                return
+            decoded = _ESCAPES.get(self._escape)
+            self._escape = None
+            if decoded is None:
+                self._fail()
+                return
+            self._flush_surrogate()
+            self._chars.append(decoded)
+            return
+        if c != "\\":
+            self._flush_surrogate()
+        if c == "\\":
+            self._escape = ""
+        elif c == '"':
+            self.fields[self._key] = "".join(self._chars)
+            self._state = _AFTER_VALUE
+        else:
+            self._chars.append(c)
+
+    def _flush_surrogate(self):
+        if self._high_surrogate is not None:
+            self._chars.append(chr(self._high_surrogate))
+            self._high_surrogate = None
+
+    def _close(self):
+        self.done = True
+        self.end = self._pos + 1
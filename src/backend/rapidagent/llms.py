@@ -1,42 +1,415 @@
-import os
-from typing import Dict, Any, List, Optional
-from openai import OpenAI
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+from .clients import OpenAIClients
 from .store import Store
-from .tools import ToolRegistry, CalculatorTool, SearchTool
+from .tools import ToolRegistry, CalculatorTool, PythonCodeTool, SearchTool
+from .jsonstream import JSONStreamParser
+from .cache import CompletionCache
+from .ratelimit import RateLimiter, estimate_tokens
+from .singleflight import ABANDONED, SingleFlight
+from .providers import (
+    LatencyTracker,
+    OpenAIProvider,
+    Provider,
+    ahedged,
+    ahedged_stream,
+    astart_stream,
+    hedged,
+    hedged_stream,
+    start_stream,
+)
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
 import json
+import time
+import asyncio
+import threading
 
 class LLMRegistry:
-    def __init__(self, store: Store, tools: Optional[ToolRegistry] = None):
+    def __init__(
+        self,
+        store: Store,
+        tools: Optional[ToolRegistry] = None,
+        clients: Optional[OpenAIClients] = None,
+        cache: Optional[CompletionCache] = None,
+        limiter: Optional[RateLimiter] = None,
+        fallbacks: Optional[Dict[str, List[str]]] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+    ):
         self.store = store
         self.tools = tools or ToolRegistry([CalculatorTool(), SearchTool()])
+        self.clients = clients or OpenAIClients.from_env()
+        self.cache = cache
+        self.limiter = limiter or RateLimiter.from_env()
+        # provider -> ordered "provider" or "provider:model" entries to try
+        # when it fails, and to hedge against when it is slow.
+        self.fallbacks = fallbacks if fallbacks is not None else json.loads(os.getenv("RAPIDAGENT_LLM_FALLBACKS") or "{}")
+        percentile = os.getenv("RAPIDAGENT_LLM_HEDGE_PERCENTILE")
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else (float(percentile) if percentile else None)
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self.routing = {"fallbacks": 0, "hedged": 0, "hedge_wins": 0}
+        self._routing_lock = threading.Lock()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self.flight = SingleFlight()
+        self._hedge_lock = threading.Lock()
         if not self.store.get_kv("llm_default"):
             self.store.set_kv("llm_default", "openai:gpt-4o-mini")
-        self.providers = {"openai": self._run_openai}
+        self.backends: Dict[str, Provider] = {}
+        self.providers: Dict[str, Callable] = {}
+        self.async_providers: Dict[str, Callable] = {}
+        self.streamers: Dict[str, Callable] = {}
+        self.async_streamers: Dict[str, Callable] = {}
+        self.tool_callers: Dict[str, Callable] = {}
+        self.async_tool_callers: Dict[str, Callable] = {}
+        self.register_provider(OpenAIProvider("openai", self.clients))
+        for name in filter(None, (os.getenv("RAPIDAGENT_LLM_PROVIDERS") or "").split(",")):
+            self.register_provider(OpenAIProvider.from_env(name.strip()))
+
+    def register_provider(self, provider: Provider):
+        self.backends[provider.name] = provider
+        for table, method in (
+            (self.providers, "run"),
+            (self.async_providers, "arun"),
+            (self.streamers, "stream"),
+            (self.async_streamers, "astream"),
+            (self.tool_callers, "run_tools"),
+            (self.async_tool_callers, "arun_tools"),
+        ):
+            table.pop(provider.name, None)
+            if method in provider.capabilities:
+                table[provider.name] = getattr(provider, method)
 
     def list_providers(self) -> List[str]:
         return list(self.providers.keys())
 
     def list_models(self, provider: str) -> List[str]:
-        if provider == "openai":
-            return ["gpt-4o-mini", "gpt-4o", "gpt-3.5-turbo"]
-        return []
+        backend = self.backends.get(provider)
+        return list(backend.models) if backend else []
 
-    def run(self, provider: str, model: str, messages: List[Dict[str, str]]) -> str:
+    def routing_stats(self) -> Dict[str, Any]:
+        with self._routing_lock:
+            routing = dict(self.routing)
+        return {
+            **routing,
+            "fallback_chains": self.fallbacks,
+            "hedge_percentile": self.hedge_percentile,
+            "latency": self.latency.stats(),
+        }
+
+    def close(self):
+        for backend in self.backends.values():
+            backend.close()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+
+    async def aclose(self):
+        for backend in self.backends.values():
+            await backend.aclose()
+
+    def run(
+        self, provider: str, model: str, messages: List[Dict[str, str]], use_cache: bool = True, coalesce: bool = True
+    ) -> str:
         if provider not in self.providers:
             raise RuntimeError(f"Unknown provider {provider}")
-        return self.providers[provider](model, messages)
-
-    def _run_openai(self, model: str, messages: List[Dict[str, str]]) -> str:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError("OPENAI_API_KEY not set")
-        client = OpenAI(api_key=api_key)
-        resp = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=0
-        )
-        return resp.choices[0].message.content or ""
+        key = self._cache_key(provider, model, messages) if use_cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        def call() -> str:
+            result = self._call("run", self.providers, provider, model, (messages,), estimate_tokens(messages))
+            if key:
+                self.cache.put(key, result)
+            return result
+
+        if not coalesce:
+            return call()
+        return self.flight.do(self._flight_key("run", provider, model, messages), call)
+
+    def stream(self, provider: str, model: str, messages: List[Dict[str, str]]) -> Iterator[str]:
+        if provider in self.streamers:
+            yield from self._call_stream(provider, model, messages)
+            return
+        yield self.run(provider, model, messages)
+
+    def run_tools(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        functions: List[Dict[str, Any]],
+        use_cache: bool = True,
+        coalesce: bool = True,
+    ) -> Dict[str, Any]:
+        if provider not in self.tool_callers:
+            raise RuntimeError(f"Provider {provider} does not support tool calling")
+        key = self._cache_key(provider, model, messages, functions) if use_cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return json.loads(cached)
+
+        def call() -> Dict[str, Any]:
+            reply = self._call(
+                "tools", self.tool_callers, provider, model, (messages, functions), estimate_tokens(messages, functions)
+            )
+            if key:
+                self.cache.put(key, json.dumps(reply))
+            return reply
+
+        if not coalesce:
+            return call()
+        return self.flight.do(self._flight_key("tools", provider, model, messages, functions), call)
+
+    async def arun(
+        self, provider: str, model: str, messages: List[Dict[str, str]], use_cache: bool = True, coalesce: bool = True
+    ) -> str:
+        if provider not in self.async_providers:
+            raise RuntimeError(f"Unknown provider {provider}")
+        key = self._cache_key(provider, model, messages) if use_cache else None
+        if key:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+
+        async def call() -> str:
+            result = await self._acall("run", self.async_providers, provider, model, (messages,), estimate_tokens(messages))
+            if key:
+                await asyncio.to_thread(self.cache.put, key, result)
+            return result
+
+        if not coalesce:
+            return await call()
+        return await self.flight.ado(self._flight_key("run", provider, model, messages), call)
+
+    async def astream(self, provider: str, model: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        if provider in self.async_streamers:
+            async for chunk in self._acall_stream(provider, model, messages):
+                yield chunk
+            return
+        yield await self.arun(provider, model, messages)
+
+    async def arun_tools(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        functions: List[Dict[str, Any]],
+        use_cache: bool = True,
+        coalesce: bool = True,
+    ) -> Dict[str, Any]:
+        if provider not in self.async_tool_callers:
+            raise RuntimeError(f"Provider {provider} does not support tool calling")
+        key = self._cache_key(provider, model, messages, functions) if use_cache else None
+        if key:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return json.loads(cached)
+
+        async def call() -> Dict[str, Any]:
+            reply = await self._acall(
+                "tools", self.async_tool_callers, provider, model, (messages, functions), estimate_tokens(messages, functions)
+            )
+            if key:
+                await asyncio.to_thread(self.cache.put, key, json.dumps(reply))
+            return reply
+
+        if not coalesce:
+            return await call()
+        return await self.flight.ado(self._flight_key("tools", provider, model, messages, functions), call)
+
+    def _routes(self, table: Dict[str, Callable], provider: str, model: str) -> List[Tuple[str, str]]:
+        routes = [(provider, model)]
+        for entry in self.fallbacks.get(provider, []):
+            name, _, alt = entry.partition(":")
+            routes.append((name, alt or model))
+        return [route for route in routes if route[0] in table]
+
+    def _hedge_delay(self, kind: str, routes: List[Tuple[str, str]]) -> Optional[float]:
+        if self.hedge_percentile is None or len(routes) < 2:
+            return None
+        return self.latency.percentile((kind, *routes[0]), self.hedge_percentile, self.hedge_min_samples)
+
+    def _hedged(self, hedge: Optional[bool]):
+        if hedge is not None:
+            with self._routing_lock:
+                self.routing["hedged"] += 1
+                self.routing["hedge_wins"] += int(hedge)
+
+    def _fell_back(self):
+        with self._routing_lock:
+            self.routing["fallbacks"] += 1
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        if self._hedge_pool is None:
+            with self._hedge_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-hedge")
+        return self._hedge_pool
+
+    def _attempt(self, kind: str, table: Dict[str, Callable], route: Tuple[str, str], args: Tuple, cost: int) -> Any:
+        provider, model = route
+        start = time.monotonic()
+        result = self.limiter.get(provider, model).call(lambda: table[provider](model, *args), cost)
+        self.latency.observe((kind, provider, model), time.monotonic() - start)
+        return result
+
+    async def _aattempt(self, kind: str, table: Dict[str, Callable], route: Tuple[str, str], args: Tuple, cost: int) -> Any:
+        provider, model = route
+        start = time.monotonic()
+        result = await self.limiter.get(provider, model).acall(lambda: table[provider](model, *args), cost)
+        self.latency.observe((kind, provider, model), time.monotonic() - start)
+        return result
+
+    def _stream_attempt(self, table: Dict[str, Callable], route: Tuple[str, str], messages: List[Dict[str, str]], cost: int) -> Iterator[str]:
+        # Streams are timed to their first chunk.
+        provider, model = route
+        start = time.monotonic()
+        chunks = self.limiter.get(provider, model).stream(lambda: table[provider](model, messages), cost)
+        try:
+            for i, chunk in enumerate(chunks):
+                if i == 0:
+                    self.latency.observe(("stream", provider, model), time.monotonic() - start)
+                yield chunk
+        finally:
+            chunks.close()
+
+    async def _astream_attempt(
+        self, table: Dict[str, Callable], route: Tuple[str, str], messages: List[Dict[str, str]], cost: int
+    ) -> AsyncIterator[str]:
+        provider, model = route
+        start = time.monotonic()
+        chunks = self.limiter.get(provider, model).astream(lambda: table[provider](model, messages), cost)
+        first = True
+        try:
+            async for chunk in chunks:
+                if first:
+                    self.latency.observe(("stream", provider, model), time.monotonic() - start)
+                    first = False
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    def _call(self, kind: str, table: Dict[str, Callable], provider: str, model: str, args: Tuple, cost: int) -> Any:
+        routes = self._routes(table, provider, model)
+        attempts = [partial(self._attempt, kind, table, route, args, cost) for route in routes]
+        delay = self._hedge_delay(kind, routes)
+        error: Optional[Exception] = None
+        if delay is not None:
+            started: List[bool] = []
+            try:
+                result, hedge = hedged(attempts[0], _tracked(attempts[1], started), delay, self._hedge_executor())
+                self._hedged(hedge)
+                return result
+            except Exception as e:
+                # A primary that fails before the hedge delay never starts
+                # the backup, which is then the first fallback.
+                error, attempts = e, attempts[1 + len(started):]
+        for attempt in attempts:
+            if error is not None:
+                self._fell_back()
+            try:
+                return attempt()
+            except Exception as e:
+                error = e
+        raise error
+
+    async def _acall(self, kind: str, table: Dict[str, Callable], provider: str, model: str, args: Tuple, cost: int) -> Any:
+        routes = self._routes(table, provider, model)
+        attempts = [partial(self._aattempt, kind, table, route, args, cost) for route in routes]
+        delay = self._hedge_delay(kind, routes)
+        error: Optional[Exception] = None
+        if delay is not None:
+            started: List[bool] = []
+            try:
+                result, hedge = await ahedged(attempts[0], _tracked(attempts[1], started), delay)
+                self._hedged(hedge)
+                return result
+            except Exception as e:
+                # A primary that fails before the hedge delay never starts
+                # the backup, which is then the first fallback.
+                error, attempts = e, attempts[1 + len(started):]
+        for attempt in attempts:
+            if error is not None:
+                self._fell_back()
+            try:
+                return await attempt()
+            except Exception as e:
+                error = e
+        raise error
+
+    def _call_stream(self, provider: str, model: str, messages: List[Dict[str, str]]) -> Iterator[str]:
+        # Fallback and hedging only apply until the first chunk arrives.
+        routes = self._routes(self.streamers, provider, model)
+        attempts = [partial(self._stream_attempt, self.streamers, route, messages, estimate_tokens(messages)) for route in routes]
+        delay = self._hedge_delay("stream", routes)
+        chunks: Optional[Iterator[str]] = None
+        error: Optional[Exception] = None
+        if delay is not None:
+            started: List[bool] = []
+            try:
+                chunks, hedge = hedged_stream(attempts[0], _tracked(attempts[1], started), delay, self._hedge_executor())
+                self._hedged(hedge)
+            except Exception as e:
+                # A primary that fails before the hedge delay never starts
+                # the backup, which is then the first fallback.
+                error, attempts = e, attempts[1 + len(started):]
+        for attempt in attempts if chunks is None else []:
+            if error is not None:
+                self._fell_back()
+            try:
+                chunks = start_stream(attempt())
+                break
+            except Exception as e:
+                error = e
+        if chunks is None:
+            raise error
+        yield from chunks
+
+    async def _acall_stream(self, provider: str, model: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        routes = self._routes(self.async_streamers, provider, model)
+        attempts = [
+            partial(self._astream_attempt, self.async_streamers, route, messages, estimate_tokens(messages)) for route in routes
+        ]
+        delay = self._hedge_delay("stream", routes)
+        chunks: Optional[AsyncIterator[str]] = None
+        error: Optional[Exception] = None
+        if delay is not None:
+            started: List[bool] = []
+            try:
+                chunks, hedge = await ahedged_stream(attempts[0], _tracked(attempts[1], started), delay)
+                self._hedged(hedge)
+            except Exception as e:
+                # A primary that fails before the hedge delay never starts
+                # the backup, which is then the first fallback.
+                error, attempts = e, attempts[1 + len(started):]
+        for attempt in attempts if chunks is None else []:
+            if error is not None:
+                self._fell_back()
+            try:
+                chunks = await astart_stream(attempt())
+                break
+            except Exception as e:
+                error = e
+        if chunks is None:
+            raise error
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    @staticmethod
+    def _flight_key(kind: str, provider: str, model: str, messages: List[Dict[str, Any]], extra: Any = None) -> str:
+        return json.dumps([kind, provider, model, messages, extra], sort_keys=True, default=str)
+
+    def _cache_key(self, provider: str, model: str, messages: List[Dict[str, Any]], extra: Any = None) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.key(provider, model, messages, extra)
 
     def run_react(
         self,
@@ -45,13 +418,201 @@ class LLMRegistry:
         task: str,
         max_steps: int = 6,
         tools: Optional[List[str]] = None,
+        stream: bool = False,
+        mode: str = "json",
+        llm_options: Optional[Dict[str, Any]] = None,
     ) -> List[Dict[str, Any]]:
-        allowed = tools or []
+        return [
+            step
+            for step in self.iter_react(
+                provider, model, task, max_steps=max_steps, tools=tools, stream=stream, mode=mode, llm_options=llm_options
+            )
+            if step["role"] != "token"
+        ]
+
+    def iter_react(
+        self,
+        provider: str,
+        model: str,
+        task: str,
+        max_steps: int = 6,
+        tools: Optional[List[str]] = None,
+        stream: bool = False,
+        mode: str = "json",
+        llm_options: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        options = llm_options or {}
+        if mode == "functions":
+            yield from self._iter_react_functions(provider, model, task, max_steps, tools, options)
+            return
+        if mode != "json":
+            raise RuntimeError(f"Unknown ReAct mode {mode}")
+        allowed = self._allowed_tools(tools)
+        messages = self._json_messages(task, allowed)
+        for _ in range(max_steps):
+            if stream:
+                output = yield from self._stream_turn(
+                    provider, model, messages, options.get("use_cache", True), options.get("coalesce", True)
+                )
+            else:
+                output = self.run(provider, model, messages, **options).strip()
+            kind, value = self._parse_json_turn(output)
+            if kind == "final":
+                yield {"role": "final", "content": value}
+                return
+            messages.append({"role": "assistant", "content": output})
+            if kind == "thought":
+                yield {"role": "thought", "content": value}
+                continue
+            for tool_name, tool_input in value:
+                yield {"role": "action", "tool": tool_name, "input": tool_input}
+            observations = self._run_actions(value, lambda name: name in allowed, options.get("coalesce", True))
+            for (tool_name, _), observation in zip(value, observations):
+                yield {"role": "observation", "tool": tool_name, "output": observation}
+            messages.append(self._observation_message(value, observations))
+        yield {"role": "final", "content": ""}
+
+    async def arun_react(
+        self,
+        provider: str,
+        model: str,
+        task: str,
+        max_steps: int = 6,
+        tools: Optional[List[str]] = None,
+        stream: bool = False,
+        mode: str = "json",
+        llm_options: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        return [
+            step
+            async for step in self.aiter_react(
+                provider, model, task, max_steps=max_steps, tools=tools, stream=stream, mode=mode, llm_options=llm_options
+            )
+            if step["role"] != "token"
+        ]
+
+    async def aiter_react(
+        self,
+        provider: str,
+        model: str,
+        task: str,
+        max_steps: int = 6,
+        tools: Optional[List[str]] = None,
+        stream: bool = False,
+        mode: str = "json",
+        llm_options: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        options = llm_options or {}
+        if mode == "functions":
+            async for step in self._aiter_react_functions(provider, model, task, max_steps, tools, options):
+                yield step
+            return
+        if mode != "json":
+            raise RuntimeError(f"Unknown ReAct mode {mode}")
+        allowed = self._allowed_tools(tools)
+        messages = self._json_messages(task, allowed)
+        for _ in range(max_steps):
+            if stream:
+                outputs: List[str] = []
+                async for token in self._astream_turn(
+                    provider, model, messages, options.get("use_cache", True), outputs, options.get("coalesce", True)
+                ):
+                    yield token
+                output = outputs[0]
+            else:
+                output = (await self.arun(provider, model, messages, **options)).strip()
+            kind, value = self._parse_json_turn(output)
+            if kind == "final":
+                yield {"role": "final", "content": value}
+                return
+            messages.append({"role": "assistant", "content": output})
+            if kind == "thought":
+                yield {"role": "thought", "content": value}
+                continue
+            for tool_name, tool_input in value:
+                yield {"role": "action", "tool": tool_name, "input": tool_input}
+            observations = await self._arun_actions(value, lambda name: name in allowed, options.get("coalesce", True))
+            for (tool_name, _), observation in zip(value, observations):
+                yield {"role": "observation", "tool": tool_name, "output": observation}
+            messages.append(self._observation_message(value, observations))
+        yield {"role": "final", "content": ""}
+
+    def _iter_react_functions(
+        self,
+        provider: str,
+        model: str,
+        task: str,
+        max_steps: int,
+        tools: Optional[List[str]],
+        options: Dict[str, Any],
+    ) -> Iterator[Dict[str, Any]]:
+        allowed = self._allowed_tools(tools)
+        functions = self.tools.function_schemas(allowed)
+        messages = self._functions_messages(task)
+        for _ in range(max_steps):
+            reply = self.run_tools(provider, model, messages, functions, **options)
+            content = reply["content"].strip()
+            calls = reply["tool_calls"]
+            if not calls:
+                yield {"role": "final", "content": content}
+                return
+            if content:
+                yield {"role": "thought", "content": content}
+            messages.append(self._tool_call_message(content, calls))
+            actions = [(call["name"], self._function_input(call["name"], call["arguments"])) for call in calls]
+            for tool_name, tool_input in actions:
+                yield {"role": "action", "tool": tool_name, "input": tool_input}
+            observations = self._run_actions(actions, lambda name: name in allowed, options.get("coalesce", True))
+            for call, observation in zip(calls, observations):
+                yield {"role": "observation", "tool": call["name"], "output": observation}
+                messages.append({"role": "tool", "tool_call_id": call["id"], "content": observation})
+        yield {"role": "final", "content": ""}
+
+    async def _aiter_react_functions(
+        self,
+        provider: str,
+        model: str,
+        task: str,
+        max_steps: int,
+        tools: Optional[List[str]],
+        options: Dict[str, Any],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        allowed = self._allowed_tools(tools)
+        functions = self.tools.function_schemas(allowed)
+        messages = self._functions_messages(task)
+        for _ in range(max_steps):
+            reply = await self.arun_tools(provider, model, messages, functions, **options)
+            content = reply["content"].strip()
+            calls = reply["tool_calls"]
+            if not calls:
+                yield {"role": "final", "content": content}
+                return
+            if content:
+                yield {"role": "thought", "content": content}
+            messages.append(self._tool_call_message(content, calls))
+            actions = [(call["name"], self._function_input(call["name"], call["arguments"])) for call in calls]
+            for tool_name, tool_input in actions:
+                yield {"role": "action", "tool": tool_name, "input": tool_input}
+            observations = await self._arun_actions(actions, lambda name: name in allowed, options.get("coalesce", True))
+            for call, observation in zip(calls, observations):
+                yield {"role": "observation", "tool": call["name"], "output": observation}
+                messages.append({"role": "tool", "tool_call_id": call["id"], "content": observation})
+        yield {"role": "final", "content": ""}
+
+    def _allowed_tools(self, tools: Optional[List[str]]) -> List[str]:
+        # No tools (None or an empty list, the default for stored agents)
+        # allows every registered tool, in both ReAct modes.
+        return list(tools) if tools else list(self.tools.tools)
+
+    @staticmethod
+    def _json_messages(task: str, allowed: List[str]) -> List[Dict[str, str]]:
         tool_list = ", ".join(allowed) if allowed else "none"
         schema = (
             "Respond ONLY as a single-line JSON object per turn using one of these schemas:\n"
             "{\"type\":\"thought\",\"content\":\"...\"}\n"
             "{\"type\":\"action\",\"action\":\"tool_name\",\"input\":\"...\"}\n"
+            "{\"type\":\"action\",\"actions\":[{\"action\":\"tool_name\",\"input\":\"...\"}, ...]}"
+            " (to run several independent tools at once)\n"
             "{\"type\":\"final\",\"content\":\"...\"}\n"
             f"Allowed tools: {tool_list}."
         )
@@ -59,47 +620,236 @@ class LLMRegistry:
             "You are a ReAct agent. Think step-by-step. Use tools when helpful. "
             "Follow the JSON schema strictly. Do not include any non-JSON text."
         )
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "system", "content": schema},
             {"role": "user", "content": task},
         ]
-        trace: List[Dict[str, Any]] = []
-        for _ in range(max_steps):
-            output = self.run(provider, model, messages).strip()
-            try:
-                parsed = json.loads(output)
-            except Exception:
-                trace.append({"role": "final", "content": output})
-                return trace
-            t = str(parsed.get("type", "")).lower()
-            if t == "thought":
-                content = str(parsed.get("content", ""))
-                trace.append({"role": "thought", "content": content})
-                messages.append({"role": "assistant", "content": output})
-                continue
-            if t == "action":
-                tool_name = str(parsed.get("action", ""))
-                tool_input = str(parsed.get("input", ""))
-                action_entry = {"tool": tool_name, "input": tool_input}
-                if allowed and tool_name not in allowed:
-                    observation = f"Error: Tool {tool_name} not allowed."
-                    trace.append({"role": "action", **action_entry})
-                    trace.append({"role": "observation", "tool": tool_name, "output": observation})
-                    messages.append({"role": "assistant", "content": output})
-                    messages.append({"role": "system", "content": f"Observation: {observation}"})
-                    continue
-                result = self.tools.run(tool_name, tool_input)
-                trace.append({"role": "action", **action_entry})
-                trace.append({"role": "observation", "tool": tool_name, "output": str(result)})
-                messages.append({"role": "assistant", "content": output})
-                messages.append({"role": "system", "content": f"Observation: {result}"})
-                continue
-            if t == "final":
-                content = str(parsed.get("content", ""))
-                trace.append({"role": "final", "content": content})
-                return trace
-            trace.append({"role": "final", "content": output})
-            return trace
-        trace.append({"role": "final", "content": ""})
-        return trace
+
+    @staticmethod
+    def _parse_json_turn(output: str) -> Tuple[str, Any]:
+        try:
+            parsed = json.loads(output)
+        except Exception:
+            return "final", output
+        if not isinstance(parsed, dict):
+            return "final", output
+        t = str(parsed.get("type", "")).lower()
+        if t == "thought":
+            return "thought", str(parsed.get("content", ""))
+        if t == "action":
+            requested = parsed.get("actions") if isinstance(parsed.get("actions"), list) else [parsed]
+            calls = [(str(a.get("action", "")), str(a.get("input", ""))) for a in requested if isinstance(a, dict)]
+            return ("action", calls) if calls else ("final", output)
+        if t == "final":
+            return "final", str(parsed.get("content", ""))
+        return "final", output
+
+    @staticmethod
+    def _observation_message(calls: List[Tuple[str, str]], observations: List[str]) -> Dict[str, str]:
+        if len(calls) == 1:
+            return {"role": "system", "content": f"Observation: {observations[0]}"}
+        lines = [f"[{i}] {name}: {obs}" for i, ((name, _), obs) in enumerate(zip(calls, observations), 1)]
+        return {"role": "system", "content": "Observations:\n" + "\n".join(lines)}
+
+    @staticmethod
+    def _functions_messages(task: str) -> List[Dict[str, Any]]:
+        system_prompt = (
+            "You are a ReAct agent. Before calling tools, briefly state your reasoning in the message content. "
+            "Call tools when helpful. When you have the answer, reply with it directly without calling any tool."
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": task},
+        ]
+
+    @staticmethod
+    def _tool_call_message(content: str, calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "role": "assistant",
+            "content": content or None,
+            "tool_calls": [
+                {"id": c["id"], "type": "function", "function": {"name": c["name"], "arguments": c["arguments"]}}
+                for c in calls
+            ],
+        }
+
+    def _run_actions(
+        self, calls: List[Tuple[str, str]], is_allowed: Callable[[str], bool], coalesce: bool = True
+    ) -> List[str]:
+        runnable = [(i, call) for i, call in enumerate(calls) if is_allowed(call[0])]
+        observations = [f"Error: Tool {name} not allowed." for name, _ in calls]
+        results = self.tools.run_many([call for _, call in runnable], coalesce=coalesce) if runnable else []
+        for (i, _), result in zip(runnable, results):
+            observations[i] = str(result)
+        return observations
+
+    async def _arun_actions(
+        self, calls: List[Tuple[str, str]], is_allowed: Callable[[str], bool], coalesce: bool = True
+    ) -> List[str]:
+        runnable = [(i, call) for i, call in enumerate(calls) if is_allowed(call[0])]
+        observations = [f"Error: Tool {name} not allowed." for name, _ in calls]
+        results = await self.tools.arun_many([call for _, call in runnable], coalesce=coalesce) if runnable else []
+        for (i, _), result in zip(runnable, results):
+            observations[i] = str(result)
+        return observations
+
+    def _function_input(self, name: str, arguments: str) -> Any:
+        try:
+            args = json.loads(arguments) if arguments else {}
+        except Exception:
+            return arguments
+        wrapped = isinstance(args, dict) and set(args) == {"input"}
+        tool = self.tools.tools.get(name)
+        if isinstance(tool, PythonCodeTool):
+            # Python tools get decoded values, as in pipelines: the object
+            # for object schemas, otherwise the wrapped "input" value.
+            object_schema = (tool.input_schema or {}).get("type") == "object"
+            return args["input"] if wrapped and not object_schema else args
+        if wrapped:
+            return str(args["input"])
+        return json.dumps(args, ensure_ascii=False)
+
+    def _stream_turn(
+        self, provider: str, model: str, messages: List[Dict[str, str]], use_cache: bool = True, coalesce: bool = True
+    ):
+        turn = _TurnStream()
+        key = self._cache_key(provider, model, messages) if use_cache else None
+        cached = self.cache.get(key) if key else None
+        flight = None
+        if cached is None and coalesce:
+            # Followers of an identical in-flight turn replay the leader's
+            # output as if it had come from the cache.
+            flight_key = self._flight_key("turn", provider, model, messages)
+            call, leader = self.flight.begin(flight_key)
+            if leader:
+                flight = (flight_key, call)
+            else:
+                shared = call.wait()
+                cached = None if shared is ABANDONED else shared
+        chunks = iter([cached]) if cached is not None else self.stream(provider, model, messages)
+        try:
+            for chunk in chunks:
+                token = turn.feed(chunk)
+                if turn.done:
+                    break
+                if token:
+                    yield {"role": "token", "content": token}
+        except Exception as e:
+            if flight:
+                self.flight.finish(*flight, error=e)
+            raise
+        except BaseException:
+            if flight:
+                self.flight.abandon(*flight)
+            raise
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+        output = turn.output()
+        if flight:
+            self.flight.finish(*flight, output)
+        if key and cached is None:
+            self.cache.put(key, output)
+        token = turn.finish()
+        if token:
+            yield {"role": "token", "content": token}
+        return output
+
+    async def _astream_turn(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        use_cache: bool,
+        outputs: List[str],
+        coalesce: bool = True,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # Async generators cannot return a value, so the raw turn output is
+        # appended to ``outputs`` instead.
+        turn = _TurnStream()
+        key = self._cache_key(provider, model, messages) if use_cache else None
+        cached = await asyncio.to_thread(self.cache.get, key) if key else None
+        flight = None
+        if cached is None and coalesce:
+            flight_key = self._flight_key("turn", provider, model, messages)
+            call, leader = self.flight.begin(flight_key)
+            if leader:
+                flight = (flight_key, call)
+            else:
+                shared = await call.wait_async()
+                cached = None if shared is ABANDONED else shared
+        chunks = _aiter([cached]) if cached is not None else self.astream(provider, model, messages)
+        try:
+            async for chunk in chunks:
+                token = turn.feed(chunk)
+                if turn.done:
+                    break
+                if token:
+                    yield {"role": "token", "content": token}
+        except Exception as e:
+            if flight:
+                self.flight.finish(*flight, error=e)
+            raise
+        except BaseException:
+            if flight:
+                self.flight.abandon(*flight)
+            raise
+        finally:
+            await chunks.aclose()
+        output = turn.output()
+        if flight:
+            self.flight.finish(*flight, output)
+        if key and cached is None:
+            await asyncio.to_thread(self.cache.put, key, output)
+        token = turn.finish()
+        if token:
+            yield {"role": "token", "content": token}
+        outputs.append(output)
+
+
+class _TurnStream:
+    """Feeds a streamed JSON ReAct turn to the parser and works out which
+    part of a ``final`` answer's content has not been emitted yet."""
+
+    def __init__(self):
+        self.parser = JSONStreamParser()
+        self.sent = 0
+
+    @property
+    def done(self) -> bool:
+        return self.parser.done
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.parser.feed(chunk)
+        return None if self.parser.done else self._delta()
+
+    def finish(self) -> Optional[str]:
+        return self._delta() if self.parser.done else None
+
+    def output(self) -> str:
+        return self.parser.object_text().strip() if self.parser.done else self.parser.text.strip()
+
+    def _delta(self) -> Optional[str]:
+        parser = self.parser
+        if parser.failed or str(parser.fields.get("type", "")).lower() != "final":
+            return None
+        content = parser.string_value("content")
+        if content is None or len(content) <= self.sent:
+            return None
+        delta = content[self.sent:]
+        self.sent = len(content)
+        return delta
+
+
+def _tracked(attempt: Callable, started: List[bool]) -> Callable:
+    def call():
+        started.append(True)
+        return attempt()
+    return call
+
+
+async def _aiter(items: List[str]) -> AsyncIterator[str]:
+    for item in items:
+        yield item
@@ -1,15 +1,57 @@
+import os
+import time
 import uuid
 import json
+import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, FrozenSet, List, NamedTuple, Optional, Tuple
 from .store import Store
-from .tools import ToolRegistry
+from .tools import Tool, ToolRegistry
+
+
+class PlanStep(NamedTuple):
+    order: int
+    tool: Tool
+    python: bool
+    lookups: Tuple[Tuple[str, str], ...]
+    deps: FrozenSet[int]
+    loose_keys: Tuple[str, ...]
+    signature: str
+
+
+class PipelinePlan(NamedTuple):
+    """A pipeline compiled against the current tools; see PipelineRegistry.plan."""
+
+    id: str
+    steps: Tuple[PlanStep, ...]
+    tool_versions: Tuple[Tuple[str, Optional[int]], ...]
 
 
 class PipelineRegistry:
-    def __init__(self, store: Store, tools: ToolRegistry):
+    def __init__(
+        self,
+        store: Store,
+        tools: ToolRegistry,
+        max_workers: Optional[int] = None,
+        cache_ttl: Optional[float] = None,
+        cache_max_rows: Optional[int] = None,
+        evict_every: int = 256,
+    ):
         self.store = store
         self.tools = tools
+        self.max_workers = max_workers or int(os.getenv("RAPIDAGENT_PIPELINE_WORKERS", "8"))
+        # Step outputs of HTTP/search tools go stale, so cached rows expire and
+        # the table is trimmed to the newest rows every ``evict_every`` writes.
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv("RAPIDAGENT_STEP_CACHE_TTL", "86400"))
+        self.cache_max_rows = cache_max_rows or int(os.getenv("RAPIDAGENT_STEP_CACHE_ROWS", "100000"))
+        self.evict_every = evict_every
+        self._cache_puts = 0
+        self._cache_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._plans: Dict[str, PipelinePlan] = {}
         self._init_schema()
 
     def _init_schema(self):
@@ -35,95 +77,265 @@ class PipelineRegistry:
             )
             """
         )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_pipelines_created ON pipelines (created_at, id)")
         self.store.conn.commit()
 
-    def create_pipeline(self, name: str, description: str, steps: List[Dict[str, Any]]) -> str:
-        pipeline_id = str(uuid.uuid4())
-        cur = self.store.conn.cursor()
-        cur.execute(
-            "INSERT INTO pipelines (id, name, description, created_at) VALUES (?, ?, ?, ?)",
-            (pipeline_id, name, description, datetime.utcnow().isoformat()),
-        )
-        for idx, step in enumerate(steps):
-            cur.execute(
+    def create_pipeline(
+        self,
+        name: str,
+        description: str,
+        steps: List[Dict[str, Any]],
+        pipeline_id: Optional[str] = None,
+        created_at: Optional[str] = None,
+    ) -> str:
+        pipeline_id = pipeline_id or str(uuid.uuid4())
+        conn = self.store.conn
+        with conn:
+            conn.execute(
+                "INSERT INTO pipelines (id, name, description, created_at) VALUES (?, ?, ?, ?)",
+                (pipeline_id, name, description, created_at or datetime.utcnow().isoformat()),
+            )
+            conn.executemany(
                 "INSERT INTO pipeline_steps (pipeline_id, step_order, tool_name, input_mapping) VALUES (?, ?, ?, ?)",
-                (pipeline_id, idx, step["tool"], json.dumps(step.get("input_mapping", {}))),
+                [
+                    (pipeline_id, idx, step["tool"], json.dumps(step.get("input_mapping", {})))
+                    for idx, step in enumerate(steps)
+                ],
             )
-        self.store.conn.commit()
+        self.invalidate(pipeline_id)
         return pipeline_id
 
-    def list_pipelines(self) -> List[Dict[str, Any]]:
-        cur = self.store.conn.cursor()
-        cur.execute("SELECT id, name, description, created_at FROM pipelines")
+    def import_json(self, path: str) -> int:
+        if self.store.get_kv("pipelines_imported") or not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            data = json.load(f)
+        imported = 0
+        for p in data:
+            if self.store.conn.execute("SELECT 1 FROM pipelines WHERE id=?", (p["id"],)).fetchone():
+                continue
+            self.create_pipeline(
+                p.get("name", ""), p.get("description") or "", p.get("steps", []), p["id"], p.get("created_at")
+            )
+            imported += 1
+        self.store.set_kv("pipelines_imported", path)
+        return imported
+
+    def list_pipelines(self, limit: Optional[int] = None, after_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        where, params = "", []
+        if after_id is not None:
+            where = " WHERE (created_at, id) > (SELECT created_at, id FROM pipelines WHERE id=?)"
+            params.append(after_id)
+        page = f"FROM pipelines{where} ORDER BY created_at, id"
+        if limit is not None:
+            page += " LIMIT ?"
+            params.append(limit)
+        conn = self.store.conn
+        rows = conn.execute(f"SELECT id, name, description, created_at {page}", params).fetchall()
+        steps = self._steps(f"SELECT id {page}", params)
         return [
-            {"id": r[0], "name": r[1], "description": r[2], "created_at": r[3]}
-            for r in cur.fetchall()
+            {"id": r[0], "name": r[1], "description": r[2], "created_at": r[3], "steps": steps.get(r[0], [])}
+            for r in rows
         ]
 
     def get_pipeline(self, pipeline_id: str) -> Optional[Dict[str, Any]]:
-        cur = self.store.conn.cursor()
-        cur.execute(
+        row = self.store.conn.execute(
             "SELECT id, name, description, created_at FROM pipelines WHERE id=?",
             (pipeline_id,),
-        )
-        row = cur.fetchone()
+        ).fetchone()
         if not row:
             return None
-        cur.execute(
-            "SELECT step_order, tool_name, input_mapping FROM pipeline_steps WHERE pipeline_id=? ORDER BY step_order",
-            (pipeline_id,),
-        )
-        steps = [
-            {"order": r[0], "tool": r[1], "input_mapping": json.loads(r[2])}
-            for r in cur.fetchall()
-        ]
         return {
             "id": row[0],
             "name": row[1],
             "description": row[2],
             "created_at": row[3],
-            "steps": steps,
+            "steps": self._steps("SELECT ?", [pipeline_id]).get(pipeline_id, []),
         }
 
-    def run_pipeline(self, pipeline_id: str, initial_input: Dict[str, Any]) -> Dict[str, Any]:
+    def _steps(self, ids_sql: str, params: List[Any]) -> Dict[str, List[Dict[str, Any]]]:
+        steps: Dict[str, List[Dict[str, Any]]] = {}
+        for r in self.store.conn.execute(
+            "SELECT pipeline_id, step_order, tool_name, input_mapping FROM pipeline_steps "
+            f"WHERE pipeline_id IN ({ids_sql}) ORDER BY pipeline_id, step_order",
+            params,
+        ):
+            steps.setdefault(r[0], []).append({"order": r[1], "tool": r[2], "input_mapping": json.loads(r[3])})
+        return steps
+
+    def run_pipeline(
+        self,
+        pipeline_id: str,
+        initial_input: Dict[str, Any],
+        use_cache: bool = False,
+        fresh: Optional[List[int]] = None,
+    ) -> Dict[str, Any]:
+        return self.execute(self.plan(pipeline_id), initial_input, use_cache=use_cache, fresh=fresh)
+
+    def plan(self, pipeline_id: str) -> PipelinePlan:
+        plan = self._plans.get(pipeline_id)
+        if plan is not None and all(self.tools.versions.get(n) == v for n, v in plan.tool_versions):
+            return plan
         pipeline = self.get_pipeline(pipeline_id)
         if not pipeline:
             raise RuntimeError("Pipeline not found")
+        plan = self.compile(pipeline)
+        self._plans[pipeline_id] = plan
+        return plan
 
-        context = dict(initial_input)
-        results = []
+    def invalidate(self, pipeline_id: Optional[str] = None):
+        if pipeline_id is None:
+            self._plans.clear()
+        else:
+            self._plans.pop(pipeline_id, None)
 
-        for step in pipeline["steps"]:
+    def compile(self, pipeline: Dict[str, Any]) -> PipelinePlan:
+        steps = pipeline["steps"]
+        index = {f"step_{step['order']}_output": i for i, step in enumerate(steps)}
+        planned = []
+        for i, step in enumerate(steps):
             tool = self.tools.tools.get(step["tool"])
             if not tool:
                 raise RuntimeError(f"Tool {step['tool']} not found")
-
-            mapped_inputs: Dict[str, Any] = {}
-            for k, v in step["input_mapping"].items():
-                mapped_inputs[k] = context.get(v)
-
-            if tool.type == "python":
-                output = tool.run(mapped_inputs)
-            else:
-                output = tool.run(mapped_inputs.get("input", ""))
-
-            results.append(
-                {
-                    "step": step["order"],
-                    "tool": step["tool"],
-                    "input": mapped_inputs,
-                    "output": output,
-                }
+            lookups = tuple(step["input_mapping"].items())
+            # A step depends on every earlier step whose output key it maps.
+            # Other keys are read from the initial input; when one is missing
+            # there it could only come from an earlier step merging a JSON
+            # object, so execute() then makes the step wait for all of them.
+            deps = frozenset(index[key] for _, key in lookups if index.get(key, i) < i)
+            loose = tuple(key for _, key in lookups if key not in index)
+            signature = json.dumps(
+                {"tool": tool.name, "definition": tool.definition()},
+                sort_keys=True,
+                separators=(",", ":"),
+                ensure_ascii=False,
+                default=str,
             )
+            planned.append(PlanStep(step["order"], tool, tool.type == "python", lookups, deps, loose, signature))
+        versions = tuple((name, self.tools.versions.get(name)) for name in sorted({s["tool"] for s in steps}))
+        return PipelinePlan(pipeline["id"], tuple(planned), versions)
+
+    def execute(
+        self,
+        plan: PipelinePlan,
+        initial_input: Dict[str, Any],
+        use_cache: bool = False,
+        fresh: Optional[List[int]] = None,
+    ) -> Dict[str, Any]:
+        steps = plan.steps
+        fresh_steps = set(fresh or [])
+        deps = [
+            step.deps if all(key in initial_input for key in step.loose_keys) else frozenset(range(i))
+            for i, step in enumerate(steps)
+        ]
+        outputs: Dict[int, Any] = {}
+        results: Dict[int, Dict[str, Any]] = {}
+        pending = list(range(len(steps)))
+        running: Dict[Future, int] = {}
+        started = time.perf_counter()
+        try:
+            while pending or running:
+                ready = [i for i in pending if deps[i].issubset(outputs)]
+                if ready:
+                    pending = [i for i in pending if i not in ready]
+                for i in ready:
+                    context = dict(initial_input)
+                    for d in sorted(deps[i]):
+                        self._merge_output(context, steps[d].order, outputs[d])
+                    args = (steps[i], context, use_cache, use_cache and steps[i].order not in fresh_steps)
+                    if len(ready) == 1 and not running:
+                        # Nothing to overlap with: skip the thread hand-off.
+                        results[i] = self._run_step(*args)
+                        outputs[i] = results[i]["output"]
+                    else:
+                        running[self._get_executor().submit(self._run_step, *args)] = i
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    results[i] = future.result()
+                    outputs[i] = results[i]["output"]
+        finally:
+            for future in running:
+                future.cancel()
+
+        context = dict(initial_input)
+        for i, step in enumerate(steps):
+            self._merge_output(context, step.order, outputs[i])
+
+        run = {
+            "pipeline": plan.id,
+            "results": [results[i] for i in range(len(steps))],
+            "final_context": context,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        if use_cache:
+            hits = sum(1 for r in run["results"] if r["cached"])
+            run["cache"] = {"hits": hits, "misses": len(steps) - hits, "fresh": len(fresh_steps)}
+        return run
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline")
+        return self._executor
+
+    def _run_step(
+        self, step: PlanStep, context: Dict[str, Any], use_cache: bool = False, read_cache: bool = False
+    ) -> Dict[str, Any]:
+        mapped_inputs = {k: context.get(v) for k, v in step.lookups}
+
+        started = time.perf_counter()
+        key = self._step_key(step, mapped_inputs) if use_cache else None
+        hit = self.store.get_step_cache(key, time.time() - self.cache_ttl) if read_cache else None
+        if hit is not None:
+            output = json.loads(hit)
+        elif step.python:
+            output = step.tool.run(mapped_inputs)
+        else:
+            output = step.tool.run(mapped_inputs.get("input", ""))
+        if key and hit is None and not (isinstance(output, str) and output.startswith("Error")):
+            self._put_step_cache(key, output)
+
+        result = {
+            "step": step.order,
+            "tool": step.tool.name,
+            "input": mapped_inputs,
+            "output": output,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        if use_cache:
+            result["cached"] = hit is not None
+        return result
+
+    def _put_step_cache(self, key: str, output: Any):
+        self.store.put_step_cache(key, json.dumps(output, default=str))
+        with self._cache_lock:
+            self._cache_puts += 1
+            evict = self._cache_puts % self.evict_every == 0
+        if evict:
+            self.store.evict_step_cache(self.cache_max_rows, time.time() - self.cache_ttl)
+
+    @staticmethod
+    def _step_key(step: PlanStep, mapped_inputs: Dict[str, Any]) -> str:
+        payload = json.dumps(mapped_inputs, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(f"{step.signature}\n{payload}".encode()).hexdigest()
 
-            if isinstance(output, str):
-                context[f"step_{step['order']}_output"] = output
-            else:
-                try:
-                    parsed = json.loads(output)
-                    if isinstance(parsed, dict):
-                        context.update(parsed)
-                except Exception:
-                    context[f"step_{step['order']}_output"] = output
-
-        return {"pipeline": pipeline_id, "results": results, "final_context": context}
+    @staticmethod
+    def _merge_output(context: Dict[str, Any], order: int, output: Any):
+        if isinstance(output, str):
+            context[f"step_{order}_output"] = output
+        else:
+            try:
+                parsed = json.loads(output)
+                if isinstance(parsed, dict):
+                    context.update(parsed)
+            except Exception:
+                context[f"step_{order}_output"] = output
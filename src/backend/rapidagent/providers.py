@@ -0,0 +1,333 @@
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, FrozenSet, Iterator, List, Optional, Tuple, TypeVar
+
+from .clients import OpenAIClients
+
+T = TypeVar("T")
+
+_END = object()
+
+
+CAPABILITIES = frozenset({"run", "stream", "run_tools", "arun", "astream", "arun_tools"})
+
+
+class Provider:
+    """An LLM backend. Subclasses implement the calls they support and list
+    them in ``capabilities``; only those are registered by
+    ``LLMRegistry.register_provider``."""
+
+    name: str = ""
+    models: List[str] = []
+    capabilities: FrozenSet[str] = frozenset()
+
+    def run(self, model: str, messages: List[Dict[str, str]]) -> str:
+        raise NotImplementedError
+
+    def stream(self, model: str, messages: List[Dict[str, str]]) -> Iterator[str]:
+        raise NotImplementedError
+
+    def run_tools(self, model: str, messages: List[Dict[str, Any]], functions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def arun(self, model: str, messages: List[Dict[str, str]]) -> str:
+        raise NotImplementedError
+
+    async def astream(self, model: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def arun_tools(
+        self, model: str, messages: List[Dict[str, Any]], functions: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+class OpenAIProvider(Provider):
+    """The OpenAI API or any OpenAI-compatible endpoint."""
+
+    capabilities = CAPABILITIES
+
+    def __init__(self, name: str = "openai", clients: Optional[OpenAIClients] = None, models: Optional[List[str]] = None):
+        self.name = name
+        self.clients = clients or OpenAIClients.from_env()
+        self.models = models or ["gpt-4o-mini", "gpt-4o", "gpt-3.5-turbo"]
+
+    @classmethod
+    def from_env(cls, name: str) -> "OpenAIProvider":
+        # A provider named "backup" reads BACKUP_API_KEY, BACKUP_BASE_URL, ...
+        return cls(name, OpenAIClients.from_env(prefix=name.upper()))
+
+    def run(self, model: str, messages: List[Dict[str, str]]) -> str:
+        client = self.clients.get()
+        resp = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0
+        )
+        return resp.choices[0].message.content or ""
+
+    def stream(self, model: str, messages: List[Dict[str, str]]) -> Iterator[str]:
+        client = self.clients.get()
+        resp = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0,
+            stream=True
+        )
+        try:
+            for chunk in resp:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            resp.close()
+
+    def run_tools(self, model: str, messages: List[Dict[str, Any]], functions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        client = self.clients.get()
+        kwargs: Dict[str, Any] = {"tools": functions} if functions else {}
+        resp = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0,
+            **kwargs
+        )
+        return self._tool_reply(resp.choices[0].message)
+
+    async def arun(self, model: str, messages: List[Dict[str, str]]) -> str:
+        client = self.clients.get_async()
+        resp = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0
+        )
+        return resp.choices[0].message.content or ""
+
+    async def astream(self, model: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        client = self.clients.get_async()
+        resp = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0,
+            stream=True
+        )
+        try:
+            async for chunk in resp:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await resp.close()
+
+    async def arun_tools(
+        self, model: str, messages: List[Dict[str, Any]], functions: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        client = self.clients.get_async()
+        kwargs: Dict[str, Any] = {"tools": functions} if functions else {}
+        resp = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0,
+            **kwargs
+        )
+        return self._tool_reply(resp.choices[0].message)
+
+    def close(self):
+        self.clients.close()
+
+    async def aclose(self):
+        await self.clients.aclose()
+
+    @staticmethod
+    def _tool_reply(message: Any) -> Dict[str, Any]:
+        return {
+            "content": message.content or "",
+            "tool_calls": [
+                {"id": c.id, "name": c.function.name, "arguments": c.function.arguments or ""}
+                for c in message.tool_calls or []
+            ],
+        }
+
+
+class LatencyTracker:
+    """Recent latencies per key, for picking hedge delays."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[Any, Deque[float]] = {}
+
+    def observe(self, key: Any, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key: Any, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            ":".join(key): {
+                "samples": len(self._samples[key]),
+                "p50": self.percentile(key, 50),
+                "p95": self.percentile(key, 95),
+                "p99": self.percentile(key, 99),
+            }
+            for key in keys
+        }
+
+
+# The hedging helpers start ``primary`` and, if it has not answered within
+# ``delay`` seconds, ``backup`` as well; the first success wins and the other
+# call is cancelled. They return (result, hedge) where hedge is None when no
+# backup was started and otherwise whether the backup won. If both calls
+# fail, the primary's error is raised.
+
+
+def hedged(primary: Callable[[], T], backup: Callable[[], T], delay: float, executor: Executor) -> Tuple[T, Optional[bool]]:
+    first = executor.submit(primary)
+    if wait([first], timeout=delay).done:
+        return first.result(), None
+    second = executor.submit(backup)
+    # A running thread cannot be interrupted; the losing call is abandoned
+    # and finishes in the background.
+    return _first_success([first, second], lambda future: future.cancel())
+
+
+def hedged_stream(
+    primary: Callable[[], Iterator[T]], backup: Callable[[], Iterator[T]], delay: float, executor: Executor
+) -> Tuple[Iterator[T], Optional[bool]]:
+    # Streams race to their first chunk.
+    chunks = [primary()]
+    first = executor.submit(next, chunks[0], _END)
+    if wait([first], timeout=delay).done:
+        return _resume(chunks[0], first.result()), None
+    chunks.append(backup())
+    second = executor.submit(next, chunks[1], _END)
+    futures = [first, second]
+
+    def discard(future: Future):
+        gen = chunks[futures.index(future)]
+        future.add_done_callback(lambda _: gen.close())
+
+    value, hedge = _first_success(futures, discard)
+    return _resume(chunks[int(hedge)], value), hedge
+
+
+def start_stream(chunks: Iterator[T]) -> Iterator[T]:
+    """Pulls the first chunk so a failing stream raises here."""
+    return _resume(chunks, next(chunks, _END))
+
+
+async def ahedged(
+    primary: Callable[[], Awaitable[T]], backup: Callable[[], Awaitable[T]], delay: float
+) -> Tuple[T, Optional[bool]]:
+    tasks = [asyncio.ensure_future(primary())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return tasks[0].result(), None
+        tasks.append(asyncio.ensure_future(backup()))
+        return await _afirst_success(tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def ahedged_stream(
+    primary: Callable[[], AsyncIterator[T]], backup: Callable[[], AsyncIterator[T]], delay: float
+) -> Tuple[AsyncIterator[T], Optional[bool]]:
+    chunks = [primary()]
+    tasks = [asyncio.ensure_future(_anext(chunks[0]))]
+    winner: Optional[int] = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            value = tasks[0].result()
+            winner = 0
+            return _aresume(chunks[0], value), None
+        chunks.append(backup())
+        tasks.append(asyncio.ensure_future(_anext(chunks[1])))
+        value, hedge = await _afirst_success(tasks)
+        winner = int(hedge)
+        return _aresume(chunks[winner], value), hedge
+    finally:
+        for i, task in enumerate(tasks):
+            if i != winner:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await chunks[i].aclose()
+
+
+async def astart_stream(chunks: AsyncIterator[T]) -> AsyncIterator[T]:
+    return _aresume(chunks, await _anext(chunks))
+
+
+def _first_success(futures: List[Future], discard: Callable[[Future], None]) -> Tuple[Any, bool]:
+    pending = set(futures)
+    errors: Dict[int, BaseException] = {}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    discard(other)
+                return future.result(), future is futures[1]
+            errors[futures.index(future)] = future.exception()
+    raise errors[0]
+
+
+async def _afirst_success(tasks: List["asyncio.Future"]) -> Tuple[Any, bool]:
+    pending = set(tasks)
+    errors: Dict[int, BaseException] = {}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                return task.result(), task is tasks[1]
+            errors[tasks.index(task)] = task.exception()
+    raise errors[0]
+
+
+def _resume(chunks: Iterator[T], first: Any) -> Iterator[T]:
+    try:
+        if first is _END:
+            return
+        yield first
+        yield from chunks
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+async def _anext(chunks: AsyncIterator[T]) -> Any:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+async def _aresume(chunks: AsyncIterator[T], first: Any) -> AsyncIterator[T]:
+    try:
+        if first is _END:
+            return
+        yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
@@ -1,16 +1,52 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from .store import Store
 
 class RAG:
-    def __init__(self, store: Store):
+    def __init__(self, store: Store, vectors=None, embedder=None):
         self.store = store
+        self.vectors = vectors
+        self.embedder = embedder
+        if (vectors is None) != (embedder is None):
+            raise ValueError("vectors and embedder must be configured together")
 
     def upsert(self, docs: List[Dict[str, Any]]):
+        batch = []
         for d in docs:
             doc_id = str(d.get("id") or self.store.random_id())
             text = str(d.get("text", ""))
             meta = d.get("metadata") or {}
-            self.store.upsert_doc(doc_id, text, meta)
+            batch.append((doc_id, text, meta))
+        self.store.upsert_docs(batch)
+        if self.vectors is not None and batch:
+            self.vectors.add([b[0] for b in batch], self.embedder.embed([b[1] for b in batch]))
 
-    def query(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        return self.store.search_docs(query, k)
+    def query(
+        self,
+        query: str,
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: str = "lexical",
+    ) -> List[Dict[str, Any]]:
+        if mode == "lexical":
+            return self.store.search_docs(query, k, filters)
+        if mode == "dense":
+            return self.query_dense([query], k, filters)[0]
+        raise ValueError(f"Unknown query mode {mode}")
+
+    def query_dense(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        if self.vectors is None:
+            raise RuntimeError("Dense retrieval is not configured")
+        fetch = k * 4 if filters else k
+        results = []
+        for hits in self.vectors.search(self.embedder.embed(queries), fetch):
+            scores = dict(hits)
+            docs = self.store.get_docs([doc_id for doc_id, _ in hits])
+            if filters:
+                docs = [d for d in docs if all(d["metadata"].get(key) == v for key, v in filters.items())]
+            results.append([{**d, "score": scores[d["id"]]} for d in docs[:k]])
+        return results
@@ -0,0 +1,415 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from openai import APIConnectionError
+
+T = TypeVar("T")
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], extra: Any = None, completion_tokens: int = 256) -> int:
+    # Roughly four characters per token, plus room for the reply.
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    if extra is not None:
+        chars += len(json.dumps(extra))
+    return chars // 4 + 4 * len(messages) + completion_tokens
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def is_transient(error: BaseException) -> bool:
+    # The errors the OpenAI SDK retries itself, other than 429s.
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 409) or status >= 500
+    return isinstance(error, (APIConnectionError, ConnectionError, TimeoutError))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return max(0.0, float(value) * scale)
+            except ValueError:
+                pass
+    return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def wait(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken; requests larger than the
+        bucket only wait for it to fill up."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        missing = min(amount, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wake(self):
+        self.event.set()
+
+    def wait(self, timeout: Optional[float]):
+        self.event.wait(timeout)
+        self.event.clear()
+
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # the waiter's loop is closed; it is never coming back
+
+    async def wait(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.event.clear()
+
+
+class ModelLimiter:
+    """Admission control for one provider/model.
+
+    Callers queue in arrival order and only the head of the queue may start a
+    request, once the requests-per-minute and tokens-per-minute buckets allow
+    it and fewer than ``limit`` requests are in flight. ``limit`` adapts
+    AIMD-style: it grows by about one per window of successful requests and
+    shrinks on 429s and on replies slower than ``latency_target``. Without
+    ``concurrency`` there is no cap until the first 429 or slow reply, which
+    sets it to half the requests then in flight. A 429 pauses the whole
+    queue for the Retry-After period before the call is retried; transient
+    errors (5xx, timeouts, connection errors) are retried after a backoff
+    without pausing the queue.
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        min_concurrency: int = 1,
+        max_concurrency: Optional[int] = None,
+        latency_target: Optional[float] = None,
+        max_retries: int = 4,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.limit = float(concurrency) if concurrency else math.inf
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency or math.inf
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.admitted = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        self._queue: Deque[Any] = deque()
+
+    def call(self, fn: Callable[[], T], cost: int = 1) -> T:
+        attempt = 0
+        while True:
+            self.acquire(cost)
+            start = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.release(None)
+                raise
+            self.release(time.monotonic() - start)
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], cost: int = 1) -> T:
+        attempt = 0
+        while True:
+            await self.aacquire(cost)
+            start = time.monotonic()
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.release(None)
+                raise
+            self.release(time.monotonic() - start)
+            return result
+
+    def stream(self, fn: Callable[[], Iterator[T]], cost: int = 1) -> Iterator[T]:
+        # The slot is held until the stream ends; failures are only retried
+        # before the first chunk has been passed on.
+        attempt = 0
+        while True:
+            self.acquire(cost)
+            start = time.monotonic()
+            chunks = fn()
+            try:
+                first = next(chunks)
+            except StopIteration:
+                self.release(time.monotonic() - start)
+                return
+            except BaseException as e:
+                # The failed attempt's stream is closed before any retry.
+                close = getattr(chunks, "close", None)
+                if close:
+                    close()
+                if not isinstance(e, Exception):
+                    self.release(None)
+                    raise
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            break
+        try:
+            yield first
+            yield from chunks
+        except BaseException:
+            self.release(None)
+            raise
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+        self.release(time.monotonic() - start)
+
+    async def astream(self, fn: Callable[[], AsyncIterator[T]], cost: int = 1) -> AsyncIterator[T]:
+        attempt = 0
+        while True:
+            await self.aacquire(cost)
+            start = time.monotonic()
+            chunks = fn()
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                self.release(time.monotonic() - start)
+                return
+            except BaseException as e:
+                # The failed attempt's stream is closed before any retry.
+                await chunks.aclose()
+                if not isinstance(e, Exception):
+                    self.release(None)
+                    raise
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            break
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        except BaseException:
+            self.release(None)
+            raise
+        finally:
+            await chunks.aclose()
+        self.release(time.monotonic() - start)
+
+    def acquire(self, cost: int = 1):
+        waiter = _Waiter()
+        with self._lock:
+            self._queue.append(waiter)
+        started = time.monotonic()
+        try:
+            while True:
+                with self._lock:
+                    wait = self._admit(waiter, cost)
+                if wait == 0:
+                    break
+                waiter.wait(wait)
+        except BaseException:
+            self._leave(waiter)
+            raise
+        with self._lock:
+            self.waited += time.monotonic() - started
+
+    async def aacquire(self, cost: int = 1):
+        waiter = _AsyncWaiter()
+        with self._lock:
+            self._queue.append(waiter)
+        started = time.monotonic()
+        try:
+            while True:
+                with self._lock:
+                    wait = self._admit(waiter, cost)
+                if wait == 0:
+                    break
+                await waiter.wait(wait)
+        except BaseException:
+            self._leave(waiter)
+            raise
+        with self._lock:
+            self.waited += time.monotonic() - started
+
+    def release(self, latency: Optional[float], throttled: bool = False, delay: float = 0.0):
+        with self._lock:
+            # An uncapped limiter starts from the concurrency it just saw.
+            current = self.limit if self.limit != math.inf else float(self.in_flight)
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.limit = max(self.min_concurrency, current / 2)
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            elif latency is not None:
+                if self.latency_target and latency > self.latency_target:
+                    self.limit = max(self.min_concurrency, current * 0.9)
+                elif self.limit != math.inf:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._wake_head()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2) if self.limit != math.inf else None,
+                "in_flight": self.in_flight,
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "throttled": self.throttled,
+                "waited_s": round(self.waited, 3),
+            }
+
+    def _admit(self, waiter: Any, cost: int) -> Optional[float]:
+        # Returns 0 once admitted, otherwise how long to sleep before trying
+        # again (None: until woken by a release).
+        if self._queue[0] is not waiter:
+            return None
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight + 1 > self.limit:
+            return None
+        wait = max(
+            self.requests.wait(1, now) if self.requests else 0.0,
+            self.tokens.wait(cost, now) if self.tokens else 0.0,
+        )
+        if wait > 0:
+            return wait
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(cost)
+        self._queue.popleft()
+        self.in_flight += 1
+        self.admitted += 1
+        self._wake_head()
+        return 0
+
+    def _leave(self, waiter: Any):
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                self._wake_head()
+
+    def _wake_head(self):
+        if self._queue:
+            self._queue[0].wake()
+
+    def _failed(self, error: Exception, attempt: int) -> Optional[float]:
+        """Releases the slot of a failed call. Returns how long to sleep
+        before retrying it, or None when it should not be retried."""
+        limited = is_rate_limited(error)
+        if attempt >= self.max_retries or not (limited or is_transient(error)):
+            self.release(None)
+            return None
+        backoff = min(self.max_backoff, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.5)
+        if not limited:
+            self.release(None)
+            return backoff
+        after = retry_after(error)
+        if after is not None:
+            # Never earlier than asked, spread so paused queues don't resume
+            # in lockstep across processes.
+            backoff = min(self.max_backoff, after) * random.uniform(1.0, 1.2)
+        # The pause holds back the whole queue, this call included.
+        self.release(None, throttled=True, delay=backoff)
+        return 0.0
+
+
+class RateLimiter:
+    """One ModelLimiter per provider and model, configured from ``default``
+    plus per-model overrides keyed ``provider:model``."""
+
+    def __init__(self, default: Optional[Dict[str, Any]] = None, models: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.default = default or {}
+        self.models = models or {}
+        self._lock = threading.Lock()
+        self._limiters: Dict[Tuple[str, str], ModelLimiter] = {}
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        def env(name: str, cast=float):
+            value = os.getenv(f"RAPIDAGENT_LLM_{name}")
+            return cast(value) if value else None
+
+        default = {
+            "rpm": env("RPM"),
+            "tpm": env("TPM"),
+            "concurrency": env("CONCURRENCY", int),
+            "max_concurrency": env("MAX_CONCURRENCY", int),
+            "latency_target": env("LATENCY_TARGET"),
+        }
+        models = json.loads(os.getenv("RAPIDAGENT_LLM_LIMITS") or "{}")
+        return cls({k: v for k, v in default.items() if v is not None}, models)
+
+    def get(self, provider: str, model: str) -> ModelLimiter:
+        key = (provider, model)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    config = {**self.default, **self.models.get(f"{provider}:{model}", {})}
+                    limiter = self._limiters[key] = ModelLimiter(**config)
+        return limiter
+
+    def stats(self) -> Dict[str, Any]:
+        return {f"{provider}:{model}": limiter.stats() for (provider, model), limiter in list(self._limiters.items())}
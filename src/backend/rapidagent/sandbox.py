@@ -0,0 +1,282 @@
+import os
+import math
+import queue
+import signal
+import hashlib
+import builtins
+import threading
+import multiprocessing
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Set
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - resource limits are POSIX only
+    resource = None
+
+
+def _limit_memory(memory_bytes: int):
+    if resource is None or not memory_bytes:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory_bytes = min(memory_bytes, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, hard))
+
+
+def _limit_cpu(cpu_seconds: int):
+    # RLIMIT_CPU counts the whole life of the process, so the soft limit is
+    # moved forward before every call to give each call its own budget.
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+# Modules tool code may import; everything else raises ImportError.
+ALLOWED_MODULES = frozenset({
+    "base64", "bisect", "collections", "copy", "dataclasses", "datetime", "decimal", "enum", "fractions",
+    "functools", "hashlib", "heapq", "itertools", "json", "math", "operator", "random", "re", "statistics",
+    "string", "textwrap", "time", "typing", "unicodedata", "uuid", "zoneinfo",
+})
+
+# Builtins that reach the file system, the interpreter or arbitrary code.
+_BLOCKED_BUILTINS = {
+    "open", "exec", "eval", "compile", "input", "breakpoint", "globals", "locals", "vars", "help", "exit", "quit",
+}
+
+
+def _safe_builtins(allowed_modules: FrozenSet[str]) -> Dict[str, Any]:
+    def _import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name.partition(".")[0] not in allowed_modules:
+            raise ImportError(f"Import of {name} is not allowed in Python tools")
+        return __import__(name, globals, locals, fromlist, level)
+
+    safe = {name: value for name, value in vars(builtins).items() if name not in _BLOCKED_BUILTINS}
+    safe["__import__"] = _import
+    return safe
+
+
+def _load(code: str, safe_builtins: Dict[str, Any]) -> Any:
+    namespace: dict = {"__builtins__": safe_builtins, "__name__": "tool"}
+    try:
+        exec(code, namespace)
+    except Exception as e:
+        return f"Compilation error: {e}"
+    fn = namespace.get("run")
+    if not callable(fn):
+        return "Error: run() not defined"
+    return fn
+
+
+def _worker_main(conn, memory_bytes: int, cpu_seconds: int, cache_size: int, allowed_modules: FrozenSet[str]):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _limit_memory(memory_bytes)
+    safe_builtins = _safe_builtins(allowed_modules)
+    compiled: "OrderedDict[str, Any]" = OrderedDict()
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        key, code, input = msg
+        fn = compiled.get(key)
+        if fn is None:
+            fn = compiled[key] = _load(code, safe_builtins)
+            while len(compiled) > cache_size:
+                compiled.popitem(last=False)
+        else:
+            compiled.move_to_end(key)
+        if isinstance(fn, str):
+            conn.send(fn)
+            continue
+        _limit_cpu(cpu_seconds)
+        try:
+            output = str(fn(input))
+        except MemoryError:
+            output = "Error: memory limit exceeded"
+        except Exception as e:
+            output = f"Error: {e}"
+        conn.send(output)
+
+
+class _Worker:
+    def __init__(self, ctx, memory_bytes: int, cpu_seconds: int, cache_size: int, allowed_modules: FrozenSet[str]):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child, memory_bytes, cpu_seconds, cache_size, allowed_modules),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+
+    def exit_reason(self) -> str:
+        self.process.join(1)
+        code = self.process.exitcode
+        if hasattr(signal, "SIGXCPU") and code == -signal.SIGXCPU:
+            return "Error: CPU time limit exceeded"
+        return f"Error: Python tool worker crashed (exit code {code})"
+
+    def stop(self, graceful: bool = False):
+        if graceful and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """Pre-started worker processes that run PythonCodeTool code.
+
+    Workers keep the compiled code of recently used tools, run each call
+    under a wall-clock timeout and memory/CPU rlimits, and are replaced in
+    the background when they time out or die. Tool code gets builtins
+    without file, eval/exec or interpreter access and can only import
+    ``allowed_modules``. This isolates tools from the server process and
+    from each other's crashes; it is not a security boundary against
+    hostile code, which can still escape restricted builtins through
+    Python introspection.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout: float = 10.0,
+        memory_mb: int = 512,
+        cpu_seconds: int = 10,
+        cache_size: int = 128,
+        start_method: str = "spawn",
+        allowed_modules: Optional[Iterable[str]] = None,
+    ):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.timeout = timeout
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.cpu_seconds = cpu_seconds
+        self.cache_size = cache_size
+        self.allowed_modules = frozenset(ALLOWED_MODULES if allowed_modules is None else allowed_modules)
+        self.ctx = multiprocessing.get_context(start_method)
+        self.recycled = 0
+        self._lock = threading.Lock()
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._all: Set[_Worker] = set()
+        self._started = False
+        self._generation = 0
+
+    @classmethod
+    def from_env(cls) -> "SandboxPool":
+        modules = os.getenv("RAPIDAGENT_SANDBOX_MODULES")
+        return cls(
+            workers=int(os.getenv("RAPIDAGENT_SANDBOX_WORKERS", "0")) or None,
+            timeout=float(os.getenv("RAPIDAGENT_SANDBOX_TIMEOUT", "10")),
+            memory_mb=int(os.getenv("RAPIDAGENT_SANDBOX_MEMORY_MB", "512")),
+            cpu_seconds=int(os.getenv("RAPIDAGENT_SANDBOX_CPU_SECONDS", "10")),
+            allowed_modules=[m.strip() for m in modules.split(",") if m.strip()] if modules is not None else None,
+        )
+
+    def start(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.workers):
+                worker = self._spawn()
+                self._all.add(worker)
+                self._idle.put(worker)
+            self._started = True
+
+    def run(self, code: str, input: Any, timeout: Optional[float] = None) -> str:
+        self.start()
+        limit = timeout or self.timeout
+        key = hashlib.sha256(code.encode()).hexdigest()
+        worker = self._idle.get()
+        try:
+            worker.conn.send((key, code, input))
+            if worker.conn.poll(limit):
+                output = worker.conn.recv()
+                self._release(worker)
+                return output
+            error = f"Error: Python tool timed out after {limit:g}s"
+        except (EOFError, OSError):
+            error = worker.exit_reason()
+        except BaseException:
+            self._replace(worker)
+            raise
+        self._replace(worker)
+        return error
+
+    def close(self):
+        # Only idle workers are stopped here; workers still running a call
+        # are no longer in _all, so _release/_replace stop them when they
+        # come back.
+        with self._lock:
+            self._all = set()
+            self._generation += 1
+            self._started = False
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in idle:
+            worker.stop(graceful=True)
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self.ctx, self.memory_bytes, self.cpu_seconds, self.cache_size, self.allowed_modules)
+
+    def _release(self, worker: _Worker):
+        with self._lock:
+            if worker in self._all:
+                self._idle.put(worker)
+                return
+        worker.stop(graceful=True)
+
+    def _replace(self, worker: _Worker):
+        # Stopping the old worker and starting a new one happen off the
+        # request path; callers wait for any idle worker meanwhile.
+        with self._lock:
+            current = worker in self._all
+            self._all.discard(worker)
+            self.recycled += 1
+            generation = self._generation
+        threading.Thread(
+            target=self._respawn, args=(worker, generation if current else None), name="sandbox-respawn", daemon=True
+        ).start()
+
+    def _respawn(self, worker: _Worker, generation: Optional[int]):
+        worker.stop()
+        if generation is None:
+            return
+        replacement = self._spawn()
+        with self._lock:
+            if generation == self._generation:
+                self._all.add(replacement)
+                self._idle.put(replacement)
+                return
+        replacement.stop(graceful=True)
+
+
+_default_pool: Optional[SandboxPool] = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> SandboxPool:
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = SandboxPool.from_env()
+    return _default_pool
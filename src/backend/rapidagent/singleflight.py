@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Result handed to followers when the leader was cancelled or interrupted;
+# they run the call again themselves.
+ABANDONED = object()
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._futures: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future"]] = []
+
+    def resolve(self, result: Any, error: Optional[BaseException]):
+        with self._lock:
+            self.result, self.error = result, error
+            self.event.set()
+            futures, self._futures = self._futures, []
+        for loop, future in futures:
+            try:
+                loop.call_soon_threadsafe(_set_done, future)
+            except RuntimeError:
+                pass  # the follower's loop is closed
+
+    def wait(self) -> Any:
+        self.event.wait()
+        return self._outcome()
+
+    async def wait_async(self) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self.event.is_set():
+                future.set_result(None)
+            else:
+                self._futures.append((loop, future))
+        await future
+        return self._outcome()
+
+    def _outcome(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _set_done(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """Shares one execution between identical concurrent calls.
+
+    The first caller for a key runs the call; callers that arrive while it is
+    in flight wait for it and get the same result or exception. Sync and
+    async callers share the same in-flight calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def begin(self, key: Any) -> Tuple[_Call, bool]:
+        """Returns the in-flight call for ``key`` and whether the caller
+        leads it. A leader must end it with ``finish`` or ``abandon``."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self.executions += 1
+            return call, True
+
+    def finish(self, key: Any, call: _Call, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.resolve(result, error)
+
+    def abandon(self, key: Any, call: _Call):
+        self.finish(key, call, ABANDONED)
+
+    def do(self, key: Any, fn: Callable[[], T]) -> T:
+        while True:
+            call, leader = self.begin(key)
+            if leader:
+                break
+            result = call.wait()
+            if result is not ABANDONED:
+                return result
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        except BaseException:
+            self.abandon(key, call)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    async def ado(self, key: Any, fn: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            call, leader = self.begin(key)
+            if leader:
+                break
+            result = await call.wait_async()
+            if result is not ABANDONED:
+                return result
+        try:
+            result = await fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        except BaseException:
+            self.abandon(key, call)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"executions": self.executions, "coalesced": self.coalesced, "in_flight": len(self._calls)}
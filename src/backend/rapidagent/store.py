@@ -1,14 +1,346 @@
 import sqlite3
 import os
+import re
 import json
+import time
+import uuid
+import threading
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+]
+
+def _add_column(table: str, column: str, definition: str):
+    # For columns that older trees added outside the migrations, so some
+    # databases already have them.
+    def migrate(cur: sqlite3.Cursor):
+        if column not in [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return migrate
+
+# Each migration is a list of SQL statements or callables taking a cursor.
+MIGRATIONS: List[Tuple[int, List[Any]]] = [
+    (
+        1,
+        [
+            "CREATE INDEX IF NOT EXISTS idx_agent_messages_agent_id ON agent_messages (agent_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_traces_agent_id ON traces (agent_id, id)",
+        ],
+    ),
+    (
+        2,
+        [
+            "CREATE INDEX IF NOT EXISTS idx_agent_messages_agent_role ON agent_messages (agent_id, role, id)",
+            "CREATE INDEX IF NOT EXISTS idx_traces_agent_type ON traces (agent_id, type, id)",
+        ],
+    ),
+    (
+        3,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                seq INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                text TEXT,
+                metadata TEXT
+            )
+            """,
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(text, content='docs', content_rowid='seq')",
+            """
+            CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+                INSERT INTO docs_fts (rowid, text) VALUES (new.seq, new.text);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+                INSERT INTO docs_fts (docs_fts, rowid, text) VALUES ('delete', old.seq, old.text);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE ON docs BEGIN
+                INSERT INTO docs_fts (docs_fts, rowid, text) VALUES ('delete', old.seq, old.text);
+                INSERT INTO docs_fts (rowid, text) VALUES (new.seq, new.text);
+            END
+            """,
+        ],
+    ),
+    (
+        4,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS doc_vectors (
+                row INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL
+            )
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_doc_vectors_doc_id ON doc_vectors (doc_id)",
+        ],
+    ),
+    (
+        5,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                created_at REAL,
+                last_used REAL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)",
+        ],
+    ),
+    (
+        6,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS step_cache (
+                key TEXT PRIMARY KEY,
+                output TEXT,
+                created_at REAL
+            )
+            """,
+        ],
+    ),
+    (
+        7,
+        [
+            "ALTER TABLE tools ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE tools ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0",
+            "CREATE INDEX IF NOT EXISTS idx_tools_version ON tools (version)",
+        ],
+    ),
+    (
+        8,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                agent_id TEXT,
+                task TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                llm_options TEXT,
+                status TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, priority, seq)",
+            "CREATE INDEX IF NOT EXISTS idx_jobs_agent_id ON jobs (agent_id, seq)",
+        ],
+    ),
+    (
+        9,
+        [
+            "ALTER TABLE agents ADD COLUMN coalesce INTEGER NOT NULL DEFAULT 1",
+        ],
+    ),
+    (
+        10,
+        [
+            "ALTER TABLE jobs ADD COLUMN owner TEXT",
+            "ALTER TABLE jobs ADD COLUMN lease_until REAL",
+        ],
+    ),
+    (
+        11,
+        [
+            _add_column("agents", "react_mode", "TEXT DEFAULT 'json'"),
+        ],
+    ),
+    (
+        12,
+        [
+            "CREATE INDEX IF NOT EXISTS idx_step_cache_created_at ON step_cache (created_at)",
+        ],
+    ),
+]
+
+JOB_COLUMNS = (
+    "seq, id, agent_id, task, priority, llm_options, status, result, error, created_at, started_at, finished_at, owner, lease_until"
+)
+
+INSERTS = {
+    "agent_messages": "INSERT INTO agent_messages (agent_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+    "traces": "INSERT INTO traces (agent_id, type, content, timestamp) VALUES (?, ?, ?, ?)",
+}
+
+TOUCH_LLM_CACHE = "UPDATE llm_cache SET last_used=? WHERE key=?"
+
+# Cache hits only bump last_used for eviction order, so they are collected
+# and written in batches; losing a batch just makes eviction slightly less
+# accurate.
+MAX_PENDING_TOUCHES = 256
+
+class WriteBehindQueue:
+    def __init__(self, store: "Store", batch_size: int = 256, flush_interval: float = 0.05):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows: Dict[str, List[Tuple]] = {table: [] for table in INSERTS}
+        self._pending: Dict[str, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="store-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, table: str, row: Tuple):
+        with self._lock:
+            self._rows[table].append(row)
+            self._pending[row[0]] = self._pending.get(row[0], 0) + 1
+            self._size += 1
+            full = self._size >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def has_pending(self, agent_id: str) -> bool:
+        return self._pending.get(agent_id, 0) > 0
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows = self._rows
+                self._rows = {table: [] for table in INSERTS}
+                self._size = 0
+            touches = self.store._take_llm_touches()
+            if not any(rows.values()) and not touches:
+                return
+            conn = self.store.conn
+            try:
+                with conn:
+                    for table, batch in rows.items():
+                        if batch:
+                            conn.executemany(INSERTS[table], batch)
+                    if touches:
+                        conn.executemany(TOUCH_LLM_CACHE, touches)
+            except Exception:
+                with self._lock:
+                    for table, batch in rows.items():
+                        self._rows[table][:0] = batch
+                    self._size += sum(len(batch) for batch in rows.values())
+                raise
+            with self._lock:
+                for batch in rows.values():
+                    for row in batch:
+                        remaining = self._pending[row[0]] - 1
+                        if remaining:
+                            self._pending[row[0]] = remaining
+                        else:
+                            del self._pending[row[0]]
+
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass
+
+class _ThreadConnection:
+    # Lives in the Store's thread-local, which is cleared when the thread
+    # exits; the connection is closed then instead of piling up until
+    # Store.close().
+    def __init__(self, store: "Store", conn: sqlite3.Connection):
+        self.store = store
+        self.conn = conn
+
+    def __del__(self):
+        self.store._release(self.conn)
 
 class Store:
-    def __init__(self, path: str):
+    def __init__(self, path: str, write_behind: bool = False, batch_size: int = 256, flush_interval: float = 0.05):
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._llm_touches: Dict[str, float] = {}
+        self._touches_lock = threading.Lock()
         self._init_schema()
+        self._writer = WriteBehindQueue(self, batch_size, flush_interval) if write_behind else None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        local = getattr(self._local, "conn", None)
+        if local is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            local = self._local.conn = _ThreadConnection(self, conn)
+            with self._connections_lock:
+                self._connections.append(conn)
+        return local.conn
+
+    def _release(self, conn: sqlite3.Connection):
+        with self._connections_lock:
+            if conn not in self._connections:
+                return  # already closed by close()
+            self._connections.remove(conn)
+        conn.close()
+
+    def flush(self):
+        if self._writer:
+            self._writer.flush()
+        else:
+            self._flush_llm_touches()
+
+    def close(self):
+        writer, self._writer = self._writer, None
+        if writer:
+            writer.close()
+        self._flush_llm_touches()
+        with self._connections_lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def schema_version(self) -> int:
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _migrate(self, cur: sqlite3.Cursor):
+        for target, statements in MIGRATIONS:
+            if target <= cur.execute("PRAGMA user_version").fetchone()[0]:
+                continue
+            # Each migration commits together with its version bump, so an
+            # interrupted one is rolled back and rerun. The version is read
+            # again under the write lock in case another process got there
+            # first.
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                if target > cur.execute("PRAGMA user_version").fetchone()[0]:
+                    for statement in statements:
+                        if callable(statement):
+                            statement(cur)
+                        else:
+                            cur.execute(statement)
+                    cur.execute(f"PRAGMA user_version={target}")
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
 
     def _init_schema(self):
         cur = self.conn.cursor()
@@ -67,6 +399,7 @@ class Store:
             )
         """)
         self.conn.commit()
+        self._migrate(cur)
 
     def get_kv(self, key: str):
         cur = self.conn.cursor()
@@ -79,11 +412,20 @@ class Store:
         cur.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, value))
         self.conn.commit()
 
-    def create_agent(self, agent_id: str, name: str, model: str, tools, system_prompt: str | None = None):
+    def create_agent(
+        self,
+        agent_id: str,
+        name: str,
+        model: str,
+        tools,
+        system_prompt: str | None = None,
+        react_mode: str = "json",
+        coalesce: bool = True,
+    ):
         cur = self.conn.cursor()
         cur.execute(
-            "INSERT INTO agents (id, name, model, status, created_at, last_seen, system_prompt) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (agent_id, name, model, "idle", datetime.utcnow().isoformat(), None, system_prompt),
+            "INSERT INTO agents (id, name, model, status, created_at, last_seen, system_prompt, react_mode, coalesce) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (agent_id, name, model, "idle", datetime.utcnow().isoformat(), None, system_prompt, react_mode, int(coalesce)),
         )
         self.conn.commit()
         self.set_agent_tools(agent_id, tools)
@@ -91,7 +433,7 @@ class Store:
 
     def list_agents(self):
         cur = self.conn.cursor()
-        cur.execute("SELECT id, name, model, status, created_at, last_seen, system_prompt FROM agents")
+        cur.execute("SELECT id, name, model, status, created_at, last_seen, system_prompt, react_mode, coalesce FROM agents")
         rows = cur.fetchall()
         return [
             {
@@ -102,13 +444,15 @@ class Store:
                 "created_at": r[4],
                 "last_seen": r[5],
                 "system_prompt": r[6],
+                "react_mode": r[7] or "json",
+                "coalesce": bool(r[8]),
             }
             for r in rows
         ]
 
     def get_agent(self, agent_id: str):
         cur = self.conn.cursor()
-        cur.execute("SELECT id, name, model, status, created_at, last_seen, system_prompt FROM agents WHERE id=?", (agent_id,))
+        cur.execute("SELECT id, name, model, status, created_at, last_seen, system_prompt, react_mode, coalesce FROM agents WHERE id=?", (agent_id,))
         row = cur.fetchone()
         if not row:
             return None
@@ -120,6 +464,8 @@ class Store:
             "created_at": row[4],
             "last_seen": row[5],
             "system_prompt": row[6],
+            "react_mode": row[7] or "json",
+            "coalesce": bool(row[8]),
         }
 
     def update_agent_status(self, agent_id: str, status: str):
@@ -135,6 +481,16 @@ class Store:
         cur.execute("UPDATE agents SET system_prompt=? WHERE id=?", (prompt, agent_id))
         self.conn.commit()
 
+    def set_agent_react_mode(self, agent_id: str, react_mode: str):
+        cur = self.conn.cursor()
+        cur.execute("UPDATE agents SET react_mode=? WHERE id=?", (react_mode, agent_id))
+        self.conn.commit()
+
+    def set_agent_coalesce(self, agent_id: str, coalesce: bool):
+        cur = self.conn.cursor()
+        cur.execute("UPDATE agents SET coalesce=? WHERE id=?", (int(coalesce), agent_id))
+        self.conn.commit()
+
     def set_agent_tools(self, agent_id: str, tools):
         cur = self.conn.cursor()
         cur.execute("DELETE FROM agent_tools WHERE agent_id=?", (agent_id,))
@@ -148,82 +504,405 @@ class Store:
         return [r[0] for r in cur.fetchall()]
 
     def add_agent_message(self, agent_id: str, role: str, content: str):
+        row = (agent_id, role, content, datetime.utcnow().isoformat())
+        if self._writer:
+            self._writer.add("agent_messages", row)
+            return
         cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO agent_messages (agent_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-            (agent_id, role, content, datetime.utcnow().isoformat()),
-        )
+        cur.execute(INSERTS["agent_messages"], row)
         self.conn.commit()
 
-    def get_agent_messages(self, agent_id: str):
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT role, content, timestamp FROM agent_messages WHERE agent_id=? ORDER BY id ASC",
-            (agent_id,),
-        )
-        return [{"role": r[0], "content": r[1], "timestamp": r[2]} for r in cur.fetchall()]
+    def get_agent_messages(
+        self,
+        agent_id: str,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        role: Optional[str] = None,
+        tail: bool = False,
+    ):
+        self._flush_pending(agent_id)
+        rows = self._page("agent_messages", "role", agent_id, limit, after_id, before_id, role, tail)
+        return [{"id": r[0], "role": r[1], "content": r[2], "timestamp": r[3]} for r in rows]
 
     def add_trace(self, agent_id: str, type: str, content: dict | str):
-        cur = self.conn.cursor()
         if isinstance(content, dict):
             content = json.dumps(content)
-        cur.execute(
-            "INSERT INTO traces (agent_id, type, content, timestamp) VALUES (?, ?, ?, ?)",
-            (agent_id, type, content, datetime.utcnow().isoformat()),
-        )
+        row = (agent_id, type, content, datetime.utcnow().isoformat())
+        if self._writer:
+            self._writer.add("traces", row)
+            return
+        cur = self.conn.cursor()
+        cur.execute(INSERTS["traces"], row)
         self.conn.commit()
 
-    def list_traces(self, agent_id: str):
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT type, content, timestamp FROM traces WHERE agent_id=? ORDER BY id ASC",
-            (agent_id,),
-        )
-        rows = cur.fetchall()
+    def list_traces(
+        self,
+        agent_id: str,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        type: Optional[str] = None,
+        tail: bool = False,
+    ):
+        self._flush_pending(agent_id)
+        rows = self._page("traces", "type", agent_id, limit, after_id, before_id, type, tail)
         result = []
         for r in rows:
             try:
-                content = json.loads(r[1])
+                content = json.loads(r[2])
             except Exception:
-                content = r[1]
-            result.append({"type": r[0], "content": content, "timestamp": r[2]})
+                content = r[2]
+            result.append({"id": r[0], "type": r[1], "content": content, "timestamp": r[3]})
         return result
 
-    def upsert_tool(self, name: str, description: str, type_: str, config: Dict[str, Any] | None):
-        cur = self.conn.cursor()
+    def _page(
+        self,
+        table: str,
+        kind_column: str,
+        agent_id: str,
+        limit: Optional[int],
+        after_id: Optional[int],
+        before_id: Optional[int],
+        kind: Optional[str],
+        tail: bool,
+    ) -> List[Tuple]:
+        sql = f"SELECT id, {kind_column}, content, timestamp FROM {table} WHERE agent_id=?"
+        params: List[Any] = [agent_id]
+        if kind is not None:
+            sql += f" AND {kind_column}=?"
+            params.append(kind)
+        if after_id is not None:
+            sql += " AND id>?"
+            params.append(after_id)
+        if before_id is not None:
+            sql += " AND id<?"
+            params.append(before_id)
+        newest_first = limit is not None and (tail or (before_id is not None and after_id is None))
+        sql += " ORDER BY id DESC" if newest_first else " ORDER BY id ASC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self.conn.execute(sql, params).fetchall()
+        if newest_first:
+            rows.reverse()
+        return rows
+
+    def _flush_pending(self, agent_id: str):
+        writer = self._writer
+        if writer and writer.has_pending(agent_id):
+            writer.flush()
+
+    def upsert_tool(self, name: str, description: str, type_: str, config: Dict[str, Any] | None) -> int:
         cfg = json.dumps(config or {})
-        cur.execute(
-            "INSERT INTO tools (name, description, type, config) VALUES (?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET description=excluded.description, type=excluded.type, config=excluded.config",
-            (name, description, type_, cfg),
-        )
-        self.conn.commit()
+        with self.conn:
+            version = self._bump_tools_version()
+            self.conn.execute(
+                "INSERT INTO tools (name, description, type, config, version, deleted) VALUES (?, ?, ?, ?, ?, 0) ON CONFLICT(name) DO UPDATE SET description=excluded.description, type=excluded.type, config=excluded.config, version=excluded.version, deleted=0",
+                (name, description, type_, cfg, version),
+            )
+        return version
 
-    def delete_tool(self, name: str):
-        cur = self.conn.cursor()
-        cur.execute("DELETE FROM tools WHERE name=?", (name,))
-        self.conn.commit()
+    def delete_tool(self, name: str) -> bool:
+        with self.conn:
+            if not self.conn.execute("SELECT 1 FROM tools WHERE name=? AND deleted=0", (name,)).fetchone():
+                return False
+            version = self._bump_tools_version()
+            self.conn.execute("UPDATE tools SET deleted=1, version=? WHERE name=?", (version, name))
+        return True
 
-    def list_tools(self) -> List[Dict[str, Any]]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT name, description, type, config FROM tools ORDER BY name ASC")
-        rows = cur.fetchall()
-        result = []
-        for r in rows:
-            try:
-                cfg = json.loads(r[3]) if r[3] else {}
-            except Exception:
-                cfg = {}
-            result.append({"name": r[0], "description": r[1], "type": r[2], "config": cfg})
-        return result
+    def tools_version(self) -> int:
+        row = self.conn.execute("SELECT value FROM kv WHERE key='tools_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def list_tools(self, since_version: int | None = None) -> List[Dict[str, Any]]:
+        if since_version is None:
+            rows = self.conn.execute(
+                "SELECT name, description, type, config, version, deleted FROM tools WHERE deleted=0 ORDER BY name ASC"
+            ).fetchall()
+        else:
+            rows = self.conn.execute(
+                "SELECT name, description, type, config, version, deleted FROM tools WHERE version>? ORDER BY version ASC",
+                (since_version,),
+            ).fetchall()
+        return [self._tool_row(r) for r in rows]
 
     def get_tool(self, name: str) -> Dict[str, Any] | None:
-        cur = self.conn.cursor()
-        cur.execute("SELECT name, description, type, config FROM tools WHERE name=?", (name,))
-        r = cur.fetchone()
-        if not r:
-            return None
+        r = self.conn.execute(
+            "SELECT name, description, type, config, version, deleted FROM tools WHERE name=? AND deleted=0", (name,)
+        ).fetchone()
+        return self._tool_row(r) if r else None
+
+    def _bump_tools_version(self) -> int:
+        # Runs inside the caller's transaction; the UPDATE takes the write
+        # lock, so concurrent writers in other processes get distinct versions.
+        self.conn.execute("INSERT OR IGNORE INTO kv (key, value) VALUES ('tools_version', '0')")
+        self.conn.execute("UPDATE kv SET value=CAST(value AS INTEGER) + 1 WHERE key='tools_version'")
+        return int(self.conn.execute("SELECT value FROM kv WHERE key='tools_version'").fetchone()[0])
+
+    @staticmethod
+    def _tool_row(r) -> Dict[str, Any]:
         try:
             cfg = json.loads(r[3]) if r[3] else {}
         except Exception:
             cfg = {}
-        return {"name": r[0], "description": r[1], "type": r[2], "config": cfg}
+        return {"name": r[0], "description": r[1], "type": r[2], "config": cfg, "version": r[4], "deleted": bool(r[5])}
+
+    def random_id(self) -> str:
+        return str(uuid.uuid4())
+
+    def upsert_doc(self, doc_id: str, text: str, metadata: Dict[str, Any] | None = None):
+        self.upsert_docs([(doc_id, text, metadata)])
+
+    def upsert_docs(self, docs: List[Tuple[str, str, Dict[str, Any] | None]]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO docs (id, text, metadata) VALUES (?, ?, ?) ON CONFLICT(id) DO UPDATE SET text=excluded.text, metadata=excluded.metadata",
+                ((doc_id, text, json.dumps(meta or {})) for doc_id, text, meta in docs),
+            )
+
+    def delete_doc(self, doc_id: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM docs WHERE id=?", (doc_id,))
+
+    def get_docs(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        if not doc_ids:
+            return []
+        placeholders = ", ".join("?" for _ in doc_ids)
+        rows = self.conn.execute(
+            f"SELECT id, text, metadata FROM docs WHERE id IN ({placeholders})", list(doc_ids)
+        ).fetchall()
+        by_id = {r[0]: {"id": r[0], "text": r[1], "metadata": json.loads(r[2]) if r[2] else {}} for r in rows}
+        return [by_id[d] for d in doc_ids if d in by_id]
+
+    def count_docs(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def search_docs(self, query: str, k: int = 5, filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        terms = [f'"{t}"' for t in re.findall(r"\w+", query)]
+        if not terms:
+            return []
+        results = self._search_docs(" ".join(terms), k, filters)
+        if len(results) < k and len(terms) > 1:
+            seen = {r["id"] for r in results}
+            extra = self._search_docs(" OR ".join(terms), k, filters)
+            results.extend(r for r in extra if r["id"] not in seen)
+        return results[:k]
+
+    def _search_docs(self, match: str, k: int, filters: Dict[str, Any] | None) -> List[Dict[str, Any]]:
+        sql = (
+            "SELECT d.id, d.text, d.metadata, docs_fts.rank, "
+            "snippet(docs_fts, 0, '<mark>', '</mark>', '...', 24) "
+            "FROM docs_fts JOIN docs d ON d.seq = docs_fts.rowid WHERE docs_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        for key, value in (filters or {}).items():
+            sql += " AND json_extract(d.metadata, ?) = ?"
+            params.extend([f'$."{key}"', value])
+        sql += " ORDER BY docs_fts.rank LIMIT ?"
+        params.append(k)
+        return [
+            {
+                "id": r[0],
+                "text": r[1],
+                "metadata": json.loads(r[2]) if r[2] else {},
+                "score": -r[3],
+                "snippet": r[4],
+            }
+            for r in self.conn.execute(sql, params).fetchall()
+        ]
+
+    def add_doc_vectors(self, rows: List[Tuple[int, str]]) -> List[int]:
+        superseded = []
+        with self.conn:
+            for i in range(0, len(rows), 500):
+                doc_ids = [doc_id for _, doc_id in rows[i : i + 500]]
+                placeholders = ", ".join("?" for _ in doc_ids)
+                superseded.extend(
+                    r[0]
+                    for r in self.conn.execute(
+                        f"SELECT row FROM doc_vectors WHERE doc_id IN ({placeholders})", doc_ids
+                    ).fetchall()
+                )
+            self.conn.executemany(
+                "INSERT INTO doc_vectors (row, doc_id) VALUES (?, ?) ON CONFLICT(doc_id) DO UPDATE SET row=excluded.row",
+                rows,
+            )
+        return superseded
+
+    def list_doc_vectors(self) -> List[Tuple[int, str]]:
+        return self.conn.execute("SELECT row, doc_id FROM doc_vectors ORDER BY row").fetchall()
+
+    def get_llm_cache(self, key: str, min_created_at: float = 0.0) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT value FROM llm_cache WHERE key=? AND created_at>=?", (key, min_created_at)
+        ).fetchone()
+        if not row:
+            return None
+        with self._touches_lock:
+            self._llm_touches[key] = time.time()
+            full = len(self._llm_touches) >= MAX_PENDING_TOUCHES
+        if full:
+            if self._writer:
+                self._writer._wake.set()
+            else:
+                self._flush_llm_touches()
+        return row[0]
+
+    def _take_llm_touches(self) -> List[Tuple[float, str]]:
+        with self._touches_lock:
+            touches, self._llm_touches = self._llm_touches, {}
+        return [(used, key) for key, used in touches.items()]
+
+    def _flush_llm_touches(self):
+        touches = self._take_llm_touches()
+        if touches:
+            with self.conn:
+                self.conn.executemany(TOUCH_LLM_CACHE, touches)
+
+    def put_llm_cache(self, key: str, value: str):
+        now = time.time()
+        touches = [] if self._writer else self._take_llm_touches()
+        with self.conn:
+            if touches:
+                self.conn.executemany(TOUCH_LLM_CACHE, touches)
+            self.conn.execute(
+                "INSERT INTO llm_cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value, created_at=excluded.created_at, last_used=excluded.last_used",
+                (key, value, now, now),
+            )
+
+    def evict_llm_cache(self, max_rows: int, min_created_at: float = 0.0) -> int:
+        touches = self._take_llm_touches()
+        with self.conn:
+            if touches:
+                self.conn.executemany(TOUCH_LLM_CACHE, touches)
+            removed = self.conn.execute("DELETE FROM llm_cache WHERE created_at<?", (min_created_at,)).rowcount
+            removed += self.conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (max_rows,),
+            ).rowcount
+        return removed
+
+    def clear_llm_cache(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM llm_cache")
+
+    def get_step_cache(self, key: str, min_created_at: float = 0.0) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT output FROM step_cache WHERE key=? AND created_at>=?", (key, min_created_at)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_step_cache(self, key: str, output: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO step_cache (key, output, created_at) VALUES (?, ?, ?)",
+                (key, output, time.time()),
+            )
+
+    def evict_step_cache(self, max_rows: int, min_created_at: float = 0.0) -> int:
+        with self.conn:
+            removed = self.conn.execute("DELETE FROM step_cache WHERE created_at<?", (min_created_at,)).rowcount
+            removed += self.conn.execute(
+                "DELETE FROM step_cache WHERE key IN (SELECT key FROM step_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (max_rows,),
+            ).rowcount
+        return removed
+
+    def clear_step_cache(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM step_cache")
+
+    def create_job(self, job_id: str, agent_id: str, task: str, priority: int = 0, llm_options: Dict[str, Any] | None = None) -> int:
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO jobs (id, agent_id, task, priority, llm_options, status, created_at) VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, agent_id, task, priority, json.dumps(llm_options) if llm_options else None, time.time()),
+            )
+        return cur.lastrowid
+
+    def get_job(self, job_id: str) -> Dict[str, Any] | None:
+        r = self.conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return self._job_row(r) if r else None
+
+    def list_jobs(self, agent_id: str | None = None, status: str | None = None, limit: int | None = None) -> List[Dict[str, Any]]:
+        where, params = [], []
+        if agent_id is not None:
+            where.append("agent_id=?")
+            params.append(agent_id)
+        if status is not None:
+            where.append("status=?")
+            params.append(status)
+        sql = f"SELECT {JOB_COLUMNS} FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY seq DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._job_row(r) for r in self.conn.execute(sql, params).fetchall()]
+
+    def claim_job(self, job_id: str, owner: str | None = None, lease: float = 0) -> bool:
+        now = time.time()
+        with self.conn:
+            return self.conn.execute(
+                "UPDATE jobs SET status='running', started_at=?, owner=?, lease_until=? WHERE id=? AND status='queued'",
+                (now, owner, now + lease, job_id),
+            ).rowcount == 1
+
+    def renew_job_leases(self, owner: str, job_ids: List[str], lease: float) -> int:
+        if not job_ids:
+            return 0
+        marks = ",".join("?" * len(job_ids))
+        with self.conn:
+            return self.conn.execute(
+                f"UPDATE jobs SET lease_until=? WHERE owner=? AND status='running' AND id IN ({marks})",
+                (time.time() + lease, owner, *job_ids),
+            ).rowcount
+
+    def finish_job(self, job_id: str, status: str, result: str | None = None, error: str | None = None, owner: str | None = None) -> bool:
+        # With an owner, only a job still leased to it is finished; a job
+        # requeued after its lease expired belongs to whoever claims it next.
+        sql = "UPDATE jobs SET status=?, result=?, error=?, finished_at=?, lease_until=NULL WHERE id=?"
+        params: List[Any] = [status, result, error, time.time(), job_id]
+        if owner is not None:
+            sql += " AND owner=? AND status='running'"
+            params.append(owner)
+        with self.conn:
+            return self.conn.execute(sql, params).rowcount == 1
+
+    def cancel_job(self, job_id: str) -> bool:
+        with self.conn:
+            return self.conn.execute(
+                "UPDATE jobs SET status='cancelled', finished_at=? WHERE id=? AND status='queued'", (time.time(), job_id)
+            ).rowcount == 1
+
+    def requeue_expired_jobs(self) -> List[Dict[str, Any]]:
+        # Running jobs whose owner stopped renewing the lease, e.g. because
+        # the process died; jobs running in live processes are left alone.
+        with self.conn:
+            rows = self.conn.execute(
+                "UPDATE jobs SET status='queued', started_at=NULL, owner=NULL, lease_until=NULL "
+                f"WHERE status='running' AND (lease_until IS NULL OR lease_until < ?) RETURNING {JOB_COLUMNS}",
+                (time.time(),),
+            ).fetchall()
+        return [self._job_row(r) for r in rows]
+
+    @staticmethod
+    def _job_row(r) -> Dict[str, Any]:
+        return {
+            "seq": r[0],
+            "id": r[1],
+            "agent_id": r[2],
+            "task": r[3],
+            "priority": r[4],
+            "llm_options": json.loads(r[5]) if r[5] else None,
+            "status": r[6],
+            "result": r[7],
+            "error": r[8],
+            "created_at": r[9],
+            "started_at": r[10],
+            "finished_at": r[11],
+            "owner": r[12],
+            "lease_until": r[13],
+        }
@@ -1,25 +1,63 @@
 import json
 import ast
+import asyncio
+import os
+import time
 import operator
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import LRUCache, MISSING
+from .singleflight import SingleFlight
+from .store import Store
+from .httpclient import IDEMPOTENT_METHODS, HttpClientPool, HttpResult, default_pool
+from .sandbox import SandboxPool, default_pool as default_sandbox
 
 
 class Tool(ABC):
     name: str
     description: str
     type: str
+    cacheable: bool = False
+    cache_ttl: Optional[float] = None
+    cache_max_size: int = 256
+    # Identical concurrent calls share one run unless the tool has side
+    # effects that must happen once per call.
+    coalesce: bool = True
+    config: Dict[str, Any]
 
     @abstractmethod
     def run(self, input: str) -> Any:
         ...
 
+    async def arun(self, input: str) -> Any:
+        return await asyncio.to_thread(self.run, input)
+
+    def definition(self) -> Dict[str, Any]:
+        return {"name": self.name, "description": self.description, "type": self.type, "config": getattr(self, "config", {})}
+
+    def configure_cache(self, config: Dict[str, Any]):
+        cache = config.get("cache")
+        if isinstance(cache, bool):
+            self.cacheable = cache
+        elif isinstance(cache, dict):
+            self.cacheable = bool(cache.get("enabled", True))
+            if cache.get("ttl") is not None:
+                self.cache_ttl = float(cache["ttl"])
+            if cache.get("max_size") is not None:
+                self.cache_max_size = int(cache["max_size"])
+
 
 class CalculatorTool(Tool):
+    cacheable = True
+
     def __init__(self, name: str = "calculator", description: str = "Perform basic math operations"):
         self.name = name
         self.description = description
         self.type = "calculator"
+        self.config: Dict[str, Any] = {}
 
     def run(self, input: str) -> str:
         try:
@@ -54,16 +92,20 @@ class SearchTool(Tool):
         self.name = name
         self.description = description
         self.type = "search"
+        self.config: Dict[str, Any] = {}
 
     def run(self, input: str) -> str:
         return f"Search results for '{input}' (placeholder)"
 
 
 class TemplateTool(Tool):
+    cacheable = True
+
     def __init__(self, name: str, description: str, template: str):
         self.name = name
         self.description = description
         self.template = template
+        self.config = {"template": template}
         self.type = "template"
 
     def run(self, input: str) -> str:
@@ -71,19 +113,37 @@ class TemplateTool(Tool):
 
 
 class HttpTool(Tool):
-    def __init__(self, name: str, description: str, config: Dict[str, Any]):
+    def __init__(self, name: str, description: str, config: Dict[str, Any], pool: Optional[HttpClientPool] = None):
         self.name = name
         self.description = description
         self.type = "http"
+        self.config = config
         self.method = config.get("method", "GET")
         self.url = config.get("url", "")
         self.headers = config.get("headers", {})
         self.body = config.get("body", None)
         self.timeout = float(config.get("timeout", 15))
+        self.max_bytes = int(config.get("max_bytes", 65536))
+        # POST and PATCH may repeat side effects; such tools opt in to
+        # retries with "idempotent": true.
+        self.idempotent = bool(config.get("idempotent", self.method.upper() in IDEMPOTENT_METHODS))
+        self.retries = int(config.get("retries", 2)) if self.idempotent else 0
+        # Budget for the whole call; ``timeout`` only bounds one attempt.
+        self.total_timeout = float(config.get("total_timeout", self.timeout * (self.retries + 1)))
+        self.pool = pool
+        self.configure_cache(config)
+        self.cacheable = self.cacheable and self.method.upper() == "GET"
+        self.coalesce = bool(config.get("coalesce", self.method.upper() in ("GET", "HEAD")))
 
     def run(self, input: str) -> str:
-        import requests
+        pool = self.pool or default_pool()
+        return self._format(pool.request(**self._request(input)))
+
+    async def arun(self, input: str) -> str:
+        pool = self.pool or default_pool()
+        return self._format(await pool.arequest(**self._request(input)))
 
+    def _request(self, input: str) -> Dict[str, Any]:
         url = self.url.replace("{input}", input)
         hdrs = {}
         for k, v in self.headers.items():
@@ -95,67 +155,125 @@ class HttpTool(Tool):
         elif isinstance(self.body, dict):
             data = json.loads(json.dumps(self.body).replace("{input}", input))
 
-        resp = requests.request(
-            self.method,
-            url,
-            headers=hdrs,
-            data=data if isinstance(data, str) else None,
-            json=data if isinstance(data, dict) else None,
-            timeout=self.timeout,
-        )
+        return {
+            "method": self.method,
+            "url": url,
+            "headers": hdrs,
+            "content": data if isinstance(data, str) else None,
+            "json": data if isinstance(data, dict) else None,
+            "timeout": self.timeout,
+            "max_bytes": self.max_bytes,
+            "retries": self.retries,
+            "total_timeout": self.total_timeout,
+            "idempotent": self.idempotent,
+        }
 
+    def _format(self, resp: HttpResult) -> str:
+        if resp.truncated:
+            return resp.text + f"\n[truncated after {self.max_bytes} bytes]"
         ct = resp.headers.get("content-type", "")
         if "application/json" in ct:
             try:
-                return json.dumps(resp.json(), ensure_ascii=False)
+                return json.dumps(json.loads(resp.content), ensure_ascii=False)
             except Exception:
                 return resp.text
         return resp.text
 
 
 class PythonCodeTool(Tool):
-    def __init__(self, name: str, description: str, config: Dict[str, Any]):
+    def __init__(self, name: str, description: str, config: Dict[str, Any], pool: Optional[SandboxPool] = None):
         self.name = name
         self.description = description
         self.type = "python"
+        self.config = config
         self.code = config.get("code", "")
         self.input_schema = config.get("input_schema", {"type": "string", "description": "Input"})
         self.output_schema = config.get("output_schema", {"type": "string", "description": "Output"})
+        self.timeout = float(config["timeout"]) if config.get("timeout") else None
+        self.pool = pool
+        self.configure_cache(config)
+        # Arbitrary code may have side effects; side-effect-free tools opt in.
+        self.coalesce = bool(config.get("coalesce", False))
 
-        local_vars: Dict[str, Any] = {}
         try:
-            exec(self.code, {}, local_vars)
-        except Exception as e:
-            self.fn = None
+            compile(self.code, f"<tool {name}>", "exec")
+        except SyntaxError as e:
             self.error = f"Compilation error: {e}"
         else:
-            self.fn = local_vars.get("run")
             self.error = None
 
-    def run(self, input: str) -> str:
+    def run(self, input: Any) -> str:
         if self.error:
             return self.error
-        if not callable(self.fn):
-            return "Error: run() not defined"
-        try:
-            return str(self.fn(input))
-        except Exception as e:
-            return f"Error: {e}"
+        pool = self.pool or default_sandbox()
+        return pool.run(self.code, input, self.timeout)
 
 
 class ToolRegistry:
-    def __init__(self, tools: Optional[List[Tool]] = None):
+    def __init__(
+        self,
+        tools: Optional[List[Tool]] = None,
+        max_workers: Optional[int] = None,
+        default_timeout: Optional[float] = None,
+    ):
         self.tools: Dict[str, Tool] = {}
+        self.max_workers = max_workers or int(os.getenv("RAPIDAGENT_TOOL_WORKERS", "8"))
+        self.default_timeout = default_timeout or float(os.getenv("RAPIDAGENT_TOOL_TIMEOUT", "30"))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._caches: Dict[str, Tuple[Tool, LRUCache]] = {}
+        self.versions: Dict[str, int] = {}
+        self.store_version = 0
+        self._refresh_lock = threading.Lock()
+        self._tools_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._stats_lock = threading.Lock()
+        self.flight = SingleFlight()
         if tools:
             for tool in tools:
                 self.register(tool)
 
     def register(self, tool: Tool):
-        self.tools[tool.name] = tool
+        self._apply({tool.name: tool})
 
     def unregister(self, name: str):
-        if name in self.tools:
-            del self.tools[name]
+        self._apply({name: None})
+
+    def refresh(self, store: Store) -> bool:
+        version = store.tools_version()
+        if version == self.store_version:
+            return False
+        with self._refresh_lock:
+            if version == self.store_version:
+                return False
+            changes: Dict[str, Optional[Tool]] = {}
+            for defn in store.list_tools(since_version=self.store_version):
+                version = max(version, defn["version"])
+                if defn["deleted"]:
+                    changes[defn["name"]] = None
+                    continue
+                try:
+                    changes[defn["name"]] = self.tool_from_def(defn)
+                except Exception:
+                    changes[defn["name"]] = None
+            self._apply(changes)
+            self.store_version = version
+        return True
+
+    def _apply(self, changes: Dict[str, Optional[Tool]]):
+        # Other threads iterate self.tools without a lock, so it is replaced
+        # in one assignment rather than mutated.
+        with self._tools_lock:
+            tools = dict(self.tools)
+            for name, tool in changes.items():
+                if tool is None:
+                    tools.pop(name, None)
+                else:
+                    tools[name] = tool
+                self._caches.pop(name, None)
+                self.versions[name] = self.versions.get(name, 0) + 1
+            self.tools = tools
 
     def list_tools(self) -> List[Dict[str, Any]]:
         result = []
@@ -171,11 +289,166 @@ class ToolRegistry:
             result.append(entry)
         return result
 
-    def run(self, name: str, input: str) -> str:
+    def function_schemas(self, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        result = []
+        for entry in self.list_tools():
+            if names is not None and entry["name"] not in names:
+                continue
+            schema = entry.get("input_schema") or {"type": "string", "description": "Input"}
+            if schema.get("type") == "object":
+                parameters = schema
+            else:
+                parameters = {"type": "object", "properties": {"input": schema}, "required": ["input"]}
+            result.append(
+                {
+                    "type": "function",
+                    "function": {
+                        "name": entry["name"],
+                        "description": entry["description"],
+                        "parameters": parameters,
+                    },
+                }
+            )
+        return result
+
+    def run(self, name: str, input: str, coalesce: bool = True) -> str:
         tool = self.tools.get(name)
         if not tool:
             return f"Tool {name} not found"
-        return str(tool.run(input))
+        if not tool.cacheable:
+            return self._execute(name, tool, input, coalesce)
+        cache, key = self._cache_entry(name, tool, input)
+        result = cache.get(key)
+        self._count(result is not MISSING)
+        if result is not MISSING:
+            return result
+        result = self._execute(name, tool, input, coalesce)
+        cache.set(key, result)
+        return result
+
+    async def arun(self, name: str, input: str, coalesce: bool = True) -> str:
+        tool = self.tools.get(name)
+        if not tool:
+            return f"Tool {name} not found"
+        if not tool.cacheable:
+            return await self._aexecute(name, tool, input, coalesce)
+        cache, key = self._cache_entry(name, tool, input)
+        result = cache.get(key)
+        self._count(result is not MISSING)
+        if result is not MISSING:
+            return result
+        result = await self._aexecute(name, tool, input, coalesce)
+        cache.set(key, result)
+        return result
+
+    def _execute(self, name: str, tool: Tool, input: Any, coalesce: bool) -> str:
+        if not (coalesce and tool.coalesce):
+            return str(tool.run(input))
+        return self.flight.do(self._flight_key(name, input), lambda: str(tool.run(input)))
+
+    async def _aexecute(self, name: str, tool: Tool, input: Any, coalesce: bool) -> str:
+        if not (coalesce and tool.coalesce):
+            return str(await tool.arun(input))
+
+        async def run() -> str:
+            return str(await tool.arun(input))
+
+        return await self.flight.ado(self._flight_key(name, input), run)
+
+    def _flight_key(self, name: str, input: Any) -> Tuple[str, int, str]:
+        key = input if isinstance(input, str) else json.dumps(input, sort_keys=True, default=str)
+        return name, self.versions.get(name, 0), key
+
+    def _cache_entry(self, name: str, tool: Tool, input: Any) -> Tuple[LRUCache, str]:
+        entry = self._caches.get(name)
+        if entry is None or entry[0] is not tool:
+            entry = (tool, LRUCache(tool.cache_max_size, tool.cache_ttl))
+            self._caches[name] = entry
+        key = input if isinstance(input, str) else json.dumps(input, sort_keys=True, default=str)
+        return entry[1], key
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "entries": {name: len(cache) for name, (_, cache) in self._caches.items()},
+        }
+
+    def run_many(self, calls: List[Tuple[str, str]], timeout: Optional[float] = None, coalesce: bool = True) -> List[str]:
+        # A call gets its full timeout once a worker picks it up, and may wait
+        # up to the same time for one. Running tools cannot be interrupted: a
+        # tool that times out keeps its worker until it returns, so blocking
+        # tools should bound themselves (Python tools run in the sandbox,
+        # which enforces their timeout; HTTP tools stop retrying at their
+        # total_timeout, which is also the timeout used here).
+        executor = self._get_executor()
+        started: List[Optional[float]] = [None] * len(calls)
+
+        def run_one(i: int, name: str, input: str) -> str:
+            started[i] = time.monotonic()
+            return self.run(name, input, coalesce)
+
+        submitted = time.monotonic()
+        futures = [executor.submit(run_one, i, name, input) for i, (name, input) in enumerate(calls)]
+        results = []
+        for i, ((name, _), future) in enumerate(zip(calls, futures)):
+            limit = timeout or self._timeout_for(name)
+            while True:
+                begun = started[i]
+                deadline = (submitted if begun is None else begun) + limit
+                try:
+                    results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                except FutureTimeoutError:
+                    if begun is not None:
+                        results.append(f"Error: Tool {name} timed out after {limit:g}s")
+                    elif future.cancel():
+                        results.append(f"Error: Tool {name} timed out after {limit:g}s waiting for a worker")
+                    else:
+                        # It was picked up just now; its timeout starts here.
+                        started[i] = started[i] or time.monotonic()
+                        continue
+                except Exception as e:
+                    results.append(f"Error: {e}")
+                break
+        return results
+
+    async def arun_many(
+        self, calls: List[Tuple[str, str]], timeout: Optional[float] = None, coalesce: bool = True
+    ) -> List[str]:
+        async def run_one(name: str, input: str) -> str:
+            limit = timeout or self._timeout_for(name)
+            try:
+                return await asyncio.wait_for(self.arun(name, input, coalesce), limit)
+            except asyncio.TimeoutError:
+                return f"Error: Tool {name} timed out after {limit:g}s"
+            except Exception as e:
+                return f"Error: {e}"
+
+        return list(await asyncio.gather(*(run_one(name, input) for name, input in calls)))
+
+    def _timeout_for(self, name: str) -> float:
+        tool = self.tools.get(name)
+        limit = getattr(tool, "total_timeout", None) or getattr(tool, "timeout", None)
+        return float(limit or self.default_timeout)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
     @staticmethod
     def tool_from_def(defn: Dict[str, Any]) -> Tool:
@@ -184,17 +457,37 @@ class ToolRegistry:
         description = defn.get("description", "")
         config = defn.get("config", {}) or {}
         if t == "calculator":
-            return CalculatorTool(name=name or "calculator", description=description or "Perform basic math operations")
+            tool = CalculatorTool(name=name or "calculator", description=description or "Perform basic math operations")
+            tool.config = config
+            tool.configure_cache(config)
+            return tool
         if t == "search":
             return SearchTool(name=name or "search", description=description or "Search the web for information")
         if t == "template":
-            return TemplateTool(name=name, description=description, template=config.get("template", ""))
+            tool = TemplateTool(name=name, description=description, template=config.get("template", ""))
+            tool.config = config
+            tool.configure_cache(config)
+            return tool
         if t == "http":
             return HttpTool(name=name, description=description, config=config)
         if t == "python":
             return PythonCodeTool(name=name, description=description, config=config)
         raise ValueError("Unknown tool type")
 
+    @classmethod
+    def import_json(cls, store: Store, path: str) -> int:
+        if store.get_kv("tools_imported") or not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            data = json.load(f)
+        imported = 0
+        for d in data:
+            if store.get_tool(d["name"]) is None:
+                store.upsert_tool(d["name"], d.get("description", ""), d["type"], d.get("config"))
+                imported += 1
+        store.set_kv("tools_imported", path)
+        return imported
+
     @classmethod
     def from_json_file(cls, path: str, include_defaults: bool = True) -> "ToolRegistry":
         tools: List[Tool] = []
@@ -0,0 +1,150 @@
+import os
+import re
+import hashlib
+import threading
+from typing import Any, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+from .store import Store
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required for dense retrieval; install the dense extra (pip install 'rapidagent[dense]')")
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embedder based on the hashing trick.
+
+    It needs no model or network access, which makes it suitable for tests
+    and as a baseline; any object with ``dim`` and ``embed(texts)`` can be
+    used in its place.
+    """
+
+    def __init__(self, dim: int = 256):
+        _require_numpy()
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+                out[i, h % self.dim] += 1.0 if h >> 63 else -1.0
+        return out
+
+
+class VectorIndex:
+    """Append-only float32 matrix persisted as a raw memory-mapped file.
+
+    Row numbers are mapped to document ids in the ``doc_vectors`` table.
+    Re-adding a document appends a new row and retires the old one, so the
+    file is never rewritten.
+    """
+
+    def __init__(self, store: Store, path: str, dim: int, block_rows: int = 262144):
+        _require_numpy()
+        self.store = store
+        self.path = path
+        self.dim = dim
+        self.block_rows = block_rows
+        self._lock = threading.Lock()
+        self._row_bytes = dim * 4
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size % self._row_bytes:
+            with open(path, "r+b") as f:
+                f.truncate(size - size % self._row_bytes)
+        self._rows = size // self._row_bytes
+        self._doc_ids: List[Optional[str]] = [None] * self._rows
+        self._alive = np.zeros(max(self._rows, 1024), dtype=bool)
+        for row, doc_id in store.list_doc_vectors():
+            if row < self._rows:
+                self._doc_ids[row] = doc_id
+                self._alive[row] = True
+        self._matrix: Optional["np.memmap"] = None
+
+    def __len__(self) -> int:
+        return int(self._alive[: self._rows].sum())
+
+    def add(self, doc_ids: Sequence[str], vectors: Any):
+        vectors = self._normalize(vectors)
+        if len(doc_ids) != len(vectors):
+            raise ValueError("doc_ids and vectors must have the same length")
+        with self._lock:
+            start = self._rows
+            try:
+                with open(self.path, "ab") as f:
+                    f.write(vectors.tobytes())
+                superseded = self.store.add_doc_vectors([(start + i, d) for i, d in enumerate(doc_ids)])
+            except BaseException:
+                # Rows past the mapped ones would shift every later row.
+                with open(self.path, "r+b") as f:
+                    f.truncate(start * self._row_bytes)
+                raise
+            end = start + len(doc_ids)
+            if end > len(self._alive):
+                grown = np.zeros(max(end, 2 * len(self._alive)), dtype=bool)
+                grown[:start] = self._alive[:start]
+                self._alive = grown
+            self._doc_ids.extend(doc_ids)
+            self._alive[start:end] = True
+            self._alive[[r for r in superseded if r < start]] = False
+            latest = {}
+            for i, d in enumerate(doc_ids):
+                if d in latest:
+                    self._alive[latest[d]] = False
+                latest[d] = start + i
+            self._rows = end
+
+    def search(self, queries: Any, k: int = 5) -> List[List[Tuple[str, float]]]:
+        q = self._normalize(queries)
+        matrix, alive, doc_ids = self._view()
+        if matrix is None or k <= 0:
+            return [[] for _ in range(len(q))]
+        best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(q), 0), dtype=np.int64)
+        for start in range(0, len(matrix), self.block_rows):
+            block = matrix[start : start + self.block_rows]
+            scores = q @ block.T
+            live = alive[start : start + len(block)]
+            if not live.all():
+                scores[:, ~live] = -np.inf
+            if scores.shape[1] > k:
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+                scores = np.take_along_axis(scores, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(best_scores, -k, axis=1)[:, -k:]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append([(doc_ids[rows[i]], float(scores[i])) for i in order if np.isfinite(scores[i])])
+        return results
+
+    def _view(self):
+        with self._lock:
+            rows = self._rows
+            if rows == 0:
+                return None, self._alive, self._doc_ids
+            if self._matrix is None or len(self._matrix) != rows:
+                self._matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            return self._matrix, self._alive, self._doc_ids
+
+    def _normalize(self, vectors: Any) -> "np.ndarray":
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms, dtype=np.float32)
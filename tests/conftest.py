@@ -9,11 +9,16 @@ from rapidagent.llms import LLMRegistry
 def temp_store():
     db_fd, path = tempfile.mkstemp()
     os.close(db_fd)
+    store = None
     try:
         store = Store(path)
         yield store
     finally:
-        os.remove(path)
+        if store:
+            store.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
 
 @pytest.fixture
 def tool_registry():
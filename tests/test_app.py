@@ -1,3 +1,4 @@
+import json
 from fastapi.testclient import TestClient
 from rapidagent.app import app, store
 
@@ -27,3 +28,101 @@ def test_agent_endpoints():
     resp = client.get(f"/agents/{agent_id}/traces")
     assert resp.status_code == 200
     assert "traces" in resp.json()
+
+def test_chat_stream_endpoint(monkeypatch):
+    from rapidagent.app import llms
+    chunks = ['{"type":"fi', 'nal","content":"hel', 'lo wor', 'ld"}']
+
+    async def astream(provider, model, messages):
+        for chunk in chunks:
+            yield chunk
+
+    monkeypatch.setattr(llms, "astream", astream)
+    agent_id = client.post("/agents", json={"name": "StreamAgent", "model": "gpt-4o-mini", "tools": []}).json()["id"]
+
+    resp = client.post(f"/agents/{agent_id}/chat/stream", json={"messages": [{"role": "user", "content": "hi"}]})
+    assert resp.status_code == 200
+    events = [json.loads(line[len("data: "):]) for line in resp.text.splitlines() if line.startswith("data: ")]
+    assert "".join(e["content"] for e in events if e["type"] == "token") == "hello world"
+    assert events[-1] == {"type": "final", "content": "hello world"}
+
+def test_traces_endpoint_pagination():
+    agent_id = client.post("/agents", json={"name": "PagedAgent", "model": "gpt-4o-mini", "tools": []}).json()["id"]
+    for i in range(5):
+        store.add_trace(agent_id, "thought", {"i": i})
+    page = client.get(f"/agents/{agent_id}/traces", params={"limit": 2}).json()
+    assert [t["content"]["i"] for t in page["traces"]] == [0, 1]
+    assert page["has_more"]
+    page = client.get(f"/agents/{agent_id}/traces", params={"limit": 2, "after_id": page["last_id"]}).json()
+    assert [t["content"]["i"] for t in page["traces"]] == [2, 3]
+    tail = client.get(f"/agents/{agent_id}/traces", params={"limit": 2, "tail": True}).json()
+    assert [t["content"]["i"] for t in tail["traces"]] == [3, 4]
+    assert tail["has_more"]
+
+def test_pipeline_batch_streams_ndjson():
+    from rapidagent.app import pipelines
+    pid = pipelines.create_pipeline("batch-test", "", [{"tool": "calculator", "input_mapping": {"input": "expr"}}])
+    body = "\n".join(json.dumps({"expr": f"{i} + 1"}) for i in range(5))
+    resp = client.post(f"/pipelines/{pid}/batch?concurrency=2&progress_every=2", content=body)
+    assert resp.status_code == 200
+    lines = [json.loads(l) for l in resp.text.splitlines()]
+    results = [l for l in lines if "index" in l]
+    assert [r["results"][0]["output"] for r in results] == ["1", "2", "3", "4", "5"]
+    assert lines[-1]["progress"]["completed"] == 5
+    assert client.post("/pipelines/missing/batch", content="{}").status_code == 404
+
+def test_pipeline_endpoints():
+    ids = []
+    for i in range(3):
+        resp = client.post("/pipelines", json={"name": f"api-{i}", "steps": [{"tool": "calculator", "input_mapping": {"input": "expr"}}]})
+        ids.append(resp.json()["id"])
+    resp = client.get(f"/pipelines/{ids[0]}")
+    assert resp.json()["pipeline"]["steps"][0]["tool"] == "calculator"
+
+    first = client.get("/pipelines", params={"limit": 1, "after_id": ids[0]}).json()
+    assert [p["id"] for p in first["pipelines"]] == [ids[1]] and first["has_more"]
+    assert first["pipelines"][0]["steps"][0]["input_mapping"] == {"input": "expr"}
+
+    resp = client.post(f"/pipelines/{ids[2]}/run", json={"input": {"expr": "6 * 7"}})
+    assert resp.status_code == 200
+    assert resp.json()["final_context"]["step_0_output"] == "42"
+    assert client.post("/pipelines/missing/run", json={}).status_code == 404
+
+def test_tool_create_and_delete_go_through_store():
+    resp = client.post("/tools", json={"name": "echo_api", "description": "", "type": "template", "config": {"template": "<{input}>"}})
+    assert resp.status_code == 200
+    assert store.get_tool("echo_api")["config"] == {"template": "<{input}>"}
+    assert any(t["name"] == "echo_api" for t in client.get("/tools").json()["tools"])
+    assert client.delete("/tools/echo_api").status_code == 200
+    assert store.get_tool("echo_api") is None
+    assert client.delete("/tools/echo_api").status_code == 404
+    assert client.post("/tools", json={"name": "bad", "description": "", "type": "nope"}).status_code == 400
+
+def test_job_submit_and_poll(monkeypatch):
+    import time
+    from rapidagent.app import llms
+    monkeypatch.setattr(llms, "stream", lambda provider, model, messages: iter(['{"type":"final","content":"done"}']))
+    agent_id = client.post("/agents", json={"name": "JobAgent", "model": "gpt-4o-mini", "tools": []}).json()["id"]
+
+    resp = client.post(f"/agents/{agent_id}/jobs", json={"messages": [{"role": "user", "content": "hi"}], "priority": 3})
+    assert resp.status_code == 200
+    job_id = resp.json()["id"]
+    deadline = time.monotonic() + 5
+    while (job := client.get(f"/jobs/{job_id}").json()["job"])["status"] != "succeeded":
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    assert job["result"] == "done" and job["priority"] == 3
+    assert [j["id"] for j in client.get(f"/agents/{agent_id}/jobs").json()["jobs"]] == [job_id]
+    assert client.delete(f"/jobs/{job_id}").status_code == 409
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.post("/agents/missing/jobs", json={"messages": []}).status_code == 404
+
+def test_tool_refresh_is_throttled(monkeypatch):
+    from rapidagent import app as app_module
+
+    calls = []
+    monkeypatch.setattr(app_module.tools, "refresh", lambda s: calls.append(s))
+    monkeypatch.setattr(app_module, "_tools_checked", 0.0)
+    for _ in range(3):
+        assert client.get("/health").status_code == 200
+    assert len(calls) == 1
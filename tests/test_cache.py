@@ -0,0 +1,50 @@
+import time
+from rapidagent.cache import LRUCache, CompletionCache, MISSING
+
+def test_lru_cache_evicts_by_size_and_ttl():
+    cache = LRUCache(max_size=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is MISSING
+
+def test_completion_cache_key_normalizes_only_outer_whitespace():
+    a = CompletionCache.key("openai", "m", [{"role": "user", "content": "hello world \n"}])
+    b = CompletionCache.key("openai", "m", [{"role": "user", "content": "hello world"}])
+    c = CompletionCache.key("openai", "other", [{"role": "user", "content": "hello world"}])
+    indented = CompletionCache.key("openai", "m", [{"role": "user", "content": "if x:\n    y()"}])
+    flat = CompletionCache.key("openai", "m", [{"role": "user", "content": "if x:\ny()"}])
+    assert a == b != c
+    assert indented != flat
+
+def test_sqlite_cache_hits_batch_last_used_updates(temp_store):
+    cache = CompletionCache(temp_store)
+    cache.put("k", "v")
+    used = temp_store.conn.execute("SELECT last_used FROM llm_cache").fetchone()[0]
+    cache.memory.clear()
+    time.sleep(0.01)
+    assert cache.get("k") == "v"
+    assert temp_store.conn.execute("SELECT last_used FROM llm_cache").fetchone()[0] == used
+    temp_store.flush()
+    assert temp_store.conn.execute("SELECT last_used FROM llm_cache").fetchone()[0] > used
+
+def test_run_uses_cache_tiers_and_bypass(temp_store, tool_registry):
+    from rapidagent.llms import LLMRegistry
+    cache = CompletionCache(temp_store)
+    llms = LLMRegistry(temp_store, tool_registry, cache=cache)
+    calls = []
+    llms.providers["openai"] = lambda model, messages: calls.append(model) or "answer"
+    messages = [{"role": "user", "content": "hi"}]
+
+    assert llms.run("openai", "m", messages) == "answer"
+    assert llms.run("openai", "m", messages) == "answer"
+    cache.memory.clear()
+    assert llms.run("openai", "m", messages) == "answer"
+    assert llms.run("openai", "m", messages, use_cache=False) == "answer"
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["memory_hits"] == 1
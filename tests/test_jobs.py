@@ -0,0 +1,81 @@
+import time
+import threading
+from rapidagent.agents import AgentRegistry
+from rapidagent.jobs import JobQueue
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class GatedAgents:
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.order = []
+
+    def run_react(self, agent_id, task, llm_options=None):
+        self.order.append((agent_id, task))
+        if task == "block":
+            self.started.set()
+            self.gate.wait(5)
+        return {"result": task, "trace": []}
+
+
+def test_jobs_run_by_priority_with_per_agent_limit(temp_store):
+    temp_store.create_agent("a", "A", "gpt-4o-mini", [])
+    temp_store.create_agent("b", "B", "gpt-4o-mini", [])
+    agents = GatedAgents()
+    queue = JobQueue(temp_store, agents, workers=2, per_agent=1)
+    try:
+        queue.submit("a", "block")
+        assert agents.started.wait(5)
+        low = queue.submit("a", "a-low")
+        high = queue.submit("a", "a-high", priority=5)
+        other = queue.submit("b", "b")
+        # The second worker skips agent a's queued jobs and runs b's.
+        wait_for(lambda: queue.get(other)["status"] == "succeeded")
+        assert queue.get(high)["status"] == "queued"
+        agents.gate.set()
+        wait_for(lambda: queue.get(low)["status"] == "succeeded")
+        assert agents.order == [("a", "block"), ("b", "b"), ("a", "a-high"), ("a", "a-low")]
+        assert queue.get(high)["result"] == "a-high"
+    finally:
+        agents.gate.set()
+        queue.close()
+
+
+def test_jobs_survive_restart_and_write_traces(monkeypatch, temp_store, llm_registry):
+    temp_store.create_agent("a", "A", "gpt-4o-mini", ["calculator"])
+    replies = iter([
+        ['{"type":"action","action":"calculator","input":"2+2"}'],
+        ['{"type":"final","content":"4"}'],
+    ])
+    monkeypatch.setattr(llm_registry, "stream", lambda p, m, msgs: iter(next(replies)))
+    agents = AgentRegistry(temp_store, llm_registry, llm_registry.tools)
+
+    # A job left running by a crashed process whose lease expired, one still
+    # leased to a live process, and one that was cancelled while queued.
+    temp_store.create_job("crashed", "a", "what is 2+2?")
+    assert temp_store.claim_job("crashed", "dead-worker", lease=0)
+    temp_store.create_job("live", "a", "still running elsewhere")
+    assert temp_store.claim_job("live", "other-worker", lease=60)
+    temp_store.create_job("cancelled", "a", "never mind")
+    queue = JobQueue(temp_store, agents, workers=1)
+    assert queue.cancel("cancelled")
+    try:
+        queue.start()
+        wait_for(lambda: temp_store.get_job("crashed")["status"] == "succeeded")
+    finally:
+        queue.close()
+    assert temp_store.get_job("crashed")["result"] == "4"
+    assert temp_store.get_job("cancelled")["status"] == "cancelled"
+    assert temp_store.get_job("live")["status"] == "running"
+    assert not temp_store.finish_job("crashed", "failed", owner="dead-worker")
+    assert [t["type"] for t in temp_store.list_traces("a")] == ["action", "observation", "final"]
+    assert temp_store.list_traces("a")[1]["content"]["output"] == "4"
+    assert temp_store.get_agent_messages("a")[-1]["content"] == "4"
+    assert temp_store.get_agent("a")["status"] == "idle"
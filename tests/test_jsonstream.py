@@ -0,0 +1,27 @@
+import json
+from rapidagent.jsonstream import JSONStreamParser
+
+def feed_chars(text):
+    parser = JSONStreamParser()
+    for c in text:
+        parser.feed(c)
+    return parser
+
+def test_parses_fields_incrementally():
+    parser = JSONStreamParser()
+    parser.feed('{"type": "final", "content": "hel')
+    assert parser.fields["type"] == "final"
+    assert parser.string_value("content") == "hel"
+    parser.feed('lo \\"world\\""}')
+    assert parser.done
+    assert parser.fields["content"] == 'hello "world"'
+
+def test_matches_json_loads():
+    text = '{"type":"action","action":"calc","input":{"a":[1,"}"]},"n":-1.5,"ok":true,"e":"\\ud83d\\ude00\\n"}'
+    parser = feed_chars(text)
+    assert parser.done
+    assert parser.fields == json.loads(text)
+
+def test_marks_malformed_output_failed():
+    assert feed_chars("Sure! here it is").failed
+    assert feed_chars('{"a": 1,}').failed
@@ -13,3 +13,130 @@ def test_run_react_returns_trace(monkeypatch, llm_registry):
     monkeypatch.setattr(llm_registry, "run", DummyLLM().run)
     trace = llm_registry.run_react("openai", "gpt-4o-mini", "task")
     assert any(step["role"] == "final" for step in trace)
+
+def test_openai_clients_are_reused(monkeypatch):
+    from rapidagent.clients import OpenAIClients
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    clients = OpenAIClients(base_url="http://127.0.0.1:9999/v1", max_connections=4)
+    client = clients.get()
+    assert clients.get() is client
+    assert str(client.base_url).startswith("http://127.0.0.1:9999/v1")
+    clients.close()
+
+def test_openai_clients_require_api_key(monkeypatch):
+    from rapidagent.clients import OpenAIClients
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(RuntimeError):
+        OpenAIClients().get()
+
+def test_stream_dispatches_action_and_cancels_generation(monkeypatch, llm_registry):
+    cancelled = []
+    replies = iter([
+        ['{"type":"action",', '"action":"calculator","input":"2+2"}', ' trailing text'],
+        ['{"type":"final","content":"4"}'],
+    ])
+
+    def stream(provider, model, messages):
+        chunks = next(replies)
+        try:
+            yield from chunks
+        except GeneratorExit:
+            cancelled.append(chunks)
+            raise
+
+    monkeypatch.setattr(llm_registry, "stream", stream)
+    trace = llm_registry.run_react("openai", "gpt-4o-mini", "task", stream=True)
+    assert trace[1] == {"role": "observation", "tool": "calculator", "output": "4"}
+    assert trace[-1] == {"role": "final", "content": "4"}
+    assert cancelled[0][-1] == " trailing text"
+
+def test_stream_malformed_output_falls_back_to_final(monkeypatch, llm_registry):
+    monkeypatch.setattr(llm_registry, "stream", lambda p, m, msgs: iter(["Sure, ", "the answer is 4"]))
+    trace = llm_registry.run_react("openai", "gpt-4o-mini", "task", stream=True)
+    assert trace == [{"role": "final", "content": "Sure, the answer is 4"}]
+
+def test_functions_mode_reasons_and_acts_in_one_turn(monkeypatch, llm_registry):
+    replies = iter([
+        {"content": "I should add.", "tool_calls": [{"id": "c1", "name": "calculator", "arguments": '{"input": "2+3"}'}]},
+        {"content": "5", "tool_calls": []},
+    ])
+    seen = []
+
+    def run_tools(provider, model, messages, functions):
+        seen.append(functions)
+        return next(replies)
+
+    monkeypatch.setattr(llm_registry, "run_tools", run_tools)
+    trace = llm_registry.run_react("openai", "gpt-4o-mini", "task", tools=["calculator"], mode="functions")
+    assert [s["role"] for s in trace] == ["thought", "action", "observation", "final"]
+    assert trace[2]["output"] == "5"
+    assert [f["function"]["name"] for f in seen[0]] == ["calculator"]
+
+def test_multiple_actions_in_one_turn(monkeypatch, llm_registry):
+    replies = iter([
+        json.dumps({"type": "action", "actions": [{"action": "calculator", "input": "1+1"}, {"action": "search", "input": "x"}]}),
+        json.dumps({"type": "final", "content": "done"}),
+    ])
+    calls = []
+
+    def run(provider, model, messages):
+        calls.append(list(messages))
+        return next(replies)
+
+    monkeypatch.setattr(llm_registry, "run", run)
+    trace = llm_registry.run_react("openai", "gpt-4o-mini", "task")
+    assert [s["role"] for s in trace] == ["action", "action", "observation", "observation", "final"]
+    assert trace[2]["output"] == "2"
+    assert calls[1][-1]["content"].startswith("Observations:")
+
+def test_arun_react_runs_actions_concurrently(monkeypatch, llm_registry):
+    import asyncio
+    replies = iter([
+        json.dumps({"type": "action", "actions": [{"action": "calculator", "input": "1+1"}, {"action": "search", "input": "x"}]}),
+        json.dumps({"type": "final", "content": "done"}),
+    ])
+
+    async def arun(provider, model, messages):
+        return next(replies)
+
+    monkeypatch.setattr(llm_registry, "arun", arun)
+    trace = asyncio.run(llm_registry.arun_react("openai", "gpt-4o-mini", "task"))
+    assert [s["role"] for s in trace] == ["action", "action", "observation", "observation", "final"]
+    assert trace[2]["output"] == "2"
+    assert trace[-1]["content"] == "done"
+
+def test_empty_tool_list_allows_all_tools_in_both_modes(monkeypatch, llm_registry):
+    replies = iter([
+        json.dumps({"type": "action", "action": "calculator", "input": "1+1"}),
+        json.dumps({"type": "final", "content": "done"}),
+    ])
+    monkeypatch.setattr(llm_registry, "run", lambda p, m, msgs: next(replies))
+    trace = llm_registry.run_react("openai", "gpt-4o-mini", "task", tools=[])
+    assert trace[1]["output"] == "2"
+
+    seen = []
+
+    def run_tools(provider, model, messages, functions):
+        seen.append(functions)
+        return {"content": "done", "tool_calls": []}
+
+    monkeypatch.setattr(llm_registry, "run_tools", run_tools)
+    llm_registry.run_react("openai", "gpt-4o-mini", "task", tools=[], mode="functions")
+    llm_registry.run_react("openai", "gpt-4o-mini", "task", tools=["search"], mode="functions")
+    assert {f["function"]["name"] for f in seen[0]} == {"calculator", "search"}
+    assert [f["function"]["name"] for f in seen[1]] == ["search"]
+
+def test_functions_mode_passes_objects_to_python_tools(monkeypatch, llm_registry):
+    from rapidagent.tools import PythonCodeTool
+    schema = {"type": "object", "properties": {"city": {"type": "string"}}, "required": ["city"]}
+    tool = PythonCodeTool("weather", "", {"code": "def run(input):\n    return input['city']", "input_schema": schema})
+    monkeypatch.setattr(tool, "run", lambda input: input["city"].upper())
+    llm_registry.tools.register(tool)
+    replies = iter([
+        {"content": "", "tool_calls": [{"id": "c1", "name": "weather", "arguments": '{"city": "Oslo"}'}]},
+        {"content": "done", "tool_calls": []},
+    ])
+    monkeypatch.setattr(llm_registry, "run_tools", lambda p, m, msgs, functions: next(replies))
+    trace = llm_registry.run_react("openai", "gpt-4o-mini", "task", tools=["weather"], mode="functions")
+    assert trace[0]["input"] == {"city": "Oslo"}
+    assert trace[1]["output"] == "OSLO"
@@ -0,0 +1,159 @@
+import json
+import time
+import pytest
+from rapidagent.pipelines import PipelineRegistry
+from rapidagent.tools import Tool, ToolRegistry, TemplateTool
+
+
+class SlowTool(Tool):
+    def __init__(self, name, seconds):
+        self.name = name
+        self.description = "sleeps then echoes"
+        self.type = "slow"
+        self.seconds = seconds
+
+    def run(self, input):
+        time.sleep(self.seconds)
+        return f"{self.name}:{input}"
+
+
+def test_independent_steps_run_in_parallel(temp_store):
+    tools = ToolRegistry([SlowTool("a", 0.3), SlowTool("b", 0.3), TemplateTool("join", "", "joined {input}")])
+    registry = PipelineRegistry(temp_store, tools)
+    pid = registry.create_pipeline(
+        "fan-out",
+        "",
+        [
+            {"tool": "a", "input_mapping": {"input": "query"}},
+            {"tool": "b", "input_mapping": {"input": "query"}},
+            {"tool": "join", "input_mapping": {"input": "step_1_output"}},
+            {"tool": "a", "input_mapping": {"input": "step_2_output"}},
+        ],
+    )
+    start = time.monotonic()
+    run = registry.run_pipeline(pid, {"query": "q"})
+    assert time.monotonic() - start < 0.85
+    assert [r["step"] for r in run["results"]] == [0, 1, 2, 3]
+    assert [r["output"] for r in run["results"]] == ["a:q", "b:q", "joined b:q", "a:joined b:q"]
+    assert list(run["final_context"]) == ["query", "step_0_output", "step_1_output", "step_2_output", "step_3_output"]
+    assert all(r["duration_ms"] >= 0 for r in run["results"])
+    registry.shutdown()
+
+
+def test_plans_are_cached_until_a_tool_changes(temp_store):
+    tools = ToolRegistry([TemplateTool("t", "", "a {input}")])
+    registry = PipelineRegistry(temp_store, tools)
+    pid = registry.create_pipeline(
+        "plan",
+        "",
+        [
+            {"tool": "t", "input_mapping": {"input": "query"}},
+            {"tool": "t", "input_mapping": {"input": "step_0_output"}},
+            {"tool": "t", "input_mapping": {"input": "step_3_output", "other": "query"}},
+            {"tool": "t", "input_mapping": {"input": "merged_key"}},
+        ],
+    )
+    inputs = {"query": "q", "merged_key": "m", "step_3_output": "s"}
+    plan = registry.plan(pid)
+    assert registry.plan(pid) is plan
+    assert [s.deps for s in plan.steps] == [set(), {0}, set(), set()]
+    assert plan.steps[3].loose_keys == ("merged_key",)
+    assert registry.run_pipeline(pid, inputs)["results"][1]["output"] == "a a q"
+
+    tools.register(TemplateTool("t", "", "b {input}"))
+    assert registry.plan(pid) is not plan
+    assert registry.run_pipeline(pid, inputs)["results"][1]["output"] == "b b q"
+    tools.unregister("t")
+    with pytest.raises(RuntimeError):
+        registry.plan(pid)
+
+
+def test_run_batch_orders_results_and_resumes_from_offset(temp_store, tmp_path):
+    from rapidagent.batch import BatchProgress, run_batch, main
+    tools = ToolRegistry([SlowTool("slow", 0.01), TemplateTool("greet", "", "hi {input}")])
+    registry = PipelineRegistry(temp_store, tools)
+    pid = registry.create_pipeline("p", "", [{"tool": "greet", "input_mapping": {"input": "name"}}])
+    rows = ['{"name": "%d"}' % i for i in range(20)] + ["", "not json"]
+    progress = BatchProgress(5)
+    out = list(run_batch(registry, pid, rows, concurrency=4, offset=5, progress=progress))
+    assert [r["index"] for r in out] == list(range(5, 21))
+    assert out[0]["results"][0]["output"] == "hi 5"
+    assert "error" in out[-1]
+    assert progress.to_dict()["watermark"] == 21 and progress.failed == 1
+
+    unordered = list(run_batch(registry, pid, rows[:10], concurrency=4, ordered=False))
+    assert sorted(r["index"] for r in unordered) == list(range(10))
+
+    calc = registry.create_pipeline("calc", "", [{"tool": "calculator", "input_mapping": {"input": "expr"}}])
+    src = tmp_path / "in.jsonl"
+    src.write_text("\n".join('{"expr": "%d * 2"}' % i for i in range(6)) + "\n")
+    dst = tmp_path / "out.jsonl"
+    dst.write_text(json.dumps({"index": 0}) + "\n" + json.dumps({"index": 1}) + "\n" + '{"index": 2, "resu')
+    temp_store.flush()
+    assert main([calc, "--input", str(src), "--output", str(dst), "--resume", "--db", temp_store.path]) == 0
+    lines = [json.loads(l) for l in dst.read_text().splitlines()]
+    assert [l["index"] for l in lines] == [0, 1, 2, 3, 4, 5]
+    assert lines[-1]["final_context"]["step_0_output"] == "10"
+
+
+def test_step_cache_skips_unchanged_steps(temp_store):
+    calls = []
+
+    class CountingTool(SlowTool):
+        def run(self, input):
+            calls.append((self.name, input))
+            return input.upper()
+
+    tools = ToolRegistry([CountingTool("upper", 0), TemplateTool("wrap", "", "[{input}]")])
+    registry = PipelineRegistry(temp_store, tools)
+    pid = registry.create_pipeline(
+        "cached",
+        "",
+        [
+            {"tool": "upper", "input_mapping": {"input": "text"}},
+            {"tool": "wrap", "input_mapping": {"input": "step_0_output"}},
+        ],
+    )
+    first = registry.run_pipeline(pid, {"text": "abc"}, use_cache=True)
+    assert first["cache"] == {"hits": 0, "misses": 2, "fresh": 0}
+    second = registry.run_pipeline(pid, {"text": "abc"}, use_cache=True)
+    assert second["cache"]["hits"] == 2 and len(calls) == 1
+    assert second["final_context"] == first["final_context"]
+
+    fresh = registry.run_pipeline(pid, {"text": "abc"}, use_cache=True, fresh=[0])
+    assert [r["cached"] for r in fresh["results"]] == [False, True]
+    assert len(calls) == 2
+
+    tools.register(TemplateTool("wrap", "", "<{input}>"))
+    edited = registry.run_pipeline(pid, {"text": "abc"}, use_cache=True)
+    assert [r["cached"] for r in edited["results"]] == [True, False]
+    assert edited["results"][1]["output"] == "<ABC>"
+    assert "cache" not in registry.run_pipeline(pid, {"text": "abc"})
+
+
+def test_import_json_runs_once(temp_store, tmp_path):
+    path = tmp_path / "pipelines.json"
+    path.write_text(json.dumps([
+        {"id": "p1", "name": "old", "description": "", "steps": [{"tool": "calculator", "input_mapping": {"input": "x"}}], "created_at": "2024-01-01T00:00:00"},
+    ]))
+    registry = PipelineRegistry(temp_store, ToolRegistry.from_json_file(str(tmp_path / "none.json")))
+    assert registry.import_json(str(path)) == 1
+    assert registry.import_json(str(path)) == 0
+    assert registry.run_pipeline("p1", {"x": "1 + 1"})["results"][0]["output"] == "2"
+    assert [p["id"] for p in registry.list_pipelines()] == ["p1"]
+
+
+def test_step_cache_expires_and_is_trimmed(temp_store):
+    tools = ToolRegistry([TemplateTool("wrap", "", "[{input}]")])
+    registry = PipelineRegistry(temp_store, tools, cache_ttl=60, cache_max_rows=2, evict_every=1)
+    pid = registry.create_pipeline("cached", "", [{"tool": "wrap", "input_mapping": {"input": "text"}}])
+    registry.run_pipeline(pid, {"text": "a"}, use_cache=True)
+    assert registry.run_pipeline(pid, {"text": "a"}, use_cache=True)["cache"]["hits"] == 1
+
+    with temp_store.conn:
+        temp_store.conn.execute("UPDATE step_cache SET created_at=created_at-120")
+    assert registry.run_pipeline(pid, {"text": "a"}, use_cache=True)["cache"]["hits"] == 0
+
+    for text in "bcd":
+        registry.run_pipeline(pid, {"text": text}, use_cache=True)
+    assert temp_store.conn.execute("SELECT COUNT(*) FROM step_cache").fetchone()[0] == 2
@@ -0,0 +1,94 @@
+import time
+import asyncio
+from rapidagent.llms import LLMRegistry
+from rapidagent.providers import Provider
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class FakeProvider(Provider):
+    capabilities = frozenset({"run", "stream", "arun"})
+
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.slow = False
+        self.cancelled = 0
+
+    def reply(self, model):
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return f"{self.name}:{model}"
+
+    def run(self, model, messages):
+        time.sleep(1.0 if self.slow else 0.01)
+        return self.reply(model)
+
+    def stream(self, model, messages):
+        time.sleep(1.0 if self.slow else 0.01)
+        yield from self.reply(model).partition(":")
+
+    async def arun(self, model, messages):
+        try:
+            await asyncio.sleep(1.0 if self.slow else 0.01)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.reply(model)
+
+
+def test_fallback_chain_skips_failing_provider(temp_store, tool_registry):
+    llms = LLMRegistry(temp_store, tool_registry, fallbacks={"primary": ["down", "backup:other"]})
+    for provider in (FakeProvider("primary", fail=True), FakeProvider("down", fail=True), FakeProvider("backup")):
+        llms.register_provider(provider)
+
+    assert llms.run("primary", "m", MESSAGES, use_cache=False) == "backup:other"
+    assert "".join(llms.stream("primary", "m", MESSAGES)) == "backup:other"
+    assert asyncio.run(llms.arun("primary", "m", MESSAGES, use_cache=False)) == "backup:other"
+    assert llms.routing["fallbacks"] == 6
+    assert llms.list_models("backup") == []
+
+
+def test_slow_primary_is_hedged_past_latency_percentile(temp_store, tool_registry):
+    llms = LLMRegistry(temp_store, tool_registry, fallbacks={"primary": ["backup"]}, hedge_percentile=50, hedge_min_samples=3)
+    primary, backup = FakeProvider("primary"), FakeProvider("backup")
+    llms.register_provider(primary)
+    llms.register_provider(backup)
+    for _ in range(3):
+        assert llms.run("primary", "m", MESSAGES, use_cache=False) == "primary:m"
+        assert "".join(llms.stream("primary", "m", MESSAGES)) == "primary:m"
+    wins = llms.routing["hedge_wins"]
+
+    primary.slow = True
+    start = time.monotonic()
+    assert llms.run("primary", "m", MESSAGES, use_cache=False) == "backup:m"
+    assert "".join(llms.stream("primary", "m", MESSAGES)) == "backup:m"
+    assert asyncio.run(llms.arun("primary", "m", MESSAGES, use_cache=False)) == "backup:m"
+    assert time.monotonic() - start < 0.9
+    assert primary.cancelled == 1
+    assert llms.routing["hedge_wins"] == wins + 3
+    llms.close()
+
+
+def test_fast_primary_failure_falls_back_when_hedging(temp_store, tool_registry):
+    llms = LLMRegistry(temp_store, tool_registry, fallbacks={"primary": ["backup"]}, hedge_percentile=50, hedge_min_samples=1)
+    llms.register_provider(FakeProvider("primary", fail=True))
+    llms.register_provider(FakeProvider("backup"))
+    for kind in ("run", "stream"):
+        llms.latency.observe((kind, "primary", "m"), 0.5)
+
+    assert llms.run("primary", "m", MESSAGES, use_cache=False) == "backup:m"
+    assert "".join(llms.stream("primary", "m", MESSAGES)) == "backup:m"
+    assert asyncio.run(llms.arun("primary", "m", MESSAGES, use_cache=False)) == "backup:m"
+    assert llms.routing["hedged"] == 0 and llms.routing["fallbacks"] == 3
+    llms.close()
+
+
+def test_only_declared_capabilities_are_registered(temp_store, tool_registry):
+    class RunOnly(FakeProvider):
+        capabilities = frozenset({"run"})
+
+    llms = LLMRegistry(temp_store, tool_registry, hedge_percentile=0)
+    llms.register_provider(RunOnly("plain"))
+    assert "plain" in llms.providers and "plain" not in llms.streamers and "plain" not in llms.async_providers
+    assert llms.hedge_percentile == 0
@@ -0,0 +1,67 @@
+import pytest
+from rapidagent.rag import RAG
+
+def test_upsert_and_query_ranks_by_bm25(temp_store):
+    rag = RAG(temp_store)
+    rag.upsert([
+        {"id": "1", "text": "The quick brown fox jumps over the lazy dog", "metadata": {"lang": "en"}},
+        {"id": "2", "text": "A quick fox. The fox is quick and the fox runs.", "metadata": {"lang": "en"}},
+        {"id": "3", "text": "Der schnelle braune Fuchs", "metadata": {"lang": "de"}},
+    ])
+    results = rag.query("quick fox", k=2)
+    assert [r["id"] for r in results] == ["2", "1"]
+    assert "<mark>" in results[0]["snippet"]
+    assert results[0]["score"] >= results[1]["score"]
+
+def test_query_filters_on_metadata(temp_store):
+    rag = RAG(temp_store)
+    rag.upsert([
+        {"id": "a", "text": "pizza recipe", "metadata": {"lang": "en"}},
+        {"id": "b", "text": "pizza rezept", "metadata": {"lang": "de"}},
+    ])
+    assert [r["id"] for r in rag.query("pizza", filters={"lang": "de"})] == ["b"]
+
+def test_upsert_replaces_existing_document(temp_store):
+    rag = RAG(temp_store)
+    rag.upsert([{"id": "a", "text": "old content"}])
+    rag.upsert([{"id": "a", "text": "new content"}])
+    assert rag.query("old") == []
+    assert [r["id"] for r in rag.query("new")] == ["a"]
+    assert temp_store.count_docs() == 1
+
+def test_dense_query_with_hashing_embedder(temp_store, tmp_path):
+    pytest.importorskip("numpy")
+    from rapidagent.vectors import HashingEmbedder, VectorIndex
+    embedder = HashingEmbedder(dim=64)
+    rag = RAG(temp_store, VectorIndex(temp_store, str(tmp_path / "vectors.f32"), embedder.dim), embedder)
+    rag.upsert([
+        {"id": "a", "text": "solar panels and renewable energy", "metadata": {"topic": "energy"}},
+        {"id": "b", "text": "baking sourdough bread at home", "metadata": {"topic": "food"}},
+    ])
+    rag.upsert([{"id": "b", "text": "sourdough bread recipe", "metadata": {"topic": "food"}}])
+    assert rag.query("renewable energy", k=1, mode="dense")[0]["id"] == "a"
+    assert [r["id"] for r in rag.query("energy", k=2, mode="dense", filters={"topic": "food"})] == ["b"]
+
+    reopened = VectorIndex(temp_store, str(tmp_path / "vectors.f32"), embedder.dim)
+    assert len(reopened) == 2
+    batch = reopened.search(embedder.embed(["sourdough bread", "solar energy"]), k=1)
+    assert [hits[0][0] for hits in batch] == ["b", "a"]
+
+def test_failed_vector_mapping_leaves_rows_aligned(temp_store, tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    from rapidagent.vectors import HashingEmbedder, VectorIndex
+    embedder = HashingEmbedder(dim=64)
+    index = VectorIndex(temp_store, str(tmp_path / "vectors.f32"), embedder.dim)
+    index.add(["a"], embedder.embed(["solar energy panels"]))
+
+    def fail(rows):
+        raise RuntimeError("database is locked")
+
+    with monkeypatch.context() as m:
+        m.setattr(temp_store, "add_doc_vectors", fail)
+        with pytest.raises(RuntimeError):
+            index.add(["x"], embedder.embed(["unrelated words"]))
+    index.add(["b"], embedder.embed(["sourdough bread baking"]))
+
+    reopened = VectorIndex(temp_store, str(tmp_path / "vectors.f32"), embedder.dim)
+    assert [hits[0][0] for hits in reopened.search(embedder.embed(["solar energy", "sourdough bread"]), k=1)] == ["a", "b"]
@@ -0,0 +1,120 @@
+import time
+import asyncio
+import threading
+from rapidagent.ratelimit import ModelLimiter, RateLimiter, TokenBucket
+
+
+class Throttled(Exception):
+    status_code = 429
+
+    def __init__(self, headers):
+        self.response = type("Response", (), {"headers": headers})()
+
+
+class Unavailable(Exception):
+    status_code = 503
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    assert bucket.wait(60, now) == 0
+    bucket.take(60)
+    assert bucket.wait(2, now) == 2.0
+    assert bucket.wait(2, now + 1.5) == 0.5
+    # Requests bigger than the bucket wait for a full bucket, not forever.
+    assert bucket.wait(600, now + 1.5) == 58.5
+
+
+def test_429_pauses_queue_and_halves_concurrency():
+    limiter = ModelLimiter(concurrency=8, max_retries=3)
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise Throttled({"retry-after-ms": "100"})
+        return "ok"
+
+    assert limiter.call(fn) == "ok"
+    assert calls[2] - calls[0] >= 0.2
+    assert limiter.limit < 8 / 2
+    assert limiter.stats()["throttled"] == 2 and limiter.in_flight == 0
+
+    def always():
+        raise Throttled({"retry-after": "0"})
+
+    try:
+        ModelLimiter(max_retries=1).call(always)
+        assert False, "expected the 429 to surface after the retries"
+    except Throttled:
+        pass
+
+
+def test_concurrency_limit_holds_for_threads_and_tasks():
+    limiter = RateLimiter({"concurrency": 2, "max_concurrency": 2}).get("openai", "m")
+    lock = threading.Lock()
+    state = {"now": 0, "max": 0}
+
+    def enter():
+        with lock:
+            state["now"] += 1
+            state["max"] = max(state["max"], state["now"])
+
+    def leave():
+        with lock:
+            state["now"] -= 1
+
+    def work():
+        enter()
+        time.sleep(0.02)
+        leave()
+
+    threads = [threading.Thread(target=limiter.call, args=(work,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+
+    async def awork():
+        enter()
+        await asyncio.sleep(0.02)
+        leave()
+
+    async def main():
+        await asyncio.gather(*(limiter.acall(awork) for _ in range(8)))
+
+    asyncio.run(main())
+    for t in threads:
+        t.join()
+    assert state["max"] == 2
+    assert limiter.stats()["admitted"] == 16 and limiter.in_flight == 0
+
+
+def test_transient_errors_retry_without_throttling_and_close_failed_streams():
+    limiter = ModelLimiter(backoff=0.01)
+    assert limiter.limit == float("inf") and limiter.stats()["limit"] is None
+    closed = []
+
+    def attempts():
+        for i in range(3):
+            def chunks(i=i):
+                try:
+                    if i < 2:
+                        raise Unavailable() if i == 0 else Throttled({"retry-after-ms": "10"})
+                    yield "ok"
+                finally:
+                    closed.append(i)
+            yield chunks()
+
+    gens = attempts()
+    assert list(limiter.stream(lambda: next(gens))) == ["ok"]
+    assert closed == [0, 1, 2]
+    # Only the 429 throttled: it capped the limiter at half the one request
+    # in flight (at least 1), and the success then grew it by one.
+    assert limiter.stats()["throttled"] == 1 and limiter.limit == 2
+    assert limiter.in_flight == 0
+
+    try:
+        ModelLimiter().call(lambda: (_ for _ in ()).throw(ValueError("bad request")))
+        assert False, "expected a non-retryable error to surface at once"
+    except ValueError:
+        pass
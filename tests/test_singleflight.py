@@ -0,0 +1,84 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rapidagent.singleflight import SingleFlight
+from rapidagent.tools import HttpTool, PythonCodeTool, Tool, ToolRegistry
+
+
+def test_identical_calls_share_one_execution_and_its_error():
+    flight = SingleFlight()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        time.sleep(0.1)
+        return "ok"
+
+    with ThreadPoolExecutor(5) as pool:
+        results = list(pool.map(lambda _: flight.do("k", slow), range(5)))
+    assert results == ["ok"] * 5 and len(runs) == 1
+
+    async def fail():
+        await asyncio.sleep(0.1)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("e", fail) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert flight.stats() == {"executions": 2, "coalesced": 6, "in_flight": 0}
+
+
+def test_tool_calls_coalesce_unless_tool_or_caller_opts_out():
+    class Counter(Tool):
+        def __init__(self):
+            self.name = "counter"
+            self.description = ""
+            self.type = "counter"
+            self.runs = 0
+            self.lock = threading.Lock()
+
+        def run(self, input):
+            with self.lock:
+                self.runs += 1
+            time.sleep(0.1)
+            return input
+
+    tool = Counter()
+    registry = ToolRegistry([tool])
+    assert registry.run_many([("counter", "x")] * 4) == ["x"] * 4
+    assert tool.runs == 1
+    registry.run_many([("counter", "x")] * 4, coalesce=False)
+    assert tool.runs == 5
+    assert registry.flight.stats()["coalesced"] == 3
+    registry.shutdown()
+
+    assert HttpTool("get", "", {"url": "http://example.com"}).coalesce
+    assert not HttpTool("post", "", {"url": "http://example.com", "method": "POST"}).coalesce
+    code = "def run(input):\n    return input\n"
+    assert not PythonCodeTool("py", "", {"code": code}).coalesce
+    assert PythonCodeTool("pure", "", {"code": code, "coalesce": True}).coalesce
+
+
+def test_concurrent_identical_chat_turns_share_one_stream(monkeypatch, temp_store, llm_registry):
+    from rapidagent.agents import AgentRegistry
+    streams = []
+
+    def stream(provider, model, messages):
+        streams.append(1)
+        time.sleep(0.1)
+        yield '{"type":"final","content":"shared"}'
+
+    monkeypatch.setattr(llm_registry, "stream", stream)
+    agents = AgentRegistry(temp_store, llm_registry, llm_registry.tools)
+    shared = [agents.create(f"a{i}", "gpt-4o-mini", []) for i in range(3)]
+    private = agents.create("p", "gpt-4o-mini", [], coalesce=False)
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda agent_id: agents.run_react(agent_id, "same task"), shared + [private]))
+    assert [r["result"] for r in results] == ["shared"] * 4
+    assert len(streams) == 2
+    assert llm_registry.flight.stats()["coalesced"] == 2
+    assert temp_store.get_agent(private)["coalesce"] is False
@@ -1,3 +1,5 @@
+import sqlite3
+
 def test_kv_store(temp_store):
     temp_store.set_kv("foo", "bar")
     assert temp_store.get_kv("foo") == "bar"
@@ -17,3 +19,77 @@ def test_messages_and_traces(temp_store):
     traces = temp_store.list_traces(agent_id)
     assert traces[0]["type"] == "thought"
     assert "note" in traces[0]["content"]
+
+def test_wal_mode_and_agent_indexes(temp_store):
+    assert temp_store.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert temp_store.schema_version() >= 1
+    plan = temp_store.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT role FROM agent_messages WHERE agent_id=? ORDER BY id ASC", ("a",)
+    ).fetchall()
+    assert any("idx_agent_messages_agent_id" in row[-1] for row in plan)
+
+def test_concurrent_writes_use_per_thread_connections(temp_store):
+    import threading
+    temp_store.create_agent("a1", "A", "gpt-4o-mini", [])
+    connections = set()
+
+    def write(n):
+        connections.add(temp_store.conn)
+        for i in range(20):
+            temp_store.add_trace("a1", "thought", {"n": n, "i": i})
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(temp_store.list_traces("a1")) == 80
+    assert len(connections) == 4
+    # Connections are closed when their thread exits.
+    assert temp_store._connections == [temp_store.conn]
+
+def test_failed_migration_rolls_back_with_its_version(tmp_path, monkeypatch):
+    from rapidagent import store as store_module
+    path = str(tmp_path / "m.db")
+    store_module.Store(path).close()
+    version = store_module.MIGRATIONS[-1][0]
+    broken = (version + 1, ["ALTER TABLE kv ADD COLUMN extra TEXT", "SELECT * FROM missing"])
+    monkeypatch.setattr(store_module, "MIGRATIONS", store_module.MIGRATIONS + [broken])
+    try:
+        store_module.Store(path)
+        assert False, "expected the migration to fail"
+    except sqlite3.OperationalError:
+        pass
+    fixed = (version + 1, ["ALTER TABLE kv ADD COLUMN extra TEXT"])
+    monkeypatch.setattr(store_module, "MIGRATIONS", store_module.MIGRATIONS[:-1] + [fixed])
+    reopened = store_module.Store(path)
+    assert reopened.schema_version() == version + 1
+    reopened.close()
+
+def test_write_behind_batches_and_reads_own_writes(tmp_path):
+    from rapidagent.store import Store
+    store = Store(str(tmp_path / "wb.db"), write_behind=True, batch_size=1000, flush_interval=60)
+    store.create_agent("a1", "A", "gpt-4o-mini", [])
+    for i in range(5):
+        store.add_trace("a1", "thought", {"i": i})
+    store.add_agent_message("a1", "user", "hello")
+    assert store.conn.execute("SELECT COUNT(*) FROM traces").fetchone()[0] == 0
+    assert [t["content"]["i"] for t in store.list_traces("a1")] == [0, 1, 2, 3, 4]
+    assert store.get_agent_messages("a1")[0]["content"] == "hello"
+    store.add_trace("a1", "final", {"content": "done"})
+    store.close()
+    reopened = Store(str(tmp_path / "wb.db"))
+    assert len(reopened.list_traces("a1")) == 6
+    reopened.close()
+
+def test_trace_pagination_and_tail(temp_store):
+    temp_store.create_agent("a1", "A", "gpt-4o-mini", [])
+    for i in range(10):
+        temp_store.add_trace("a1", "thought" if i % 2 else "action", {"i": i})
+    first = temp_store.list_traces("a1", limit=3)
+    assert [t["content"]["i"] for t in first] == [0, 1, 2]
+    second = temp_store.list_traces("a1", limit=3, after_id=first[-1]["id"])
+    assert [t["content"]["i"] for t in second] == [3, 4, 5]
+    assert [t["content"]["i"] for t in temp_store.list_traces("a1", limit=2, tail=True)] == [8, 9]
+    assert [t["content"]["i"] for t in temp_store.list_traces("a1", limit=2, before_id=second[0]["id"])] == [1, 2]
+    assert [t["content"]["i"] for t in temp_store.list_traces("a1", type="thought", limit=2)] == [1, 3]
@@ -20,3 +20,229 @@ def test_calculator_invalid(tool_registry):
 def test_unknown_tool(tool_registry):
     result = tool_registry.run("doesnotexist", "input")
     assert "not found" in result
+
+def test_function_schemas_use_python_input_schema():
+    from rapidagent.tools import PythonCodeTool
+    schema = {"type": "object", "properties": {"city": {"type": "string"}}, "required": ["city"]}
+    registry = ToolRegistry([
+        PythonCodeTool("weather", "Weather lookup", {"code": "def run(input):\n    return input", "input_schema": schema}),
+    ])
+    fn = registry.function_schemas()[0]["function"]
+    assert fn["name"] == "weather"
+    assert fn["parameters"] == schema
+
+def test_run_many_runs_in_parallel_with_timeouts():
+    import time
+    from rapidagent.tools import Tool
+
+    class SleepTool(Tool):
+        def __init__(self, name, seconds):
+            self.name = name
+            self.description = "sleeps"
+            self.type = "sleep"
+            self.seconds = seconds
+
+        def run(self, input):
+            time.sleep(self.seconds)
+            return input
+
+    registry = ToolRegistry([SleepTool("a", 0.2), SleepTool("b", 0.2), SleepTool("slow", 2)], default_timeout=0.5)
+    start = time.monotonic()
+    results = registry.run_many([("a", "1"), ("b", "2"), ("slow", "3")])
+    assert time.monotonic() - start < 1.5
+    assert results[:2] == ["1", "2"]
+    assert "timed out" in results[2]
+    registry.shutdown()
+
+    # Queue time does not count against a call's timeout, but is bounded too.
+    single = ToolRegistry([SleepTool("a", 0.2), SleepTool("b", 0.2), SleepTool("hung", 1)], max_workers=1, default_timeout=0.3)
+    assert single.run_many([("a", "1"), ("b", "2")]) == ["1", "2"]
+    results = single.run_many([("hung", ""), ("b", "2")])
+    assert results[0] == "Error: Tool hung timed out after 0.3s"
+    assert results[1] == "Error: Tool b timed out after 0.3s waiting for a worker"
+    single.shutdown()
+
+def test_cacheable_tools_are_memoized_until_reregistered():
+    from rapidagent.tools import PythonCodeTool
+    code = "def run(input):\n    import random\n    return random.random()"
+    defn = {"name": "rand", "description": "", "type": "python", "config": {"code": code, "cache": {"ttl": 60, "max_size": 8}}}
+    registry = ToolRegistry([ToolRegistry.tool_from_def(defn)])
+    first = registry.run("rand", "x")
+    assert registry.run("rand", "x") == first
+    assert registry.run("rand", "y") != first
+    assert registry.cache_stats()["hits"] == 1
+    registry.register(ToolRegistry.tool_from_def(defn))
+    assert registry.run("rand", "x") != first
+
+def test_http_tool_caches_only_get_requests():
+    http_get = ToolRegistry.tool_from_def({"name": "g", "type": "http", "config": {"url": "http://x", "cache": {"ttl": 30}}})
+    http_post = ToolRegistry.tool_from_def({"name": "p", "type": "http", "config": {"url": "http://x", "method": "POST", "cache": True}})
+    assert http_get.cacheable and http_get.cache_ttl == 30
+    assert not http_post.cacheable
+
+def test_http_tool_retries_and_truncates():
+    import httpx
+    from rapidagent.httpclient import HttpClientPool
+    from rapidagent.tools import HttpTool
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url.path)
+        if len(attempts) == 1:
+            return httpx.Response(503)
+        if len(attempts) == 2:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        if request.url.path == "/big":
+            return httpx.Response(200, text="x" * 100)
+        return httpx.Response(200, json={"ok": True})
+
+    pool = HttpClientPool(transport=httpx.MockTransport(handler), backoff=0.001)
+    tool = HttpTool("h", "", {"url": "http://api.test/{input}", "max_bytes": 20}, pool=pool)
+    assert tool.run("small") == '{"ok": true}'
+    assert attempts == ["/small"] * 3
+    assert tool.run("big") == "x" * 20 + "\n[truncated after 20 bytes]"
+    pool.close()
+
+def test_http_tool_retries_stop_at_total_timeout():
+    import time
+    import httpx
+    from rapidagent.httpclient import HttpClientPool
+    from rapidagent.tools import HttpTool
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        return httpx.Response(429, headers={"Retry-After": "5"}, text="slow down")
+
+    pool = HttpClientPool(transport=httpx.MockTransport(handler))
+    tool = HttpTool("h", "", {"url": "http://api.test/", "timeout": 1, "total_timeout": 0.5}, pool=pool)
+    start = time.monotonic()
+    assert tool.run("") == "slow down"
+    assert time.monotonic() - start < 0.5 and len(attempts) == 1
+    registry = ToolRegistry([tool, HttpTool("d", "", {"url": "http://api.test/", "timeout": 2, "retries": 1})])
+    assert registry._timeout_for("h") == 0.5 and registry._timeout_for("d") == 4
+    pool.close()
+
+def test_http_tool_retries_only_idempotent_requests():
+    import httpx
+    from rapidagent.httpclient import HttpClientPool
+    from rapidagent.tools import HttpTool
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.method)
+        return httpx.Response(503, text="down")
+
+    pool = HttpClientPool(transport=httpx.MockTransport(handler), backoff=0.001)
+    assert HttpTool("post", "", {"url": "http://api.test/", "method": "POST"}, pool=pool).run("") == "down"
+    assert attempts == ["POST"]
+    HttpTool("safe", "", {"url": "http://api.test/", "method": "POST", "idempotent": True}, pool=pool).run("")
+    HttpTool("put", "", {"url": "http://api.test/", "method": "PUT"}, pool=pool).run("")
+    assert attempts == ["POST"] * 4 + ["PUT"] * 3
+    pool.close()
+
+def test_sandbox_recycles_workers_after_timeouts_and_crashes():
+    from rapidagent.sandbox import SandboxPool
+    from rapidagent.tools import PythonCodeTool
+    pool = SandboxPool(workers=1, timeout=0.5, cpu_seconds=1)
+    try:
+        echo = PythonCodeTool("echo", "", {"code": "def run(input):\n    return input['text'].upper()"}, pool=pool)
+        assert echo.run({"text": "hi"}) == "HI"
+        hang = PythonCodeTool("hang", "", {"code": "def run(input):\n    import time\n    time.sleep(5)"}, pool=pool)
+        assert "timed out" in hang.run("")
+        crash = PythonCodeTool("crash", "", {"code": "def run(input):\n    raise SystemExit(3)"}, pool=pool)
+        assert "exit code 3" in crash.run("")
+        spin = PythonCodeTool("spin", "", {"code": "def run(input):\n    while True:\n        pass", "timeout": 10}, pool=pool)
+        assert spin.run("") == "Error: CPU time limit exceeded"
+        assert pool.recycled == 3
+        assert echo.run({"text": "ok"}) == "OK"
+        assert PythonCodeTool("bad", "", {"code": "def run(:"}, pool=pool).run("").startswith("Compilation error")
+        escape = PythonCodeTool("escape", "", {"code": "def run(input):\n    import os\n    return os.getcwd()"}, pool=pool)
+        assert escape.run("") == "Error: Import of os is not allowed in Python tools"
+        assert PythonCodeTool("read", "", {"code": "def run(input):\n    return open(input).read()"}, pool=pool).run("/etc/hostname").startswith("Error: name 'open'")
+    finally:
+        pool.close()
+    assert not pool._all and pool._idle.empty()
+
+def test_sandbox_close_stops_workers_still_in_use():
+    import time
+    import threading
+    from rapidagent.sandbox import SandboxPool
+    pool = SandboxPool(workers=1)
+    pool.start()
+    (worker,) = pool._all
+    results = []
+    call = threading.Thread(target=lambda: results.append(pool.run("def run(input):\n    import time\n    time.sleep(0.3)\n    return 'done'", "")))
+    call.start()
+    while not pool._idle.empty():
+        time.sleep(0.01)
+    pool.close()
+    call.join()
+    assert results == ["done"]
+    assert pool._idle.empty() and not worker.process.is_alive()
+
+def test_refresh_applies_store_changes_incrementally(temp_store):
+    from rapidagent.tools import CalculatorTool
+    worker_a = ToolRegistry([CalculatorTool()])
+    worker_b = ToolRegistry([CalculatorTool()])
+    temp_store.upsert_tool("greet", "", "template", {"template": "hi {input}"})
+    assert worker_a.refresh(temp_store) and worker_b.refresh(temp_store)
+    assert worker_b.run("greet", "bob") == "hi bob"
+    assert not worker_b.refresh(temp_store)
+
+    temp_store.upsert_tool("greet", "", "template", {"template": "yo {input}"})
+    assert temp_store.delete_tool("greet") is True
+    temp_store.upsert_tool("shout", "", "template", {"template": "{input}!"})
+    worker_b.refresh(temp_store)
+    assert "greet" not in worker_b.tools and worker_b.run("shout", "a") == "a!"
+    assert worker_b.store_version == temp_store.tools_version() == 4
+    assert [t["name"] for t in temp_store.list_tools()] == ["shout"]
+
+    # Readers iterating the registry are unaffected by a concurrent refresh.
+    listing = iter(worker_b.tools.values())
+    next(listing)
+    temp_store.upsert_tool("whisper", "", "template", {"template": "{input}..."})
+    worker_b.refresh(temp_store)
+    assert [t.name for t in listing] == ["shout"] and "whisper" in worker_b.tools
+
+def test_arun_many_overlaps_async_tools_with_timeouts():
+    import time
+    import asyncio
+    from rapidagent.tools import Tool
+
+    class AsyncSleepTool(Tool):
+        def __init__(self, name, seconds):
+            self.name = name
+            self.description = "sleeps"
+            self.type = "sleep"
+            self.seconds = seconds
+
+        def run(self, input):
+            raise AssertionError("arun_many should not fall back to threads")
+
+        async def arun(self, input):
+            await asyncio.sleep(self.seconds)
+            return input
+
+    registry = ToolRegistry([AsyncSleepTool("a", 0.2), AsyncSleepTool("b", 0.2), AsyncSleepTool("slow", 2)], default_timeout=0.5)
+    start = time.monotonic()
+    results = asyncio.run(registry.arun_many([("a", "1"), ("b", "2"), ("slow", "3"), ("missing", "")]))
+    assert time.monotonic() - start < 1.0
+    assert results[:2] == ["1", "2"]
+    assert "timed out" in results[2]
+    assert "not found" in results[3]
+
+
+def test_tool_config_is_per_instance_and_cache_counts_are_exact():
+    from concurrent.futures import ThreadPoolExecutor
+    from rapidagent.tools import CalculatorTool, SearchTool, Tool
+
+    a, b = CalculatorTool("a"), SearchTool("b")
+    a.config["note"] = "x"
+    assert b.config == {} and "config" not in vars(Tool)
+
+    registry = ToolRegistry([CalculatorTool()])
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: registry.run("calculator", f"{i % 4} + 1"), range(400)))
+    stats = registry.cache_stats()
+    assert stats["hits"] + stats["misses"] == 400